@@ -0,0 +1,132 @@
+# api/conditional.py
+"""
+Conditional GET for the API list views.
+
+Each response carries an ETag and a Last-Modified header, computed
+from a few indexed dates, without running the view's query:
+    - the last update of the messages, and of the members
+      (deletions are recorded as updates of the members concerned);
+    - for the feeds read from the viewer's timeline (see TimelineEntry),
+      the viewer's entries of the feed, instead of all the messages and members;
+    - for the events, their occurrences (regenerated daily);
+    - the last change of the viewer's friendships;
+    - for the notifications, the viewer's read watermarks,
+      and the last time the viewer read a conversation;
+    - for the conversations, the last time the viewer read one;
+    - the start of the current period (API_VALIDATORS_PERIOD seconds),
+      as the responses hold relative dates (i.e. ages), and upcoming events.
+The ETag also depends on the viewer and on the query.
+
+Requests whose validators match are answered with 304 Not Modified,
+before the view's query is run or its results formatted.
+
+"""
+import hashlib
+import logging
+import time
+from datetime import datetime
+from functools import wraps
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+from django.views.decorators.http import condition
+from mumlife.models import Member, Message, Friendships, Notifications, Conversation, \
+                           TimelineEntry, EventOccurrence
+
+logger = logging.getLogger('mumlife.api.conditional')
+
+
+def get_period_start():
+    now = time.time()
+    return datetime.utcfromtimestamp(now - now % settings.API_VALIDATORS_PERIOD).replace(tzinfo=timezone.utc)
+
+
+def get_friendships_updated(member):
+    friendships = Friendships.objects.filter(models.Q(from_member=member) | models.Q(to_member=member))
+    return friendships.aggregate(updated=models.Max('updated'))['updated']
+
+
+def get_content_versions(request):
+    """Versions of the messages and members, and of the viewer's friendships."""
+    return [
+        Message.objects.aggregate(updated=models.Max('updated'))['updated'],
+        Member.objects.aggregate(updated=models.Max('updated'))['updated'],
+        get_friendships_updated(request.user.profile),
+    ]
+
+
+def get_messages_versions(request):
+    """Versions of a list of messages.
+
+    The feeds read from the timeline only depend on the viewer's entries:
+    entries are rewritten (with new ids) when their message is saved,
+    and removed when it is deleted, so that the last entry id and the
+    entries count change with the feed; the last update of the messages
+    of the feed follows their replies (see MessageManager.update_thread).
+    The authors profiles are not versioned: their changes are only seen
+    at the next period (see get_period_start()).
+    The events also depend on their occurrences, regenerated daily
+    by the 'update_event_occurrences' command.
+    Other lists depend on all the messages and members.
+    """
+    member = request.user.profile
+    if request.QUERY_PARAMS.get('events', None) is not None:
+        # occurrences are regenerated (with new ids) when their event is saved
+        return get_content_versions(request) + [EventOccurrence.objects.aggregate(last=models.Max('id'))['last']]
+    flag = Member.get_feed_flag(request.QUERY_PARAMS.get('search', None))
+    if not settings.TIMELINE_ENABLED or flag not in TimelineEntry.FEEDS:
+        return get_content_versions(request)
+    entries = TimelineEntry.objects.filter(member=member, feed=TimelineEntry.FEEDS[flag])\
+                                   .aggregate(last=models.Max('id'),
+                                              count=models.Count('id'),
+                                              updated=models.Max('message__updated'))
+    return [entries['last'], entries['count'], entries['updated'], get_friendships_updated(member)]
+
+
+def get_conversations_read_at(member):
+    return Conversation.objects.filter(member=member).aggregate(read_at=models.Max('read_at'))['read_at']
+
+
+def get_notifications_versions(request):
+    """Versions of the notifications: the content, the read watermarks,
+    and the last reading of the conversations (i.e. of the private messages).
+    """
+    member = request.user.profile
+    watermarks = Notifications.objects.filter(member=member)\
+                                      .values_list('messages_read_at', 'events_read_at', 'threads_read_at')
+    return get_content_versions(request) + list(watermarks[0] if watermarks else []) \
+           + [get_conversations_read_at(member)]
+
+
+def get_conversations_versions(request):
+    """Versions of the conversations: the content, and their last reading."""
+    return get_content_versions(request) + [get_conversations_read_at(request.user.profile)]
+
+
+def get_validators(request, get_versions):
+    """Return the ETag and Last-Modified date of the response to the request."""
+    versions = get_versions(request) + [get_period_start()]
+    key = repr((request.path,
+                request.user.id,
+                sorted(request.QUERY_PARAMS.lists()),
+                request.accepted_renderer.format,
+                [v.isoformat() if isinstance(v, datetime) else v for v in versions]))
+    return hashlib.md5(key).hexdigest(), max([v for v in versions if isinstance(v, datetime)])
+
+
+def conditional(get_versions):
+    """Decorate an API view method with conditional GET support.
+    'get_versions' returns the dates the response depends on.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            if not settings.API_CONDITIONAL_GET:
+                return method(self, request, *args, **kwargs)
+            etag, last_modified = get_validators(request, get_versions)
+            view = condition(etag_func=lambda request, *args, **kwargs: etag,
+                             last_modified_func=lambda request, *args, **kwargs: last_modified)\
+                            (lambda request, *args, **kwargs: method(self, request, *args, **kwargs))
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -1,10 +1,15 @@
+import copy
 import json
 import re
 import requests
 import urllib
+import urlparse
 import logging
 from django.conf import settings
 from django.contrib.sites.models import RequestSite
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import QueryDict
+from mumlife import caching
 
 logger = logging.getLogger('mumlife.api.helpers')
 
@@ -14,6 +19,12 @@ class APIResponse(dict):
 
 
 class APIRequest(object):
+    """Fetch API resources on behalf of the current request.
+
+    By default, the API views are dispatched in-process, using the
+    current request's user; set API_IN_PROCESS to False to fall back
+    to the HTTP loopback mode (i.e. when the API is hosted elsewhere).
+    """
 
     def __init__(self, request):
         self.request = request
@@ -23,15 +34,11 @@ class APIRequest(object):
             return False
         return True
 
-    def get(self, **kwargs):
-        resource = kwargs.get('resource')
-        if not resource:
-            return json.dumps(APIResponse({'reason': 'Resource name is required', 'status': 400}))
-        if not self._check_resource(resource):
-            return json.dumps(APIResponse({'reason': 'Resource not implemented', 'status': 400}))
-
-        params = {'format': 'json'}
-
+    def _get_params(self, resource, **kwargs):
+        """Return the API location and query parameters of a resource."""
+        # lists are paginated by cursor, so that scrolling costs the same
+        # whatever the depth (see api.pagination)
+        params = {'cursor': ''}
         if resource == 'message':
             res_loc = 'messages/'
             params['search'] = kwargs.get('search')
@@ -39,14 +46,84 @@ class APIRequest(object):
             params['range'] = kwargs.get('range')
             params['events'] = 'true'
             params['search'] = kwargs.get('search')
+            # window of the events, as dates
+            params['from'] = kwargs.get('start')
+            params['to'] = kwargs.get('end')
             res_loc = 'messages/'
-
         elif resource == 'member':
             res_loc = 'members/'
             params['search'] = kwargs.get('search')
-
         elif resource == 'notification':
             res_loc = 'notifications/'
+            del params['cursor']
+        return res_loc, params
+
+    def get(self, **kwargs):
+        """Return the resource as a JSON string."""
+        return json.dumps(self.fetch(**kwargs), cls=DjangoJSONEncoder)
+
+    def fetch(self, **kwargs):
+        """Return the resource as a Python structure."""
+        resource = kwargs.get('resource')
+        if not resource:
+            return APIResponse({'reason': 'Resource name is required', 'status': 400})
+        if not self._check_resource(resource):
+            return APIResponse({'reason': 'Resource not implemented', 'status': 400})
+
+        res_loc, params = self._get_params(resource, **kwargs)
+        if getattr(settings, 'API_IN_PROCESS', True):
+            return self._dispatch(resource, res_loc, params)
+        return self._fetch_http(res_loc, params)
+
+    def _dispatch(self, resource, res_loc, params):
+        """Call the API view directly, bypassing the network stack.
+
+        The view is given a copy of the current request, so it is run
+        as the logged-in user, with the resource parameters as its query.
+        The request path is set to the API location, so that the links
+        returned (i.e. next page) point to the API.
+        The last response fetched for the same query is revalidated
+        with its ETag, and reused when the API answers 304 Not Modified.
+        """
+        # imported here, as the API views depend on the models,
+        # which might not be ready when this module is loaded
+        from api.views import MemberListView, MessageListView, NotificationListView
+        views = {
+            'message': MessageListView,
+            'event': MessageListView,
+            'member': MemberListView,
+            'notification': NotificationListView,
+        }
+        request = copy.copy(self.request)
+        request.method = 'GET'
+        query = QueryDict('', mutable=True)
+        for key, value in params.items():
+            if value is not None:
+                query[key] = value
+        request.GET = query
+        request.path = request.path_info = '{}{}'.format(urlparse.urlparse(settings.API_URL).path, res_loc)
+        request.META = request.META.copy()
+        request.META['QUERY_STRING'] = query.urlencode()
+        request.META['MUMLIFE_API_IN_PROCESS'] = True
+        # the validators sent with the page do not apply to the API
+        request.META.pop('HTTP_IF_NONE_MATCH', None)
+        request.META.pop('HTTP_IF_MODIFIED_SINCE', None)
+        cached = caching.get_api_response(self.request.user.id, res_loc, params)
+        if cached is not None:
+            request.META['HTTP_IF_NONE_MATCH'] = cached[0]
+        response = views[resource].as_view()(request)
+        if response.status_code == 304 and cached is not None:
+            return APIResponse(cached[1])
+        if response.status_code != 200:
+            return APIResponse({'reason': response.data.get('detail', ''),
+                                'status': response.status_code})
+        if response.has_header('ETag'):
+            caching.set_api_response(self.request.user.id, res_loc, params, response['ETag'], response.data)
+        return APIResponse(response.data)
+
+    def _fetch_http(self, res_loc, params):
+        """Fetch the resource through an HTTP request to the API."""
+        params['format'] = 'json'
 
         if re.search(r'http:|https:', settings.API_URL) is None:
             site = RequestSite(self.request)
@@ -67,15 +144,25 @@ class APIRequest(object):
         except KeyError:
             # 'csrftoken' is not set by the Test Runner,
             # so this will fail
-            return json.dumps(APIResponse({'reason': 'Test run', 'status': 400}))
+            return APIResponse({'reason': 'Test run', 'status': 400})
+        # the last response fetched for the same query is revalidated
+        headers = {}
+        cached = caching.get_api_response(self.request.user.id, res_loc, params)
+        if cached is not None:
+            headers['If-None-Match'] = cached[0]
         try:
-            r = requests.get(url, verify=False, cookies=cookies, params=params)
+            r = requests.get(url, verify=False, cookies=cookies, params=params, headers=headers)
         except requests.exceptions.ConnectionError:
-            return json.dumps(APIResponse({'reason': 'Connection Error (Test run?)', 'status': 400}))
+            return APIResponse({'reason': 'Connection Error (Test run?)', 'status': 400})
         else:
+            if r.status_code == 304 and cached is not None:
+                return APIResponse(cached[1])
             try:
                 response = json.loads(r.text)
             except ValueError:
                 response = {}
+            else:
+                if r.status_code == 200 and 'ETag' in r.headers:
+                    caching.set_api_response(self.request.user.id, res_loc, params, r.headers['ETag'], response)
 
-        return json.dumps(APIResponse(response))
+        return APIResponse(response)
@@ -0,0 +1,41 @@
+# api/instrumentation.py
+"""
+Instrumentation of the API views (see mumlife.instrumentation).
+
+"""
+import logging
+from django.conf import settings
+from mumlife import instrumentation
+
+logger = logging.getLogger('mumlife.api.instrumentation')
+
+
+class InstrumentedViewMixin(object):
+    """Record the queries and timings of the view.
+
+    Requests to the API are recorded by the middleware; the views dispatched
+    in-process (see api.helpers.APIRequest) are recorded here, within the
+    profile of the page which requested them.
+    The response is rendered by the view rather than by the handler,
+    so that the serialization is timed.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        name = self.__class__.__name__
+        profile = instrumentation.current()
+        if not settings.INSTRUMENTATION_ENABLED or (profile is not None and profile.name == name):
+            return super(InstrumentedViewMixin, self).dispatch(request, *args, **kwargs)
+        profile = instrumentation.start(name)
+        try:
+            return super(InstrumentedViewMixin, self).dispatch(request, *args, **kwargs)
+        finally:
+            instrumentation.stop(profile, path=request.path, method=request.method)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super(InstrumentedViewMixin, self).finalize_response(request, response, *args, **kwargs)
+        # in-process responses are read as data, and never rendered
+        if settings.INSTRUMENTATION_ENABLED and hasattr(response, 'render') \
+                and not request.META.get('MUMLIFE_API_IN_PROCESS'):
+            with instrumentation.section('serialize'):
+                response.render()
+        return response
@@ -0,0 +1,99 @@
+# api/pagination.py
+"""
+Keyset (cursor) pagination.
+
+Page-number pagination uses OFFSET, whose cost grows with the page depth,
+and counts the whole QuerySet on each request.
+With keyset pagination, the 'next' link holds the ordering key of the last
+result (the cursor), and the next page is read from the key onwards,
+so each page costs the same, however deep the client scrolls.
+
+The cursor mode is enabled with the 'cursor' query parameter
+(empty for the first page). The total count is only computed
+when 'count=true' is requested.
+
+"""
+import base64
+import json
+import logging
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.dateparse import parse_datetime
+from django.utils.datastructures import SortedDict
+from rest_framework.exceptions import ParseError
+from rest_framework.templatetags.rest_framework import replace_query_param
+
+logger = logging.getLogger('mumlife.api.pagination')
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values, cls=DjangoJSONEncoder))
+
+
+def decode_cursor(cursor):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(str(cursor)))
+    except (TypeError, ValueError):
+        raise ParseError('Invalid cursor.')
+    if not isinstance(values, list):
+        raise ParseError('Invalid cursor.')
+    return values
+
+
+def parse_datetime_key(values):
+    """Return the (datetime, id) key of cursor values."""
+    try:
+        key, id_ = parse_datetime(values[0]), int(values[1])
+    except (IndexError, TypeError, ValueError):
+        raise ParseError('Invalid cursor.')
+    if key is None:
+        # not a datetime (i.e. a tampered cursor)
+        raise ParseError('Invalid cursor.')
+    return key, id_
+
+
+class CursorPaginationMixin(object):
+    """Keyset pagination for list views.
+
+    Views implement:
+        - filter_by_cursor(queryset, values): return the results after the cursor values
+        - get_cursor_values(obj): return the ordering key of an object
+    """
+    cursor_param = 'cursor'
+    count_param = 'count'
+
+    def get_cursor(self):
+        """Return the cursor values; an empty list for the first page,
+        or None when the cursor mode is not requested.
+        """
+        cursor = self.request.QUERY_PARAMS.get(self.cursor_param, None)
+        if cursor is None:
+            return None
+        if not cursor:
+            return []
+        return decode_cursor(cursor)
+
+    def paginate_by_cursor(self, queryset, cursor):
+        """Return the page objects, and the link to the next page."""
+        if cursor:
+            queryset = self.filter_by_cursor(queryset, cursor)
+        # fetch one more object, to know whether there is a next page
+        objects = list(queryset[:self.paginate_by + 1])
+        next_url = None
+        if len(objects) > self.paginate_by:
+            objects = objects[:self.paginate_by]
+            next_url = replace_query_param(self.request.build_absolute_uri(),
+                                           self.cursor_param,
+                                           encode_cursor(self.get_cursor_values(objects[-1])))
+        return objects, next_url
+
+    def get_cursor_response(self, queryset, cursor, results, next_url):
+        data = SortedDict()
+        if self.request.QUERY_PARAMS.get(self.count_param, None) == 'true':
+            data['count'] = queryset.count()
+        elif not cursor and not results:
+            # the first page is empty; no need to count
+            data['count'] = 0
+        data['next'] = next_url
+        data['previous'] = None
+        data['results'] = results
+        return data
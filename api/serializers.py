@@ -43,7 +43,6 @@ class FriendshipsSerializer(serializers.ModelSerializer):
 class MessageSerializer(serializers.ModelSerializer):
     tags = serializers.RelatedField(source='get_tags')
     visibility_display = serializers.RelatedField(source='get_visibility_display')
-    replies = serializers.PrimaryKeyRelatedField(source='replies', many=True, read_only=True)
 
     class Meta:
         model = Message
@@ -52,14 +51,13 @@ class MessageSerializer(serializers.ModelSerializer):
                   'visibility', 'visibility_display', \
                   'occurrence', 'occurs_until', \
                   'tags', 'body', 'picture', \
-                  'is_reply', 'replies')
+                  'is_reply', 'reply_count', 'last_reply_at')
 
 
 class EventSerializer(serializers.ModelSerializer):
     distance = serializers.RelatedField()
     tags = serializers.RelatedField(source='get_tags')
     visibility_display = serializers.RelatedField(source='get_visibility_display')
-    replies = serializers.PrimaryKeyRelatedField(source='replies', many=True, read_only=True)
 
     class Meta:
         model = Message
@@ -68,4 +66,13 @@ class EventSerializer(serializers.ModelSerializer):
                   'visibility', 'visibility_display', \
                   'occurrence', 'occurs_until', \
                   'tags', 'body', 'picture', \
-                  'is_reply', 'replies')
+                  'is_reply', 'reply_count', 'last_reply_at')
+
+
+class FormattedSerializer(serializers.Serializer):
+    """Pass-through serializer, for objects already formatted
+    in batch by mumlife.formatters.Formatter.
+    """
+
+    def to_native(self, obj):
+        return obj
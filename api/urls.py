@@ -3,7 +3,8 @@ from rest_framework.urlpatterns import format_suffix_patterns
 from api.views import MemberListView, MemberView, \
                       KidListView, KidView, \
                       FriendshipsListView, FriendshipView, \
-                      MessageListView, MessageView, MessagePostView, \
+                      MessageListView, MessageView, MessageRepliesView, MessagePostView, \
+                      ConversationListView, ConversationView, \
                       NotificationListView
 
 urlpatterns = patterns('',
@@ -17,8 +18,12 @@ urlpatterns = patterns('',
     url(r'^friendships/(?P<pk>[0-9]+)/$', FriendshipView.as_view(), name='friendship-view'),
     url(r'^messages/$', MessageListView.as_view(), name='messages-list'),
     url(r'^message/(?P<pk>[0-9]+)/$', MessageView.as_view(), name='message-detail'),
+    url(r'^message/(?P<pk>[0-9]+)/replies/$', MessageRepliesView.as_view(), name='message-replies'),
     url(r'^message/post$', MessagePostView.as_view(), name='message-add'),
+    url(r'^conversations/$', ConversationListView.as_view(), name='conversations-list'),
+    url(r'^conversations/(?P<pk>[0-9]+)/$', ConversationView.as_view(), name='conversation-detail'),
     url(r'^notifications/$', NotificationListView.as_view(), name='notifications-list'),
+    url(r'^stats/$', 'api.views.stats', name='stats'),
 
     # include login URLs for the browseable API.
     url(r'^auth/', include('rest_framework.urls', namespace='rest_framework')),
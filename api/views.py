@@ -6,25 +6,34 @@ import operator
 import re
 from django.conf import settings
 from django.core.exceptions import PermissionDenied
+from django.db import models
 from django.http import Http404
 from django.template import loader
 from django.utils import timezone
+from dateutil.relativedelta import relativedelta
+from django.utils.dateparse import parse_date, parse_datetime
 from rest_framework import status
 from rest_framework import views
 from rest_framework import generics
 from rest_framework import permissions
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import ParseError
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.reverse import reverse
 from tagging.models import Tag, TaggedItem
-from mumlife import utils
-from mumlife.models import Member, Kid, Friendships, Message
+from mumlife import caching, instrumentation, utils
+from mumlife.formatters import Formatter
+from mumlife.models import Member, Kid, Friendships, Message, Notifications, Conversation
+from api.conditional import conditional, get_content_versions, get_messages_versions, get_conversations_versions, \
+                            get_notifications_versions
+from api.instrumentation import InstrumentedViewMixin
+from api.pagination import CursorPaginationMixin, parse_datetime_key
 from api.serializers import MemberSerializer, \
                             KidSerializer, \
                             FriendshipsSerializer, \
                             MessageSerializer, \
-                            EventSerializer
+                            FormattedSerializer
 
 logger = logging.getLogger('mumlife.api')
 
@@ -37,20 +46,109 @@ def api_root(request, format=None):
         'kids': reverse('kids-list', request=request, format=format),
         'friendships': reverse('friendships-list', request=request, format=format),
         'messages': reverse('messages-list', request=request, format=format),
+        'conversations': reverse('conversations-list', request=request, format=format),
         'notifications': reverse('notifications-list', request=request, format=format),
+        'stats': reverse('stats', request=request, format=format),
     })
 
 
-class MemberListView(generics.ListAPIView):
+@api_view(('GET', 'DELETE'))
+@permission_classes((permissions.IsAdminUser, ))
+def stats(request, format=None):
+    """Requests statistics of this process, per view (see mumlife.instrumentation).
+    DELETE resets the statistics.
+    """
+    if request.method == 'DELETE':
+        instrumentation.reset_stats()
+    return Response({
+        'enabled': settings.INSTRUMENTATION_ENABLED,
+        'views': instrumentation.get_stats(),
+    })
+
+
+def get_distance_range(request, member):
+    """Return the 'range' query parameter in meters, or None."""
+    range_ = request.QUERY_PARAMS.get('range', None)
+    if range_ is not None:
+        try:
+            # the range can be sent in miles or kilometers
+            # if the range is set in miles, we need to convert is to meters
+            distance_range = float(range_)
+            if member.units == 1:
+                distance_range /= 0.6214
+            return distance_range * 1000
+        except ValueError:
+            # the value passed was not an integer
+            pass
+    return None
+
+
+def _get_list_param(request, name):
+    value = request.QUERY_PARAMS.get(name, None)
+    if not value:
+        return None
+    return [v.strip() for v in value.split(',') if v.strip()]
+
+
+def get_formatter(request, member):
+    """Return the Formatter of the results, set with the query parameters:
+        - 'fields': comma-separated list of the fields returned;
+        - 'compact': 'true' to omit the nested replies and kids,
+          and the alternative renderings of the body and tags;
+        - 'expand': comma-separated list of the fields kept in compact form.
+    """
+    return Formatter(viewer=member,
+                     fields=_get_list_param(request, 'fields'),
+                     expand=_get_list_param(request, 'expand'),
+                     compact=request.QUERY_PARAMS.get('compact', None) == 'true')
+
+
+def _parse_window_param(value, is_end=False):
+    """Return an aware datetime from a date or datetime query parameter.
+    Dates are days in the local time zone: the window starts
+    at the beginning of the 'from' day, and ends at the end of the 'to' day.
+    """
+    try:
+        date = parse_datetime(value)
+        if date is None:
+            day = parse_date(value)
+            if day is None:
+                raise ValueError
+            date = datetime.datetime.combine(day, datetime.time.min)
+            if is_end:
+                date += datetime.timedelta(1)
+    except ValueError:
+        raise ParseError('Invalid date: {}.'.format(value))
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date, timezone.get_default_timezone())
+    return date
+
+
+def get_event_window(request):
+    """Return the 'from' and 'to' query parameters, as aware datetimes (or None)."""
+    start = request.QUERY_PARAMS.get('from', None)
+    end = request.QUERY_PARAMS.get('to', None)
+    start = _parse_window_param(start) if start else None
+    end = _parse_window_param(end, is_end=True) if end else None
+    if start is not None and end is not None and end <= start:
+        raise ParseError('Invalid window: "to" is before "from".')
+    return start, end
+
+
+class MemberListView(InstrumentedViewMixin, CursorPaginationMixin, generics.ListAPIView):
     """List all members.
 
     The distance returned is in meters.
-    The query can be filtered by a lits of Tags (tagging.models.Tag).
+    The query can be filtered by a lits of Tags (tagging.models.Tag),
+    and by a distance range (in the member's units).
+    Results are paginated, by page or by cursor (distance, id).
+    Conditional requests are answered without running the query (see api.conditional).
     """
     model = Member
-    serializer_class = MemberSerializer
+    serializer_class = FormattedSerializer
     paginate_by = settings.MEMBERS_PER_PAGE
     
+    @conditional(get_content_versions)
     def list(self, request, *args, **kwargs):
         search = request.QUERY_PARAMS.get('search', None)
         if search:
@@ -62,29 +160,40 @@ class MemberListView(generics.ListAPIView):
             query_tags = None
         member = request.user.profile
         self.object_list = Member.objects.with_distance_from(viewer=member,
-                                                             query_tags=query_tags)
+                                                             query_tags=query_tags,
+                                                             distance_range=get_distance_range(request, member))
 
-        # Switch between paginated or standard style responses
+        # Switch between cursor, paginated or standard style responses
+        # Serialization is done with Member.format(), in batch.
+        # Doing the formatting here means the operation is only calculated
+        # for the slice MEMBERS_PER_PAGE, instead of the entire QuerySet
+        formatter = get_formatter(request, member)
+        cursor = self.get_cursor()
+        if cursor is not None:
+            objects, next_url = self.paginate_by_cursor(self.object_list, cursor)
+            return Response(self.get_cursor_response(self.object_list, cursor,
+                                                     formatter.format_members(objects), next_url))
         page = self.paginate_queryset(self.object_list)
         if page is not None:
+            page.object_list = formatter.format_members(page.object_list)
             serializer = self.get_pagination_serializer(page)
         else:
-            serializer = self.get_serializer(self.object_list, many=True)
-
-        # Override serialization with Member.format()
-        # Doing the formatting here means the operation is only calculated
-        # for the slice MEMBERS_PER_PAGE, instead of the entire QuerySet
-        results = serializer.data['results'][:]
-        serializer.data['results'] = []
-        for obj in results:
-            _member = Member.objects.get(pk=obj['id'])
-            _member.distance = obj['distance']
-            serializer.data['results'].append(_member.format(member))
+            serializer = self.get_serializer(formatter.format_members(self.object_list), many=True)
 
         return Response(serializer.data)
 
+    def filter_by_cursor(self, queryset, values):
+        try:
+            after = (float(values[0]), int(values[1]))
+        except (IndexError, TypeError, ValueError):
+            raise ParseError('Invalid cursor.')
+        return Member.objects.after_distance_from(queryset, self.request.user.profile, after)
 
-class MemberView(generics.RetrieveUpdateAPIView):
+    def get_cursor_values(self, obj):
+        return [obj.knn_distance, obj.id]
+
+
+class MemberView(InstrumentedViewMixin, generics.RetrieveUpdateAPIView):
     """Allows partial update (PUT/PATCH).
 
     A member can only view/update its own account.
@@ -101,14 +210,14 @@ class MemberView(generics.RetrieveUpdateAPIView):
         return obj
 
 
-class KidListView(generics.ListAPIView):
+class KidListView(InstrumentedViewMixin, generics.ListAPIView):
     """List all kids."""
     queryset = Kid.objects.all()
     serializer_class = KidSerializer
     permissions = (permissions.IsAdminUser,)
 
 
-class KidView(generics.RetrieveUpdateAPIView):
+class KidView(InstrumentedViewMixin, generics.RetrieveUpdateAPIView):
     """Allows partial update (PUT/PATCH).
 
     A member can only view/update its own kids.
@@ -125,7 +234,7 @@ class KidView(generics.RetrieveUpdateAPIView):
         return obj
 
 
-class FriendshipsListView(generics.ListCreateAPIView):
+class FriendshipsListView(InstrumentedViewMixin, generics.ListCreateAPIView):
     model = Friendships
     serializer_class = FriendshipsSerializer
 
@@ -192,76 +301,109 @@ class FriendshipsListView(generics.ListCreateAPIView):
                     obj.to_member.add_friend(obj.from_member, Friendships.APPROVED)
 
 
-class FriendshipView(generics.RetrieveUpdateDestroyAPIView):
+class FriendshipView(InstrumentedViewMixin, generics.RetrieveUpdateDestroyAPIView):
     model = Friendships
     serializer_class = FriendshipsSerializer
     permissions = (permissions.IsAdminUser,)
 
 
-class MessageListView(generics.ListAPIView):
+class MessageListView(InstrumentedViewMixin, CursorPaginationMixin, generics.ListAPIView):
     """List messages for the logged-in user.
 
-    Results are paginated.
+    Results are paginated, by page or by cursor
+    (timestamp, id for messages; start, id for events occurrences).
+    Words of the search which are not tags are searched in the messages text;
+    with 'order=rank', messages are ordered by relevance, and paginated by page.
+
+    Events can be restricted to a window, with the 'from' and 'to' parameters
+    (dates, or datetimes). With 'calendar', the number of events per day
+    is returned instead, within the window (by default, from today until
+    the events occurrences horizon).
+    Conditional requests are answered without running the query (see api.conditional).
     """
     model = Message
-    serializer_class = MessageSerializer
+    serializer_class = FormattedSerializer
     paginate_by = settings.MESSAGES_PER_PAGE
 
+    @conditional(get_messages_versions)
     def list(self, request, *args, **kwargs):
         search = request.QUERY_PARAMS.get('search', None)
         member = request.user.profile
 
         # Adding 'events' as a query parameter tells us to return events only.
         show_events = request.QUERY_PARAMS.get('events', None)
+        ranked = show_events is None and request.QUERY_PARAMS.get('order', None) == 'rank'
         distance_range = None # Nationwide
         if show_events is not None:
             # Events are fetched in a different way
             # particularly, the results need to be in a specific distance range
-            range_ = request.QUERY_PARAMS.get('range', None)
-            if range_ is not None:
-                try:
-                    # the range can be sent in miles or kilometers
-                    # if the range is set in miles, we need to convert is to meters
-                    distance_range = float(range_)
-                    if member.units == 1:
-                        distance_range /= 0.6214
-                    distance_range *= 1000
-                except ValueError:
-                    # the value passed was not an integer
-                    pass
-            self.object_list = member.get_events(search=search,
-                                                 distance_range=distance_range)
-            self.serializer_class = EventSerializer
+            # Events are listed by occurrence, which are paginated in the database
+            distance_range = get_distance_range(request, member)
+            start, end = get_event_window(request)
+            if request.QUERY_PARAMS.get('calendar', None) is not None:
+                return self.get_calendar(member, search, distance_range, start, end)
+            self.object_list = member.get_event_occurrences(search=search,
+                                                            distance_range=distance_range,
+                                                            start=start,
+                                                            end=end)
         else:
-            self.object_list = member.get_messages(search=search)
+            self.object_list = member.get_messages(search=search, ranked=ranked)
+
+        def get_messages(objects):
+            if show_events is not None:
+                # occurrences are formatted as their event, dated at the occurrence
+                return [occurrence.as_message() for occurrence in objects]
+            return objects
 
-        # Switch between paginated or standard style responses
+        # Switch between cursor, paginated or standard style responses
+        # Serialization is done with Message.format(), in batch.
+        # Doing the formatting here means the operation is only calculated
+        # for the slice MESSAGES_PER_PAGE, instead of the entire QuerySet.
+        formatter = get_formatter(request, member)
+        # the relevance is not a cursor key
+        cursor = self.get_cursor() if not ranked else None
+        if cursor is not None:
+            objects, next_url = self.paginate_by_cursor(self.object_list, cursor)
+            return Response(self.get_cursor_response(self.object_list, cursor,
+                                                     formatter.format_messages(get_messages(objects)), next_url))
         page = self.paginate_queryset(self.object_list)
         if page is not None:
+            page.object_list = formatter.format_messages(get_messages(page.object_list))
             serializer = self.get_pagination_serializer(page)
         else:
-            serializer = self.get_serializer(self.object_list, many=True)
-
-        # Override serialization with Message.format()
-        # Doing the formatting here means the operation is only calculated
-        # for the slice MESSAGES_PER_PAGE, instead of the entire QuerySet
-        results = serializer.data['results'][:]
-        serializer.data['results'] = []
-        for obj in results:
-            _message = Message.objects.get(pk=obj['id'])
-            # This is not the nicest way of doing it, but all data
-            # added for occurences will be destroyed in the new Message object,
-            # as well as the distance we just calculated.
-            # So we need to add those back in.
-            if show_events is not None:
-                _message.distance = obj['distance']
-                _message.eventdate = obj['eventdate']
-            serializer.data['results'].append(_message.format(member))
+            serializer = self.get_serializer(formatter.format_messages(get_messages(self.object_list)), many=True)
 
         return Response(serializer.data)
 
-
-class MessagePostView(APIView):
+    def get_calendar(self, member, search, distance_range, start, end):
+        if start is None:
+            start = timezone.localtime(timezone.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+        if end is None:
+            end = start + relativedelta(months=+settings.EVENTS_HORIZON_MONTHS)
+        days = member.get_events_calendar(search=search, distance_range=distance_range, start=start, end=end)
+        return Response({
+            'from': start,
+            'to': end,
+            'count': sum([count for day, count in days]),
+            'results': [{'date': day.isoformat(), 'count': count} for day, count in days],
+        })
+
+    def filter_by_cursor(self, queryset, values):
+        key, id_ = parse_datetime_key(values)
+        if self.request.QUERY_PARAMS.get('events', None) is not None:
+            # occurrences are in chronological order
+            return queryset.filter(models.Q(start__gt=key) | models.Q(start=key, id__gt=id_))
+        # messages are in reverse chronological order
+        return queryset.filter(models.Q(timestamp__lt=key) | models.Q(timestamp=key, id__lt=id_))
+
+    def get_cursor_values(self, obj):
+        # dates are encoded with their microseconds, which the JSON encoder would truncate
+        if self.request.QUERY_PARAMS.get('events', None) is not None:
+            return [obj.start.isoformat(), obj.id]
+        return [obj.timestamp.isoformat(), obj.id]
+
+
+class MessagePostView(InstrumentedViewMixin, APIView):
     """Provide PUT and PATCH methods.
 
     Post new Message or Reply (PUT),
@@ -419,7 +561,7 @@ class MessagePostView(APIView):
         return Response(serializer.data)
 
 
-class MessageView(generics.RetrieveUpdateDestroyAPIView):
+class MessageView(InstrumentedViewMixin, generics.RetrieveUpdateDestroyAPIView):
     model = Message
     serializer_class = MessageSerializer
 
@@ -431,40 +573,184 @@ class MessageView(generics.RetrieveUpdateDestroyAPIView):
         return obj
 
 
-class NotificationListView(views.APIView):
-    """List all notifications for the logged-in user."""
+class MessageRepliesView(InstrumentedViewMixin, CursorPaginationMixin, generics.ListAPIView):
+    """List the replies of a message, in chronological order.
+
+    The feeds only include the last replies of the messages (REPLIES_PREVIEW);
+    the threads are expanded with this view.
+    Results are paginated, by page or by cursor (timestamp, id).
+    Replies to private and friends messages are only listed to the members
+    who can see the message.
+    """
+    model = Message
+    serializer_class = FormattedSerializer
+    paginate_by = settings.REPLIES_PER_PAGE
+
+    @conditional(get_content_versions)
+    def list(self, request, *args, **kwargs):
+        member = request.user.profile
+        try:
+            message = Message.objects.get(pk=kwargs['pk'], is_reply=False)
+        except Message.DoesNotExist:
+            raise Http404
+        if member.id != message.member_id:
+            if message.visibility == Message.PRIVATE and member.id != message.recipient_id:
+                raise PermissionDenied
+            if message.visibility == Message.FRIENDS \
+                    and message.member_id not in member.friendship_graph.get_friend_ids(Friendships.APPROVED):
+                raise PermissionDenied
+        self.object_list = Message.objects.filter(is_reply=True, reply_to=message).order_by('timestamp', 'id')
+
+        formatter = get_formatter(request, member)
+        cursor = self.get_cursor()
+        if cursor is not None:
+            objects, next_url = self.paginate_by_cursor(self.object_list, cursor)
+            return Response(self.get_cursor_response(self.object_list, cursor,
+                                                     formatter.format_messages(objects), next_url))
+        page = self.paginate_queryset(self.object_list)
+        if page is not None:
+            page.object_list = formatter.format_messages(page.object_list)
+            serializer = self.get_pagination_serializer(page)
+        else:
+            serializer = self.get_serializer(formatter.format_messages(self.object_list), many=True)
+
+        return Response(serializer.data)
+
+    def filter_by_cursor(self, queryset, values):
+        key, id_ = parse_datetime_key(values)
+        # replies are in chronological order
+        return queryset.filter(models.Q(timestamp__gt=key) | models.Q(timestamp=key, id__gt=id_))
+
+    def get_cursor_values(self, obj):
+        return [obj.timestamp.isoformat(), obj.id]
+
+
+class ConversationListView(InstrumentedViewMixin, CursorPaginationMixin, generics.ListAPIView):
+    """List the conversations of the logged-in user (see mumlife.models.Conversation),
+    the most recent first, with their correspondent, last message and number of unread messages.
+
+    Results are paginated, by page or by cursor (last_message_at, id).
+    """
+    model = Conversation
+    serializer_class = FormattedSerializer
+    paginate_by = settings.MESSAGES_PER_PAGE
+
+    @conditional(get_conversations_versions)
+    def list(self, request, *args, **kwargs):
+        member = request.user.profile
+        self.object_list = member.get_conversations()
+
+        formatter = get_formatter(request, member)
+        cursor = self.get_cursor()
+        if cursor is not None:
+            objects, next_url = self.paginate_by_cursor(self.object_list, cursor)
+            return Response(self.get_cursor_response(self.object_list, cursor,
+                                                     formatter.format_conversations(objects), next_url))
+        page = self.paginate_queryset(self.object_list)
+        if page is not None:
+            page.object_list = formatter.format_conversations(page.object_list)
+            serializer = self.get_pagination_serializer(page)
+        else:
+            serializer = self.get_serializer(formatter.format_conversations(self.object_list), many=True)
+
+        return Response(serializer.data)
+
+    def filter_by_cursor(self, queryset, values):
+        key, id_ = parse_datetime_key(values)
+        return queryset.filter(models.Q(last_message_at__lt=key) | models.Q(last_message_at=key, id__lt=id_))
+
+    def get_cursor_values(self, obj):
+        return [obj.last_message_at.isoformat(), obj.id]
+
+
+class ConversationView(InstrumentedViewMixin, CursorPaginationMixin, generics.ListAPIView):
+    """List the private messages between the logged-in user and a member,
+    in reverse chronological order.
+    The conversation is marked as read with a POST.
+
+    Results are paginated, by page or by cursor (timestamp, id).
+    """
+    model = Message
+    serializer_class = FormattedSerializer
+    paginate_by = settings.MESSAGES_PER_PAGE
+
+    @conditional(get_content_versions)
+    def list(self, request, *args, **kwargs):
+        member = request.user.profile
+        try:
+            other = Member.objects.get(pk=kwargs['pk'])
+        except Member.DoesNotExist:
+            raise Http404
+        self.object_list = Conversation.objects.get_messages(member, other).order_by('-timestamp', '-id')
+
+        formatter = get_formatter(request, member)
+        cursor = self.get_cursor()
+        if cursor is not None:
+            objects, next_url = self.paginate_by_cursor(self.object_list, cursor)
+            return Response(self.get_cursor_response(self.object_list, cursor,
+                                                     formatter.format_messages(objects), next_url))
+        page = self.paginate_queryset(self.object_list)
+        if page is not None:
+            page.object_list = formatter.format_messages(page.object_list)
+            serializer = self.get_pagination_serializer(page)
+        else:
+            serializer = self.get_serializer(formatter.format_messages(self.object_list), many=True)
+
+        return Response(serializer.data)
+
+    def filter_by_cursor(self, queryset, values):
+        key, id_ = parse_datetime_key(values)
+        return queryset.filter(models.Q(timestamp__lt=key) | models.Q(timestamp=key, id__lt=id_))
+
+    def get_cursor_values(self, obj):
+        return [obj.timestamp.isoformat(), obj.id]
+
+    def post(self, request, *args, **kwargs):
+        """Mark the conversation as read."""
+        member = request.user.profile
+        try:
+            other = Member.objects.get(pk=kwargs['pk'])
+        except Member.DoesNotExist:
+            raise Http404
+        Conversation.objects.mark_read(member, other)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class NotificationListView(InstrumentedViewMixin, views.APIView):
+    """List all notifications for the logged-in user.
+
+    Results are cached per member, for NOTIFICATIONS_CACHE_TTL seconds,
+    or until a related message or friendship changes.
+    Conditional requests are answered without reading the cache (see api.conditional).
+
+    As for the lists of messages, 'fields' restricts the keys of the response;
+    in 'compact' form, the HTML rendering of the results is omitted,
+    unless 'html_content' is expanded.
+    """
     permissions = (permissions.IsAuthenticated,)
 
+    @conditional(get_notifications_versions)
     def get(self, request, format=None):
         account = self.request.user.profile
+        response = caching.get_notifications(account.id)
+        if response is None:
+            response = self.get_notifications(account)
+            caching.set_notifications(account.id, response)
+        return Response(get_formatter(request, account).select(response))
+
+    def get_notifications(self, account):
         r = account.get_notifications()
 
         # Format results
         html_content = ''
-        notification_messages = account.notifications.messages.all()
-        notification_events = account.notifications.events.all()
-        notification_threads = account.notifications.threads.all()
+        unread = 0
+        # legacy - members might have no notifications read state
+        read_state, created = Notifications.objects.get_or_create(member=account)
         for result in r['results']:
-            if result['type'] in ('events', 'messages', 'threads'):
-                # ManyToMany fields, notification is read if in list
-                if result['type'] == 'events':
-                    read = result['event']['id'] in \
-                           [m['id'] for m in notification_events.values('id')]
-                elif result['type'] == 'messages':
-                    read = True
-                    for message in result['messages']:
-                        if message['id'] not in [m['id'] for m in notification_messages.values('id')]:
-                            read = False
-                            break
-                else:
-                    # Threads
-                    read = True
-                    for message in result['thread']['messages']:
-                        if message['id'] not in [m['id'] for m in notification_threads.values('id')]:
-                            read = False
-                            break
-            else:
-                read = getattr(account.notifications, result['type'])
+            read = read_state.is_read(result)
+            result['read'] = read
+            if not read:
+                unread += 1
             template = 'tags/notification-{}.html'.format(result['type'])
             html_data = copy.deepcopy(result)
             if result['type'] == 'threads':
@@ -483,7 +769,8 @@ class NotificationListView(views.APIView):
 
         response = {
             'total': r['count'],
+            'unread': unread,
             'results': r['results'],
             'html_content': html_content,
         }
-        return Response(response)
+        return response
@@ -25,6 +25,92 @@ AUTHENTICATION_BACKENDS = (
 
 MESSAGES_PER_PAGE = 12
 MEMBERS_PER_PAGE = 12
+REPLIES_PER_PAGE = 20
+
+# Messages in the feeds include their number of replies,
+# and only their last REPLIES_PREVIEW replies
+# (the others are listed by the replies API)
+REPLIES_PREVIEW = 3
+
+# API views are called in-process by APIRequest;
+# set to False to fetch them over HTTP, from API_URL
+API_IN_PROCESS = True
+
+# The API list views answer conditional requests (ETag, Last-Modified)
+# with 304 Not Modified when nothing changed (see api.conditional);
+# validators also change every API_VALIDATORS_PERIOD seconds,
+# as the responses hold relative dates
+API_CONDITIONAL_GET = True
+API_VALIDATORS_PERIOD = 60
+
+# The cache must be shared by all the processes serving the site (memcached),
+# as the cached notifications, friendships, API responses and distance indexes
+# versions are invalidated by the process handling the change (see mumlife.caching).
+# A process-local cache (i.e. LocMemCache, for development) is only safe with
+# a single process: otherwise, the invalidated entries are kept at most
+# LOCAL_CACHE_TTL seconds.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+        'LOCATION': '127.0.0.1:11211',
+        'KEY_PREFIX': 'mumlife',
+    }
+}
+LOCAL_CACHE_TTL = 10
+
+# The responses fetched by APIRequest are kept for this number of seconds,
+# and revalidated with their ETag
+API_CACHE_TTL = 300
+
+# Notifications are cached per member for this number of seconds
+NOTIFICATIONS_CACHE_TTL = 300
+
+# Members friendships are cached for this number of seconds
+# (invalidated when friendships change)
+FRIENDSHIPS_CACHE_TTL = 3600
+
+# Recurring events occurrences are generated for this number of months
+# (see the 'update_event_occurrences' command)
+EVENTS_HORIZON_MONTHS = 1
+
+# Messages feeds (@local, @friends, @private) are read from the members timelines,
+# written when messages are posted; run the 'build_timelines' command when enabling
+TIMELINE_ENABLED = False
+
+# Members and events are filtered and ordered by distance with PostGIS ('postgis'),
+# or in-process where PostGIS is unavailable ('haversine'; see mumlife.distances)
+DISTANCE_ENGINE = 'postgis'
+# The in-process coordinates of members and events are reloaded after this number of seconds
+DISTANCE_INDEX_TTL = 300
+
+# Number of postcodes geocodes kept in memory, per process (see mumlife.geocoding)
+GEOCODING_CACHE_SIZE = 10000
+
+# Uploads are stored under their content hash, so that identical files are shared
+# (see mumlife.uploads); set to False to store them under their original names
+UPLOADS_CONTENT_ADDRESSED = True
+
+# Record the number of queries, database time and the slowest statements
+# of each request (see mumlife.instrumentation); the results are logged,
+# sent in the response headers when DEBUG is set, and aggregated per view
+# at the API 'stats/' endpoint
+INSTRUMENTATION_ENABLED = False
+# Number of slowest statements kept, per request and per view
+INSTRUMENTATION_SLOWEST = 5
+
+# Sized variants generated for the uploaded images, from the smallest
+# to the largest, as (name, (width, height), crop); see mumlife.images
+IMAGE_VARIANTS = (
+    ('avatar', (150, 150), True),
+    ('feed', (640, 640), False),
+    ('full', (1600, 1600), False),
+)
+# JPEG quality of the variants, and of the rotated images
+IMAGE_QUALITY = 85
+# Number of threads generating the variants, per process
+IMAGE_WORKERS = 2
+# The variants available are cached per image for this number of seconds
+IMAGES_CACHE_TTL = 3600
 
 # Hosts/domain names that are valid for this site; required if DEBUG is False
 # See https://docs.djangoproject.com/en/1.5/ref/settings/#allowed-hosts
@@ -93,6 +179,8 @@ MIDDLEWARE_CLASSES = (
     'django.contrib.messages.middleware.MessageMiddleware',
     # Uncomment the next line for simple clickjacking protection:
     # 'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # records the requests, including the in-process API calls of MumlifeMiddleware
+    'mumlife.middleware.InstrumentationMiddleware',
     'mumlife.middleware.MumlifeMiddleware'
 )
 
@@ -35,6 +35,12 @@ DATABASES = {
     }
 }
 
+# development server only (single process); see CACHES in common
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
 
 ALLOWED_HOSTS = ['*']
 
@@ -0,0 +1,63 @@
+# geo/management/commands/import_postcode_points.py
+"""
+Import the full postcodes locations from a CSV dataset.
+
+The dataset must have a header row, with at least the columns
+'postcode', 'latitude' and 'longitude' (e.g. the ONS Postcode Directory,
+converted to WGS84). The existing points are replaced.
+
+"""
+import csv
+from optparse import make_option
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from geo.models import PostcodePoint, normalize_postcode
+
+
+class Command(BaseCommand):
+    args = '<dataset.csv>'
+    help = 'Import the postcodes locations from a CSV dataset.'
+    option_list = BaseCommand.option_list + (
+        make_option('--batch-size', type='int', dest='batch_size', default=5000,
+                    help='Number of rows inserted per query'),
+    )
+
+    def handle(self, *args, **options):
+        if len(args) != 1:
+            raise CommandError('The path of the CSV dataset is required.')
+        try:
+            dataset = open(args[0], 'rb')
+        except IOError as e:
+            raise CommandError(e)
+        with dataset:
+            reader = csv.DictReader(dataset)
+            columns = dict([(c.strip().lower(), c) for c in reader.fieldnames or []])
+            if not all(c in columns for c in ('postcode', 'latitude', 'longitude')):
+                raise CommandError('The dataset must have the columns: postcode, latitude, longitude.')
+            imported = self.load(reader, columns, options['batch_size'])
+        self.stdout.write('Imported {} postcode(s).'.format(imported))
+
+    @transaction.commit_on_success
+    def load(self, reader, columns, batch_size):
+        PostcodePoint.objects.all().delete()
+        imported = 0
+        seen = set()
+        batch = []
+        for row in reader:
+            postcode = normalize_postcode(row[columns['postcode']])
+            try:
+                latitude = float(row[columns['latitude']])
+                longitude = float(row[columns['longitude']])
+            except (TypeError, ValueError):
+                # terminated postcodes have no location
+                continue
+            if not postcode or postcode in seen:
+                continue
+            seen.add(postcode)
+            batch.append(PostcodePoint(postcode=postcode, latitude=latitude, longitude=longitude))
+            if len(batch) >= batch_size:
+                PostcodePoint.objects.bulk_create(batch)
+                imported += len(batch)
+                batch = []
+        PostcodePoint.objects.bulk_create(batch)
+        return imported + len(batch)
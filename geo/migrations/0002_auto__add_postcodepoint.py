@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+import datetime
+from south.db import db
+from south.v2 import SchemaMigration
+from django.db import models
+
+
+class Migration(SchemaMigration):
+
+    def forwards(self, orm):
+        # Adding model 'PostcodePoint'
+        db.create_table(u'geo_postcodepoint', (
+            (u'id', self.gf('django.db.models.fields.AutoField')(primary_key=True)),
+            ('postcode', self.gf('django.db.models.fields.CharField')(unique=True, max_length=8)),
+            ('latitude', self.gf('django.db.models.fields.FloatField')()),
+            ('longitude', self.gf('django.db.models.fields.FloatField')()),
+        ))
+        db.send_create_signal(u'geo', ['PostcodePoint'])
+
+
+    def backwards(self, orm):
+        # Deleting model 'PostcodePoint'
+        db.delete_table(u'geo_postcodepoint')
+
+
+    models = {
+        u'geo.postcode': {
+            'Meta': {'object_name': 'Postcode'},
+            'active_postcodes': ('django.db.models.fields.IntegerField', [], {'null': 'True', 'blank': 'True'}),
+            'easting': ('django.db.models.fields.IntegerField', [], {'null': 'True', 'blank': 'True'}),
+            'grid_ref': ('django.db.models.fields.CharField', [], {'max_length': '255', 'null': 'True', 'blank': 'True'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'latitude': ('django.db.models.fields.FloatField', [], {}),
+            'longitude': ('django.db.models.fields.FloatField', [], {}),
+            'northing': ('django.db.models.fields.IntegerField', [], {'null': 'True', 'blank': 'True'}),
+            'postcode': ('django.db.models.fields.CharField', [], {'unique': 'True', 'max_length': '255'}),
+            'postcodes': ('django.db.models.fields.IntegerField', [], {'null': 'True', 'blank': 'True'}),
+            'region': ('django.db.models.fields.CharField', [], {'max_length': '255'}),
+            'town_area': ('django.db.models.fields.TextField', [], {})
+        },
+        u'geo.postcodepoint': {
+            'Meta': {'object_name': 'PostcodePoint'},
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'latitude': ('django.db.models.fields.FloatField', [], {}),
+            'longitude': ('django.db.models.fields.FloatField', [], {}),
+            'postcode': ('django.db.models.fields.CharField', [], {'unique': 'True', 'max_length': '8'})
+        }
+    }
+
+    complete_apps = ['geo']
\ No newline at end of file
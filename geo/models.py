@@ -1,4 +1,19 @@
+import re
+import threading
 from django.db import models
+from django.db.models.signals import post_save, post_delete
+
+
+def normalize_postcode(postcode):
+    """Return a full postcode in upper case, with a single gap
+       between the outward and inward codes (i.e.: SE22 0NH).
+    """
+    postcode = re.sub(r'\s+', '', postcode or '').upper()
+    if len(postcode) < 5:
+        return postcode
+    # the inward code is always 3 characters long
+    return '{} {}'.format(postcode[:-3], postcode[-3:])
+
 
 class PostcodeManager(models.Manager):
     def all_areas(self):
@@ -37,3 +52,59 @@ class Postcode(models.Model):
 
     def __repr__(self):
         return '<Postcode {} [{} {}] / {}>'.format(self.postcode, self.longitude, self.latitude, self.region)
+
+
+class PostcodeAreas(object):
+    """Registry of the postcode areas (i.e.: SE22).
+
+    The areas are loaded on first use, rather than when the module is imported,
+    and held in a frozenset for constant-time lookups.
+    They are reloaded on refresh(), i.e. when Postcodes change.
+    """
+
+    def __init__(self):
+        self._areas = None
+        self._lock = threading.Lock()
+
+    @property
+    def areas(self):
+        areas = self._areas
+        if areas is None:
+            with self._lock:
+                if self._areas is None:
+                    self._areas = frozenset(Postcode.objects.all_areas())
+                areas = self._areas
+        return areas
+
+    def refresh(self):
+        """Discard the loaded areas; they are reloaded on next use."""
+        self._areas = None
+
+    def __contains__(self, area):
+        return area in self.areas
+
+    def __iter__(self):
+        return iter(self.areas)
+
+    def __len__(self):
+        return len(self.areas)
+
+POSTCODE_AREAS = PostcodeAreas()
+
+
+def refresh_postcode_areas(sender, instance, **kwargs):
+    POSTCODE_AREAS.refresh()
+post_save.connect(refresh_postcode_areas, sender=Postcode)
+post_delete.connect(refresh_postcode_areas, sender=Postcode)
+
+
+class PostcodePoint(models.Model):
+    """Location of full postcodes (i.e.: SE22 0NH),
+       imported in bulk from a postcodes dataset (see the 'import_postcode_points' command).
+    """
+    postcode = models.CharField(max_length=8, unique=True)
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+
+    def __unicode__(self):
+        return '{} [{} {}]'.format(self.postcode, self.longitude, self.latitude)
@@ -4,6 +4,7 @@ from django.contrib import admin
 from django.conf import settings
 from django.contrib.auth.models import User, Group
 from django.contrib.auth.admin import UserAdmin, GroupAdmin
+from django.contrib.admin.views.main import ChangeList
 from django.utils import timezone
 from mumlife.models import Member, Kid, Friendships, Message, Notifications, Geocode, Page
 from geo.models import Postcode
@@ -161,12 +162,31 @@ class MessageHasValidPostcodeListFilter(admin.SimpleListFilter):
         return queryset
 
 
+class MessageChangeList(ChangeList):
+    """Search the messages with the full-text index, rather than with
+    one ILIKE per word and field.
+    """
+
+    def get_query_set(self, request):
+        query, self.query = self.query, ''
+        try:
+            qs = super(MessageChangeList, self).get_query_set(request)
+        finally:
+            self.query = query
+        if query:
+            qs = Message.objects.search(qs, query)
+        return qs
+
+
 class MessageAdmin(admin.ModelAdmin):
     list_display = ('title', 'area', 'postcode', 'member', 'timestamp', 'visibility', 'eventdate', 'tags', 'is_reply', 'is_event')
     list_filter = ('area', 'is_reply', MessageIsEventListFilter, MessageHasValidPostcodeListFilter)
     search_fields = ('name', 'body', 'tags')
     inlines = (MessageAdminInline,)
     
+    def get_changelist(self, request, **kwargs):
+        return MessageChangeList
+
     def title(self, obj):
         if obj.name:
             return obj.name
@@ -0,0 +1,256 @@
+# mumlife/benchmarks.py
+"""
+Benchmarks of the feeds, events, members and notifications queries,
+on synthetic data (see the 'benchmark' command).
+
+DataGenerator creates a seeded dataset: members spread over the postcode
+areas, friendships, messages with replies and tags, and weekly events.
+The dataset is grown to each size in turn, and each operation is run
+for a sample of viewers, reporting per call:
+    - the number of queries;
+    - the wall time;
+    - the peak memory, i.e. the growth of the maximum resident set size.
+Each measurement runs in a forked process, so that the memory peaks
+of an operation do not hide the next ones, and the caches are cold.
+
+"""
+import gc
+import logging
+import multiprocessing
+import random
+import resource
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils import timezone
+from mumlife.models import Member, Message, Friendships, Geocode
+
+logger = logging.getLogger('mumlife.benchmarks')
+
+# postcode areas, with the latitude and longitude of their centre;
+# used when the database holds no geo.Postcode
+DEFAULT_AREAS = [
+    ('SE1', 51.4995, -0.0925),
+    ('SE5', 51.4740, -0.0920),
+    ('SE15', 51.4700, -0.0650),
+    ('SE16', 51.4975, -0.0527),
+    ('SE21', 51.4400, -0.0880),
+    ('SE22', 51.4537, -0.0710),
+    ('SW9', 51.4680, -0.1150),
+    ('E1', 51.5170, -0.0600),
+    ('N1', 51.5380, -0.0990),
+    ('W1', 51.5140, -0.1420),
+]
+
+TAGS = ['parks', 'playgroup', 'nct', 'swimming', 'buggy-friendly', 'baby_massage', 'sleep', 'weaning']
+WORDS = ('anyone know a good place for lunch with a toddler near the park on saturday morning '
+         'we are meeting at the cafe bring snacks and buggies the class starts at ten').split()
+INCODE_LETTERS = 'ABDEFGHJLNPQRSTUWXYZ'
+
+# visibility of the messages, with their weights
+VISIBILITIES = [(Message.LOCAL, 5), (Message.GLOBAL, 2), (Message.FRIENDS, 2), (Message.PRIVATE, 1)]
+
+
+class DataGenerator(object):
+    """
+    Seeded generator of members, friendships, messages and events.
+
+    'areas' is a list of (postcode area, latitude, longitude).
+    generate() grows the dataset to the given number of members;
+    for each member, the other figures are averages.
+
+    """
+    def __init__(self, areas, seed=0, friends=5, messages=4, replies=0.3, events=0.1):
+        self.areas = areas
+        self.random = random.Random(seed)
+        self.friends = friends
+        self.messages = messages
+        self.replies = replies
+        self.events = events
+        self.members = []
+        self._visibilities = [v for v, weight in VISIBILITIES for i in range(weight)]
+
+    def get_postcode(self, area):
+        return '{} {}{}{}'.format(area,
+                                  self.random.randint(0, 9),
+                                  self.random.choice(INCODE_LETTERS),
+                                  self.random.choice(INCODE_LETTERS))
+
+    def get_body(self):
+        words = [self.random.choice(WORDS) for i in range(self.random.randint(5, 40))]
+        for tag in self.random.sample(TAGS, self.random.randint(0, 2)):
+            words.insert(self.random.randint(0, len(words)), '#{}'.format(tag))
+        return ' '.join(words)
+
+    def generate(self, size):
+        """Grow the dataset to 'size' members."""
+        start = len(self.members)
+        if size <= start:
+            return
+        # the members postcodes are geocoded from the Geocode table,
+        # around the centre of their area (one postcode per member, as geocodes are unique)
+        geocodes = []
+        postcodes = set(Geocode.objects.values_list('code', flat=True))
+        for i in range(start, size):
+            area, latitude, longitude = self.random.choice(self.areas)
+            postcode = self.get_postcode(area)
+            while postcode in postcodes:
+                postcode = self.get_postcode(area)
+            postcodes.add(postcode)
+            geocodes.append(Geocode(code=postcode,
+                                    latitude=latitude + self.random.uniform(-0.01, 0.01),
+                                    longitude=longitude + self.random.uniform(-0.01, 0.01)))
+        Geocode.objects.bulk_create(geocodes)
+        members = [self.create_member(i, geocode.code) for i, geocode in zip(range(start, size), geocodes)]
+        self.members.extend(members)
+        for member in members:
+            self.create_friendships(member)
+        for member in members:
+            self.create_messages(member)
+        self.spread_timestamps()
+
+    def create_member(self, i, postcode):
+        user = User.objects.create(username='benchmark{}'.format(i),
+                                   email='benchmark{}@mumlife.co.uk'.format(i))
+        member = user.profile
+        member.fullname = 'Member {}'.format(i)
+        member.postcode = postcode
+        member.gender = self.random.choice([Member.IS_MUM, Member.IS_DAD, Member.IS_BUMP])
+        member.save()
+        return member
+
+    def create_friendships(self, member):
+        candidates = [m for m in self.members if m.id != member.id]
+        for friend in self.random.sample(candidates, min(self.friends, len(candidates))):
+            if self.random.random() < 0.8:
+                member.add_friend(friend, status=Friendships.APPROVED)
+                friend.add_friend(member, status=Friendships.APPROVED)
+            else:
+                member.add_friend(friend, status=Friendships.PENDING)
+
+    def create_message(self, member, **kwargs):
+        return Message.objects.create(member=member,
+                                      area=member.area,
+                                      body=self.get_body(),
+                                      tags='#{}'.format(member.area.lower()),
+                                      **kwargs)
+
+    def create_messages(self, member):
+        for i in range(self.random.randint(0, 2 * self.messages)):
+            visibility = self.random.choice(self._visibilities)
+            recipient = self.random.choice(self.members) if visibility == Message.PRIVATE else None
+            message = self.create_message(member, visibility=visibility, recipient=recipient)
+            if self.random.random() < self.replies:
+                for j in range(self.random.randint(1, 3)):
+                    self.create_message(self.random.choice(self.members),
+                                        visibility=visibility,
+                                        is_reply=True,
+                                        reply_to=message)
+        if self.random.random() < self.events:
+            eventdate = timezone.now() + timedelta(days=self.random.randint(0, 14),
+                                                   hours=self.random.randint(8, 18))
+            self.create_message(member,
+                                eventdate=eventdate,
+                                occurrence=Message.OCCURS_WEEKLY,
+                                occurs_until=(eventdate + timedelta(weeks=8)).date(),
+                                location='Community Hall, London {}'.format(member.postcode))
+
+    def spread_timestamps(self):
+        """Spread the messages over the last 30 days, by id."""
+        cursor = connection.cursor()
+        cursor.execute("UPDATE mumlife_message SET timestamp = now() - (id * 7919 % 43200) * interval '1 minute'")
+        transaction.commit_unless_managed()
+
+
+def get_operations():
+    """Return the operations benchmarked, as (name, function(viewer))."""
+    page = settings.MESSAGES_PER_PAGE
+    operations = []
+    for flag in ('@local', '@global', '@friends', '@private'):
+        operations.append(('get_messages {}'.format(flag),
+                           lambda viewer, flag=flag: list(viewer.get_messages(search=flag)[:page])))
+    for distance_range in (None, 2000, 10000):
+        operations.append(('get_events range={}'.format(distance_range),
+                           lambda viewer, r=distance_range: viewer.get_events(distance_range=r)))
+    for distance_range in (None, 5000):
+        operations.append(('with_distance_from range={}'.format(distance_range),
+                           lambda viewer, r=distance_range: list(Member.objects.with_distance_from(viewer=viewer,
+                                                                                                   distance_range=r)[:page])))
+    operations.append(('get_notifications', lambda viewer: viewer.get_notifications()))
+    return operations
+
+
+def _measure(operation, viewer_ids, conn):
+    """Run the operation for each viewer; run in a forked process."""
+    try:
+        viewers = list(Member.objects.filter(id__in=viewer_ids))
+        cache.clear()
+        connection.use_debug_cursor = True
+        gc.collect()
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        queries = len(connection.queries)
+        start = time.time()
+        for viewer in viewers:
+            operation(viewer)
+        elapsed = time.time() - start
+        conn.send({
+            'calls': len(viewers),
+            'queries': len(connection.queries) - queries,
+            'time': elapsed,
+            'memory': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss,
+        })
+    except Exception as e:
+        logger.exception(e)
+        conn.send(None)
+    finally:
+        connection.close()
+        conn.close()
+
+
+def measure(operation, viewer_ids):
+    """Return the figures of an operation, or None if it failed."""
+    # the forked process opens its own connection
+    connection.close()
+    parent_conn, child_conn = multiprocessing.Pipe()
+    process = multiprocessing.Process(target=_measure, args=(operation, viewer_ids, child_conn))
+    process.start()
+    result = parent_conn.recv()
+    process.join()
+    return result
+
+
+def run(areas, sizes, viewers=20, seed=0, stdout=None):
+    """Grow the dataset to each size, and benchmark the operations.
+    Return the results as a list of (size, operation name, figures).
+    """
+    generator = DataGenerator(areas, seed=seed)
+    rand = random.Random(seed)
+    results = []
+    for size in sorted(sizes):
+        start = time.time()
+        generator.generate(size)
+        if stdout is not None:
+            stdout.write('Generated {} members, {} messages in {:.1f}s.\n'.format(size,
+                                                                                 Message.objects.count(),
+                                                                                 time.time() - start))
+        viewer_ids = [m.id for m in rand.sample(generator.members, min(viewers, size))]
+        for name, operation in get_operations():
+            figures = measure(operation, viewer_ids)
+            results.append((size, name, figures))
+            if stdout is not None:
+                stdout.write(format_result(size, name, figures) + '\n')
+    return results
+
+
+def format_result(size, name, figures):
+    if figures is None:
+        return '{:>7} {:<30} failed'.format(size, name)
+    calls = figures['calls'] or 1
+    return '{:>7} {:<30} {:>8.1f} queries {:>9.2f} ms {:>8} KB'.format(size,
+                                                                      name,
+                                                                      figures['queries'] / float(calls),
+                                                                      figures['time'] * 1000 / calls,
+                                                                      figures['memory'])
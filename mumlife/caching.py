@@ -0,0 +1,156 @@
+# mumlife/caching.py
+"""
+Cache helpers.
+
+Notifications are expensive to compute (private messages, events of the day,
+friend requests and threads), so the Notification API result is cached
+per member, until either the TTL expires or a related object changes.
+
+The friendships of a member (see mumlife.models.FriendshipGraph) are cached
+the same way, until one of the member's friendships is saved or deleted.
+
+The progress of the uploaded images derivatives (see mumlife.images)
+is cached per image, so that the best variant available is known
+without checking the files.
+
+The API responses fetched by api.helpers.APIRequest are cached
+with their ETag, per user and query, to be revalidated (see api.conditional).
+
+The in-process distance indexes (see mumlife.distances) are versioned
+in the cache, so that a change in one process reloads them in the others.
+
+Invalidations only reach the other processes through a shared cache
+(see CACHES); with a process-local cache, the entries invalidated
+on change are kept at most LOCAL_CACHE_TTL seconds.
+
+"""
+import hashlib
+import logging
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils.encoding import force_bytes
+
+logger = logging.getLogger('mumlife.caching')
+
+NOTIFICATIONS_KEY = 'mumlife:notifications:{}:{}'
+# Events are notified to all members in range,
+# so their changes are tracked by a single, global version
+NOTIFICATIONS_EVENTS_VERSION_KEY = 'mumlife:notifications:events'
+FRIENDSHIPS_KEY = 'mumlife:friendships:{}'
+IMAGES_KEY = 'mumlife:images:{}'
+API_RESPONSES_KEY = 'mumlife:api:{}:{}'
+DISTANCE_INDEX_VERSION_KEY = 'mumlife:distances:{}'
+
+
+def is_shared():
+    """Return whether the cache is shared by the processes."""
+    return not isinstance(cache, (LocMemCache, DummyCache))
+
+if not is_shared():
+    logger.warning('The cache is process-local: invalidations do not reach the other processes.')
+
+
+def _get_ttl(ttl):
+    """Return the TTL of an entry invalidated on change."""
+    if is_shared():
+        return ttl
+    return min(ttl, settings.LOCAL_CACHE_TTL)
+
+
+def _get_events_version():
+    version = cache.get(NOTIFICATIONS_EVENTS_VERSION_KEY)
+    if version is None:
+        # the version is seeded with the current time,
+        # so that keys left from an expired version are never reused
+        version = int(time.time())
+        cache.add(NOTIFICATIONS_EVENTS_VERSION_KEY, version)
+        version = cache.get(NOTIFICATIONS_EVENTS_VERSION_KEY, version)
+    return version
+
+
+def _get_notifications_key(member_id):
+    return NOTIFICATIONS_KEY.format(member_id, _get_events_version())
+
+
+def get_notifications(member_id):
+    """Return the cached notifications for a member, or None."""
+    return cache.get(_get_notifications_key(member_id))
+
+
+def set_notifications(member_id, data):
+    # the events version, and the invalidations, might not reach the other processes
+    cache.set(_get_notifications_key(member_id), data, _get_ttl(settings.NOTIFICATIONS_CACHE_TTL))
+
+
+def invalidate_notifications(*member_ids):
+    cache.delete_many([_get_notifications_key(mid) for mid in member_ids if mid is not None])
+
+
+def invalidate_events_notifications():
+    """Invalidate all members notifications."""
+    try:
+        cache.incr(NOTIFICATIONS_EVENTS_VERSION_KEY)
+    except ValueError:
+        # the version has expired from the cache;
+        # it will be seeded again on the next read
+        pass
+
+
+def get_friendship_graph(member_id):
+    """Return the cached friendship graph of a member, or None."""
+    return cache.get(FRIENDSHIPS_KEY.format(member_id))
+
+
+def set_friendship_graph(member_id, graph):
+    cache.set(FRIENDSHIPS_KEY.format(member_id), graph, _get_ttl(settings.FRIENDSHIPS_CACHE_TTL))
+
+
+def invalidate_friendship_graphs(*member_ids):
+    cache.delete_many([FRIENDSHIPS_KEY.format(mid) for mid in member_ids if mid is not None])
+
+
+def _get_image_key(name):
+    # images names are paths, which are not valid cache keys
+    return IMAGES_KEY.format(hashlib.md5(force_bytes(name)).hexdigest())
+
+
+def get_image_status(name):
+    """Return the cached derivatives status of an image, or None."""
+    return cache.get(_get_image_key(name))
+
+
+def set_image_status(name, status):
+    cache.set(_get_image_key(name), status, settings.IMAGES_CACHE_TTL)
+
+
+def _get_api_response_key(user_id, resource, params):
+    query = hashlib.md5(force_bytes(repr((resource, sorted(params.items()))))).hexdigest()
+    return API_RESPONSES_KEY.format(user_id, query)
+
+
+def get_api_response(user_id, resource, params):
+    """Return the cached (etag, data) of an API response, or None."""
+    return cache.get(_get_api_response_key(user_id, resource, params))
+
+
+def set_api_response(user_id, resource, params, etag, data):
+    cache.set(_get_api_response_key(user_id, resource, params), (etag, data), settings.API_CACHE_TTL)
+
+
+def get_distance_index_version(name):
+    """Return the shared version of a distance index, or None."""
+    return cache.get(DISTANCE_INDEX_VERSION_KEY.format(name))
+
+
+def invalidate_distance_index(name):
+    """Change the shared version of a distance index, and return it."""
+    key = DISTANCE_INDEX_VERSION_KEY.format(name)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # seeded with the current time, as the events version
+        cache.add(key, int(time.time()))
+        return cache.get(key)
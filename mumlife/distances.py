@@ -0,0 +1,337 @@
+# mumlife/distances.py
+"""
+In-process distance engine.
+
+Distances are computed from the geocodes ('longitude latitude') with the
+haversine formula, on a sphere of the Earth's mean radius; they are within
+0.5% of the PostGIS geography distances, which is below the precision displayed.
+With NumPy, the distances from a point are computed in one vectorized pass;
+without it, one by one.
+
+The engine is used:
+    - by the Formatter and format(), to compute the distances of a page
+      of members and messages in batch, without querying the database;
+    - through DistanceIndex, which holds the coordinates of all members,
+      or all upcoming events, in arrays, to filter and order them by distance
+      from a viewer where PostGIS is unavailable (DISTANCE_ENGINE = 'haversine');
+      RankedQuerySet reads the objects in the order of the ranking, a page at a time.
+
+"""
+import bisect
+import itertools
+import logging
+import math
+import threading
+import time
+from django.conf import settings
+from django.db.models import Q
+from mumlife import caching, geocoding
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+logger = logging.getLogger('mumlife.distances')
+
+# mean radius, in meters
+EARTH_RADIUS = 6371008.8
+# decimal digits of the distances ranked (i.e. to the millimeter):
+# the distances are ordering keys, which must be the same whether computed
+# with or without numpy, and once sent in a cursor
+KEY_DIGITS = 3
+
+
+def parse_geocode(geocode):
+    """Return the (longitude, latitude) of a geocode, or None if it is not resolved."""
+    if not geocode or geocode == geocoding.UNRESOLVED:
+        return None
+    try:
+        longitude, latitude = [float(value) for value in geocode.split()]
+    except ValueError:
+        return None
+    return longitude, latitude
+
+
+def _haversine(origin, point):
+    lng0, lat0 = origin
+    lng, lat = point
+    a = math.sin((lat - lat0) / 2) ** 2 + math.cos(lat0) * math.cos(lat) * math.sin((lng - lng0) / 2) ** 2
+    return 2 * EARTH_RADIUS * math.asin(math.sqrt(min(a, 1.0)))
+
+
+def _haversine_array(origin, points):
+    """'points' is an array of (longitude, latitude) in radians."""
+    lng0, lat0 = origin
+    lngs, lats = points[:, 0], points[:, 1]
+    a = numpy.sin((lats - lat0) / 2) ** 2 + numpy.cos(lat0) * numpy.cos(lats) * numpy.sin((lngs - lng0) / 2) ** 2
+    return 2 * EARTH_RADIUS * numpy.arcsin(numpy.sqrt(numpy.minimum(a, 1.0)))
+
+
+def get_distances(geocode, geocodes):
+    """Return the distances in meters from a geocode to each of the geocodes;
+    None for the geocodes not resolved (or if the origin is not resolved).
+    """
+    origin = parse_geocode(geocode)
+    points = [parse_geocode(g) for g in geocodes]
+    if origin is None:
+        return [None] * len(points)
+    origin = (math.radians(origin[0]), math.radians(origin[1]))
+    resolved = [p for p in points if p is not None]
+    if numpy is not None and resolved:
+        computed = iter(_haversine_array(origin, numpy.radians(numpy.array(resolved, dtype=float))).tolist())
+    else:
+        computed = iter([_haversine(origin, (math.radians(p[0]), math.radians(p[1]))) for p in resolved])
+    return [None if p is None else next(computed) for p in points]
+
+
+def get_distance(geocode_from, geocode_to):
+    """Return the distance in meters between two geocodes, or None."""
+    return get_distances(geocode_from, [geocode_to])[0]
+
+
+def set_distances(viewer, objects):
+    """Set the distance from the viewer on the objects which have none, in one pass."""
+    objects = [obj for obj in objects if not hasattr(obj, 'distance')]
+    if viewer is None or not objects:
+        return
+    for obj, distance in zip(objects, get_distances(viewer.geocode, [obj.geocode for obj in objects])):
+        obj.distance = distance
+
+
+class DistanceIndex(object):
+    """Coordinates of a set of objects, to rank them by distance.
+
+    'loader' returns the (id, geocode) pairs of the objects.
+    They are loaded on first use, and reloaded after DISTANCE_INDEX_TTL seconds.
+    When an object moves, update() replaces its coordinates in this process,
+    and the other processes reload the index, whose version is shared
+    in the cache under 'name'.
+    """
+
+    def __init__(self, loader, name):
+        self.loader = loader
+        self.name = name
+        self._data = None
+        self._loaded_at = 0
+        self._version = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        ids, points = [], []
+        for id_, geocode in self.loader():
+            point = parse_geocode(geocode)
+            if point is not None:
+                ids.append(id_)
+                points.append((math.radians(point[0]), math.radians(point[1])))
+        if numpy is not None:
+            return numpy.array(ids, dtype=numpy.int64), numpy.array(points, dtype=float).reshape(-1, 2)
+        return ids, points
+
+    def _is_stale(self, version):
+        return self._data is None or version != self._version \
+               or time.time() - self._loaded_at > settings.DISTANCE_INDEX_TTL
+
+    def get_data(self):
+        version = caching.get_distance_index_version(self.name)
+        data = self._data
+        if self._is_stale(version):
+            with self._lock:
+                if self._is_stale(version):
+                    self._data = self._load()
+                    self._loaded_at = time.time()
+                    self._version = version
+                data = self._data
+        return data
+
+    def refresh(self):
+        """Discard the loaded coordinates, in all processes; they are reloaded on next use."""
+        self._data = None
+        caching.invalidate_distance_index(self.name)
+
+    def _get_point(self, data, id_):
+        ids, points = data
+        if numpy is not None:
+            found = numpy.nonzero(ids == id_)[0]
+            return tuple(points[found[0]].tolist()) if len(found) else None
+        try:
+            return points[ids.index(id_)]
+        except ValueError:
+            return None
+
+    def _set_point(self, data, id_, point):
+        # the arrays are copied, as they might be read by other threads
+        ids, points = data
+        if numpy is not None:
+            kept = ids != id_
+            ids, points = ids[kept], points[kept]
+            if point is not None:
+                ids = numpy.append(ids, numpy.array([id_], dtype=numpy.int64))
+                points = numpy.vstack([points, numpy.array([point], dtype=float)])
+            return ids, points
+        entries = [(i, p) for i, p in zip(ids, points) if i != id_]
+        if point is not None:
+            entries.append((id_, point))
+        return [i for i, p in entries], [p for i, p in entries]
+
+    def update(self, id_, geocode):
+        """Set the coordinates of an object (None to remove it), in place of reloading the index.
+        Nothing is done when they are unchanged.
+        """
+        point = parse_geocode(geocode)
+        if point is not None:
+            point = (math.radians(point[0]), math.radians(point[1]))
+        data = self.get_data()
+        if self._get_point(data, id_) == point:
+            return
+        with self._lock:
+            if self._data is not None:
+                self._data = self._set_point(self._data, id_, point)
+                self._version = caching.invalidate_distance_index(self.name)
+
+    def discard(self, id_):
+        self.update(id_, None)
+
+    def rank(self, geocode, distance_range=None):
+        """Return the (id, distance) pairs of the objects within range of the geocode
+        (in meters; all objects if None), ordered by distance and id.
+        Distances are rounded to KEY_DIGITS.
+        """
+        origin = parse_geocode(geocode)
+        if origin is None:
+            return []
+        origin = (math.radians(origin[0]), math.radians(origin[1]))
+        ids, points = self.get_data()
+        if not len(ids):
+            return []
+        if numpy is not None:
+            distances = numpy.round(_haversine_array(origin, points), KEY_DIGITS)
+            if distance_range is not None:
+                within = distances <= distance_range
+                ids, distances = ids[within], distances[within]
+            order = numpy.lexsort((ids, distances))
+            return zip(ids[order].tolist(), distances[order].tolist())
+        ranked = [(round(_haversine(origin, point), KEY_DIGITS), id_) for id_, point in zip(ids, points)]
+        if distance_range is not None:
+            ranked = [(d, id_) for d, id_ in ranked if d <= distance_range]
+        ranked.sort()
+        return [(id_, d) for d, id_ in ranked]
+
+
+class RankedQuerySet(object):
+    """The objects of a QuerySet, in the order of their (id, distance) ranking by a DistanceIndex.
+
+    The ranking is filtered by the ids of the QuerySet (one query, on the ids only),
+    then sliced in-process: only the ids of the objects read (i.e. of a page)
+    are sent to the database. The objects get their distance from the ranking,
+    as 'distance' and 'knn_distance' (the ordering key, with the id).
+    """
+    fetch_size = 500
+
+    def __init__(self, queryset, ranked=None, keys=None):
+        self.queryset = queryset
+        self.ranked = ranked
+        self._keys = keys
+
+    def get_keys(self):
+        """Return the (distance, id) keys of the objects, in order."""
+        if self._keys is None:
+            ids = set(self.queryset.values_list('id', flat=True))
+            self._keys = [(distance, id_) for id_, distance in self.ranked if id_ in ids]
+        return self._keys
+
+    def after(self, key):
+        """Return the objects ordered after the (distance, id) key (i.e. keyset pagination)."""
+        keys = self.get_keys()
+        return RankedQuerySet(self.queryset, keys=keys[bisect.bisect_right(keys, tuple(key)):])
+
+    def count(self):
+        return len(self.get_keys())
+
+    def __len__(self):
+        return self.count()
+
+    def __iter__(self):
+        keys = self.get_keys()
+        for start in range(0, len(keys), self.fetch_size):
+            for obj in self._fetch(keys[start:start + self.fetch_size]):
+                yield obj
+
+    def __getitem__(self, k):
+        if isinstance(k, slice):
+            return self._fetch(self.get_keys()[k])
+        return self._fetch([self.get_keys()[k]])[0]
+
+    def _fetch(self, keys):
+        objects = self.queryset.in_bulk([id_ for distance, id_ in keys])
+        results = []
+        for distance, id_ in keys:
+            obj = objects.get(id_)
+            if obj is not None:
+                obj.distance = obj.knn_distance = distance
+                results.append(obj)
+        return results
+
+
+class RankedFilter(object):
+    """The objects of a QuerySet related to the objects of a ranking by a DistanceIndex
+    (i.e. the occurrences of the events in range), in the order of the QuerySet.
+
+    The QuerySet must be ordered by (key_field, id): it is read by chunks, from the key
+    of the last object read onwards, and the chunks are filtered in-process on 'field'
+    (the id of the related object ranked). No list of the ids ranked is sent to the
+    database, and only the chunks needed to fill a page are read.
+    The objects get their distance from the ranking, as 'distance'.
+    """
+    fetch_size = 500
+
+    def __init__(self, queryset, ranked, field, key_field):
+        self.queryset = queryset
+        self.distances = ranked if isinstance(ranked, dict) else dict(ranked)
+        self.field = field
+        self.key_field = key_field
+
+    def filter(self, *args, **kwargs):
+        return RankedFilter(self.queryset.filter(*args, **kwargs), self.distances, self.field, self.key_field)
+
+    def _read(self, queryset, get_key):
+        """Yield the rows of the QuerySet, read by chunks."""
+        last = None
+        while True:
+            chunk = queryset
+            if last is not None:
+                chunk = chunk.filter(Q(**{'{}__gt'.format(self.key_field): last[0]}) |
+                                     Q(**{self.key_field: last[0], 'id__gt': last[1]}))
+            rows = list(chunk[:self.fetch_size])
+            for row in rows:
+                yield row
+            if len(rows) < self.fetch_size:
+                return
+            last = get_key(rows[-1])
+
+    def values_list(self, field, flat=True):
+        """Return the values of a field of the objects (flat only)."""
+        rows = self._read(self.queryset.values_list(self.key_field, 'id', self.field, field),
+                          lambda row: row[:2])
+        return [row[3] for row in rows if row[2] in self.distances]
+
+    def count(self):
+        return len(self.values_list('id'))
+
+    def __len__(self):
+        return self.count()
+
+    def __iter__(self):
+        for obj in self._read(self.queryset, lambda obj: (getattr(obj, self.key_field), obj.id)):
+            distance = self.distances.get(getattr(obj, self.field))
+            if distance is not None:
+                obj.distance = distance
+                yield obj
+
+    def __getitem__(self, k):
+        if isinstance(k, slice):
+            return list(itertools.islice(iter(self), k.start, k.stop))
+        try:
+            return next(itertools.islice(iter(self), k, None))
+        except StopIteration:
+            raise IndexError(k)
@@ -0,0 +1,154 @@
+# mumlife/formatters.py
+"""
+Batch formatting of Members and Messages.
+
+Member.format() and Message.format() query the database for each object
+(author groups, friendship status, distance, kids and replies).
+The Formatter loads this data for a whole page of objects at once,
+in a constant number of queries, and attaches it to the objects before
+formatting them; the distances from the viewer are computed in-process
+(see mumlife.distances). Only the last replies of the messages are formatted.
+
+The formatted objects can be restricted to a set of fields, and reduced
+to a compact form, which omits the nested replies and kids, and the
+alternative renderings of the body and tags. The data behind the omitted
+fields is then not loaded.
+
+"""
+import logging
+from django.conf import settings
+from django.contrib.auth.models import User
+from mumlife import distances, instrumentation
+from mumlife.models import Member, Kid, Message
+
+logger = logging.getLogger('mumlife.formatters')
+
+# fields omitted in compact form, unless expanded;
+# 'kids' are the kids of the members, including the messages authors,
+# 'html_content' the HTML rendering of the notifications
+COMPACT_OMITTED = ('replies', 'kids', 'body_with_links', 'synopsis', 'tags_item', 'tags_inline', 'html_content')
+
+
+class Formatter(object):
+    """
+    'fields' restricts the formatted objects to these fields (the 'id' is always included);
+    'compact' omits the COMPACT_OMITTED fields, except those in 'expand'.
+    """
+
+    def __init__(self, viewer=None, fields=None, expand=None, compact=False):
+        self.viewer = viewer
+        self.fields = set(fields) | set(['id']) if fields else None
+        self.omitted = set(COMPACT_OMITTED) - set(expand or []) if compact else set()
+
+    def is_included(self, field):
+        return field not in self.omitted and (self.fields is None or field in self.fields)
+
+    def select(self, data, nested=None):
+        """Remove the fields not included from a formatted object,
+        and from its 'nested' formatted objects.
+        """
+        data = dict([(k, v) for k, v in data.items() if self.is_included(k)])
+        for field in (nested or []):
+            if isinstance(data.get(field), dict):
+                for omitted in self.omitted.intersection(data[field]):
+                    del data[field][omitted]
+        return data
+
+    def format_members(self, members):
+        members = list(members)
+        with instrumentation.section('format'):
+            self.prefetch_members(members, kids=self.is_included('kids'))
+            return [self.select(member.format(viewer=self.viewer)) for member in members]
+
+    def format_messages(self, messages):
+        messages = list(messages)
+        with instrumentation.section('format'):
+            self.prefetch_messages(messages)
+            return [self.select(message.format(viewer=self.viewer), nested=('member', 'recipient'))
+                    for message in messages]
+
+    def format_conversations(self, conversations):
+        """Format the conversations of the viewer, with their correspondent and last message."""
+        conversations = list(conversations)
+        members = [c.other for c in conversations]
+        messages = [c.last_message for c in conversations if c.last_message is not None]
+        with instrumentation.section('format'):
+            self.prefetch_members(members, kids=self.is_included('kids'))
+            self.prefetch_messages(messages)
+            results = []
+            for conversation in conversations:
+                last_message = conversation.last_message
+                results.append(self.select({
+                    'id': conversation.id,
+                    'member': conversation.other.format(viewer=self.viewer),
+                    'last_message': last_message.format(viewer=self.viewer) if last_message is not None else None,
+                    'last_message_at': conversation.last_message_at,
+                    'unread': conversation.unread,
+                    'read_at': conversation.read_at,
+                }, nested=('member', 'last_message')))
+            return results
+
+    def prefetch_messages(self, messages):
+        """Attach authors, recipients, parents and last replies to messages
+        (the REPLIES_PREVIEW last replies; the number of replies is held by the messages).
+        """
+        parents = [m for m in messages if not m.is_reply]
+        replies = {}
+        if self.is_included('replies'):
+            replies = Message.objects.get_last_replies(set([m.id for m in parents if m.reply_count]),
+                                                       settings.REPLIES_PREVIEW)
+        for message in parents:
+            message._replies = replies.get(message.id, [])
+        all_messages = messages + [r for m in parents for r in m._replies]
+
+        # parents of replies (only their id is formatted)
+        reply_to = dict([(m.id, m) for m in parents])
+        reply_to_ids = set([m.reply_to_id for m in all_messages if m.reply_to_id is not None]) - set(reply_to)
+        if reply_to_ids:
+            reply_to.update(Message.objects.in_bulk(reply_to_ids))
+
+        # authors and recipients
+        member_ids = set()
+        for message in all_messages:
+            member_ids.add(message.member_id)
+            if message.recipient_id is not None:
+                member_ids.add(message.recipient_id)
+        members = self.get_members(member_ids)
+        distances.set_distances(self.viewer, [m for m in all_messages if m.eventdate is not None])
+        for message in all_messages:
+            message.member = members[message.member_id]
+            if message.recipient_id is not None:
+                message.recipient = members[message.recipient_id]
+            if message.reply_to_id is not None:
+                message.reply_to = reply_to[message.reply_to_id]
+
+    def get_members(self, member_ids):
+        """Return members by id, with their data prefetched."""
+        members = dict([(m.id, m) for m in Member.objects.select_related('user').filter(id__in=member_ids)])
+        self.prefetch_members(members.values(), kids='kids' not in self.omitted)
+        return members
+
+    def prefetch_members(self, members, kids=True):
+        """Attach administrator status and kids (unless 'kids' is False) to members,
+        and load the viewer's friendships status.
+        """
+        if not members:
+            return
+        admins = set(User.groups.through.objects.filter(user__id__in=[m.user_id for m in members],
+                                                        group__name='Administrators')\
+                                                .values_list('user_id', flat=True))
+        relations = {}
+        if kids:
+            for relation in Kid.parents.through.objects.filter(member__id__in=[m.id for m in members])\
+                                                       .exclude(kid__visibility=Kid.HIDDEN)\
+                                                       .select_related('kid')\
+                                                       .order_by('kid__id'):
+                relations.setdefault(relation.member_id, []).append(relation.kid)
+        for member in members:
+            member._is_admin = member.user_id in admins
+            member._kids = relations.get(member.id, [])
+        # the distances from the viewer are computed in batch, in-process
+        distances.set_distances(self.viewer, members)
+        if self.viewer is not None:
+            # loads the viewer's friendships, once
+            self.viewer.friendship_graph
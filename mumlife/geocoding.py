@@ -0,0 +1,100 @@
+# mumlife/geocoding.py
+"""
+Postcodes geocoding.
+
+Postcodes are resolved from local data only, so that saving a Member
+or a Message never waits on the network. The lookups go through:
+    - an in-memory LRU cache (per process);
+    - the Geocode table (postcodes already resolved);
+    - the postcodes dataset (geo.PostcodePoint), imported in bulk
+      with the 'import_postcode_points' command.
+Many postcodes are resolved at once, in a constant number of queries.
+
+Postcodes that cannot be resolved locally are stored as UNRESOLVED,
+and geocoded later with the 'geocode_postcodes' command.
+
+"""
+import logging
+from django.conf import settings
+from django.db import transaction, IntegrityError
+from geo.models import PostcodePoint, normalize_postcode
+from mumlife import utils
+
+logger = logging.getLogger('mumlife.geocoding')
+
+UNRESOLVED = '0.0 0.0'
+
+_cache = utils.LRUCache(settings.GEOCODING_CACHE_SIZE)
+
+
+def _store(geocodes):
+    """Store resolved geocodes; the codes stored concurrently are skipped."""
+    from mumlife.models import Geocode
+    sid = transaction.savepoint()
+    try:
+        Geocode.objects.bulk_create(geocodes)
+    except IntegrityError:
+        transaction.savepoint_rollback(sid)
+        stored = set(Geocode.objects.filter(code__in=[g.code for g in geocodes]).values_list('code', flat=True))
+        sid = transaction.savepoint()
+        try:
+            Geocode.objects.bulk_create([g for g in geocodes if g.code not in stored])
+        except IntegrityError:
+            transaction.savepoint_rollback(sid)
+            logger.warning('Geocodes stored concurrently: {}'.format(', '.join([g.code for g in geocodes])))
+        else:
+            transaction.savepoint_commit(sid)
+    else:
+        transaction.savepoint_commit(sid)
+
+
+def resolve_many(postcodes):
+    """Return the geocodes ('longitude latitude') of the postcodes, by postcode.
+
+    Postcodes not found locally are not included.
+    All the spellings of a postcode (e.g. 'SE16 4JX' and 'se164jx') are resolved.
+    """
+    # imported here, as the models depend on this module
+    from mumlife.models import Geocode
+    results = {}
+    missing = set()
+    for postcode in postcodes:
+        if not postcode:
+            continue
+        geocode = _cache.get(postcode)
+        if geocode is None:
+            missing.add(postcode)
+        else:
+            results[postcode] = geocode
+    if not missing:
+        return results
+
+    # postcodes are stored with a single gap, as in the dataset;
+    # they were stored as entered before, so both are looked up
+    spellings = {}
+    for postcode in missing:
+        spellings.setdefault(normalize_postcode(postcode), []).append(postcode)
+    found = {}
+    for geocode in Geocode.objects.filter(code__in=missing | set(spellings)):
+        for postcode in spellings.get(normalize_postcode(geocode.code), []):
+            found[postcode] = str(geocode)
+    unresolved = [code for code, inputs in spellings.items() if inputs[0] not in found]
+    if unresolved:
+        geocodes = [Geocode(code=point.postcode,
+                            latitude=point.latitude,
+                            longitude=point.longitude)
+                    for point in PostcodePoint.objects.filter(postcode__in=unresolved)]
+        _store(geocodes)
+        for geocode in geocodes:
+            for postcode in spellings[geocode.code]:
+                found[postcode] = str(geocode)
+
+    for postcode, geocode in found.items():
+        _cache.set(postcode, geocode)
+    results.update(found)
+    return results
+
+
+def resolve(postcode):
+    """Return the geocode of a postcode, or UNRESOLVED."""
+    return resolve_many([postcode]).get(postcode, UNRESOLVED)
@@ -2,21 +2,166 @@
 """
 Image manipulation module.
 
+Uploaded images are stored as they are, and their sized variants
+(settings.IMAGE_VARIANTS) are generated in the background, by a pool
+of worker threads; e.g. 'member/2013/10/01/me.jpg' has the variants
+'member/2013/10/01/me.avatar.jpg', 'me.feed.jpg' and 'me.full.jpg'.
+Until a variant is generated, the next larger one, or the original,
+is used instead (see ImageDerivatives.get_url()).
+Rotations re-encode the original, so they are run by the same workers,
+before the variants are generated again (see rotate_picture()).
+
 """
 import json
 import logging
 import os
+import tempfile
+import threading
+from multiprocessing.pool import ThreadPool
 from django.conf import settings
+from django.db import connection
+from django.core.files.storage import default_storage
 from django.utils.datastructures import MultiValueDictKeyError
 from django.http import HttpResponse, HttpResponseBadRequest, Http404, HttpResponseNotAllowed
-from PIL import Image
+from django.utils import timezone
+from PIL import Image, ImageOps
+from mumlife import caching
 
 logger = logging.getLogger('mumlife.images')
 
+VARIANTS = [variant for variant, size, crop in settings.IMAGE_VARIANTS]
+
+_pool = None
+_pool_lock = threading.Lock()
+# rotations of the same image are applied in turn
+_rotation_lock = threading.Lock()
+
 
 class ImageException(Exception):
     pass
 
+
+def get_pool():
+    """Return the worker pool generating the variants, created on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPool(settings.IMAGE_WORKERS)
+    return _pool
+
+
+def is_variant(name):
+    """Return whether an image is a variant of another image."""
+    root, ext = os.path.splitext(name)
+    return os.path.splitext(root)[1][1:] in VARIANTS
+
+
+class ImageDerivatives(object):
+    """
+    Sized variants of an uploaded image.
+
+    'name' is the image path, relative to MEDIA_ROOT.
+    The progress of the variants is tracked in the cache, as
+    {'status': PENDING|PROCESSING|DONE|FAILED, 'variants': [variants generated]}.
+
+    """
+    PENDING = 'pending'
+    PROCESSING = 'processing'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    def __init__(self, name):
+        self.name = name
+        self.path = os.path.join(settings.MEDIA_ROOT, name)
+
+    def get_name(self, variant):
+        root, ext = os.path.splitext(self.name)
+        return '{}.{}{}'.format(root, variant, ext)
+
+    def get_path(self, variant):
+        return os.path.join(settings.MEDIA_ROOT, self.get_name(variant))
+
+    def get_status(self):
+        status = caching.get_image_status(self.name)
+        if status is None:
+            # not generated by this process (i.e. the 'process_images' command);
+            # the files are checked once, until the status expires
+            variants = [v for v in VARIANTS if os.path.isfile(self.get_path(v))]
+            status = {
+                'status': self.DONE if len(variants) == len(VARIANTS) else self.PENDING,
+                'variants': variants
+            }
+            caching.set_image_status(self.name, status)
+        return status
+
+    def set_status(self, status, variants=None):
+        caching.set_image_status(self.name, {'status': status, 'variants': variants or []})
+
+    def get_url(self, variant):
+        """Return the URL of the best variant available:
+        the variant requested, the next larger one, or the original image.
+        """
+        available = self.get_status()['variants']
+        for candidate in VARIANTS[VARIANTS.index(variant):]:
+            if candidate in available:
+                return default_storage.url(self.get_name(candidate))
+        return default_storage.url(self.name)
+
+    def submit(self):
+        """Generate the variants in the background."""
+        # the previous variants, if any, are outdated (i.e. the image was rotated)
+        self.set_status(self.PENDING)
+        get_pool().apply_async(generate_derivatives, (self.name,))
+
+    def generate(self):
+        """Generate the variants, from the largest to the smallest;
+        each variant is resized from the previous one.
+        Return whether all variants were generated.
+        """
+        self.set_status(self.PROCESSING)
+        done = []
+        try:
+            image = Image.open(self.path)
+            image_format = image.format
+            if image_format == 'JPEG':
+                # decode the JPEG at the smallest scale fitting the largest variant
+                image.draft('RGB', settings.IMAGE_VARIANTS[-1][1])
+            if image.mode not in ('RGB', 'RGBA', 'L'):
+                # i.e. palette images, resized in full colours
+                image = image.convert('RGB' if image_format == 'JPEG' else 'RGBA')
+            for variant, size, crop in reversed(settings.IMAGE_VARIANTS):
+                if crop:
+                    resized = ImageOps.fit(image, size, Image.ANTIALIAS)
+                else:
+                    resized = image.copy()
+                    resized.thumbnail(size, Image.ANTIALIAS)
+                    image = resized
+                resized.save(self.get_path(variant), image_format, quality=settings.IMAGE_QUALITY)
+                done.append(variant)
+                self.set_status(self.PROCESSING, done)
+        except (IOError, ValueError) as e:
+            logger.error('{}: {}'.format(self.name, e))
+            self.set_status(self.FAILED, done)
+            return False
+        self.set_status(self.DONE, done)
+        return True
+
+
+def generate_derivatives(name):
+    """Worker task; also run by the 'process_images' command."""
+    try:
+        return ImageDerivatives(name).generate()
+    except Exception as e:
+        # the pool workers discard the exceptions
+        logger.exception(e)
+        return False
+
+
+def get_url(name, variant):
+    """Return the URL of the best variant available of an image."""
+    return ImageDerivatives(name).get_url(variant)
+
+
 class ImageRotation(object):
     """
     Implements image rotation functionality.
@@ -25,6 +170,13 @@ class ImageRotation(object):
     'image_path' should be the full path to the image on the server
 
     """
+    TRANSPOSITIONS = {
+        90: Image.ROTATE_90,
+        180: Image.ROTATE_180,
+        -90: Image.ROTATE_270,
+        270: Image.ROTATE_270,
+    }
+
     def __init__(self, image_path=''):
         try:
             self.image = Image.open(image_path)
@@ -32,13 +184,18 @@ class ImageRotation(object):
         except IOError as e:
             raise ImageException(e)
 
-    def apply(self, angle=-90):
+    def apply(self, angle=-90, dest_path=None):
+        """Rotate the image, and save it to 'dest_path' (by default, over the image)."""
         try:
-            self.image = self.image.rotate(angle)
+            if angle in self.TRANSPOSITIONS:
+                # right angles are transposed, with no resampling
+                self.image = self.image.transpose(self.TRANSPOSITIONS[angle])
+            else:
+                self.image = self.image.rotate(angle)
         except TypeError as e:
             raise ImageException(e)
         # Override image
-        self.image.save(self.path, quality=100)
+        self.image.save(dest_path or self.path, quality=settings.IMAGE_QUALITY)
 
 
 class ImageRotater(object):
@@ -49,6 +206,9 @@ class ImageRotater(object):
     At the moment, this class will only rotate the member's profile image.
     Though it has been written for possible future extension.
 
+    The image is rotated in the background (see rotate_picture()):
+    the client rotates the image displayed meanwhile.
+
     """
     def __call__(self, request):
         if request.method == "GET":
@@ -62,21 +222,76 @@ class ImageRotater(object):
             member = request.user.profile
             if not member.picture:
                 return HttpResponseBadRequest("No image provided.")
-            image_path = os.path.join(settings.MEDIA_ROOT, member.picture.name)
+            name = member.picture.name
             filename = member.picture.url
         else:
             return HttpResponseBadRequest("Not implemented.")
-        # Rotate the image
+        # only the image header is read here
         try:
-            ImageRotation(image_path=image_path).apply()
-        except ImageException as e:
+            Image.open(os.path.join(settings.MEDIA_ROOT, name))
+        except IOError as e:
             return HttpResponseBadRequest(str(e))
+        # the outdated variants are not used until generated again
+        ImageDerivatives(name).set_status(ImageDerivatives.PENDING)
+        get_pool().apply_async(rotate_picture_task, (member.id,))
         # All went well if we get here
         return HttpResponse(json.dumps({
                                 'filename': filename
                             }),
                             content_type='application/json; charset=utf-8')
-    
+
+
+def rotate_by_content(name, image_path, angle=-90):
+    """Rotate the image into a new content-addressed file, and return its name."""
+    # imported here, as the uploads depend on this module
+    from mumlife import uploads
+    extension = os.path.splitext(name)[1]
+    uploads.make_dirs(uploads.get_temp_dir())
+    fd, temp_path = tempfile.mkstemp(suffix=extension, dir=uploads.get_temp_dir())
+    os.close(fd)
+    try:
+        ImageRotation(image_path=image_path).apply(angle=angle, dest_path=temp_path)
+        name, created = uploads.store_by_content(temp_path, name, uploads.hash_file(temp_path), extension)
+    except (ImageException, IOError, OSError):
+        if os.path.isfile(temp_path):
+            os.remove(temp_path)
+        raise
+    return name
+
+
+def rotate_picture(member_id, angle=-90):
+    """Rotate the picture of a member, and generate its variants again.
+    Return whether the variants were generated.
+    """
+    # imported here, as the models depend on this module
+    from mumlife.models import Member
+    with _rotation_lock:
+        # the picture is read here, as a previous rotation might have renamed it
+        name = Member.objects.filter(pk=member_id).values_list('picture', flat=True)[0]
+        image_path = os.path.join(settings.MEDIA_ROOT, name)
+        if settings.UPLOADS_CONTENT_ADDRESSED:
+            # the file might be shared with other uploads,
+            # so the rotated image is stored as a new file;
+            # only the picture is written, as the profile might have been edited meanwhile
+            name = rotate_by_content(name, image_path, angle=angle)
+            Member.objects.filter(pk=member_id).update(picture=name, updated=timezone.now())
+        else:
+            ImageRotation(image_path=image_path).apply(angle=angle)
+    return ImageDerivatives(name).generate()
+
+
+def rotate_picture_task(member_id):
+    """Worker task."""
+    try:
+        return rotate_picture(member_id)
+    except Exception as e:
+        # the pool workers discard the exceptions
+        logger.exception(e)
+        return False
+    finally:
+        # the workers outlive the requests, which close their connections
+        connection.close()
+
 
 if __name__ == "__main__":
     # Test image rotation with test image located at
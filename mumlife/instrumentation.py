@@ -0,0 +1,188 @@
+# mumlife/instrumentation.py
+"""
+Per-request SQL and timing instrumentation.
+
+Enabled with INSTRUMENTATION_ENABLED. Each request is recorded as a Profile,
+by mumlife.middleware.InstrumentationMiddleware, and each API view by
+api.instrumentation.InstrumentedViewMixin (i.e. the API views dispatched
+in-process, within a page request). A Profile holds:
+    - the number of queries, and the time spent in the database;
+    - the slowest statements;
+    - the time spent in sections of the code (see section()),
+      i.e. 'format' for Member/Message.format(), 'serialize' for the API responses.
+
+Profiles are logged as JSON to the 'mumlife.instrumentation' logger,
+sent in the response headers when DEBUG is set, and aggregated per view,
+in-process (see get_stats()).
+
+The queries are read from the connection's debug cursor,
+which is enabled while a request is recorded.
+
+"""
+import heapq
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger('mumlife.instrumentation')
+
+_local = threading.local()
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+class Profile(object):
+    """Queries and timings of a view."""
+
+    def __init__(self, name):
+        self.name = name
+        self.time = 0.0
+        self.queries = 0
+        self.db_time = 0.0
+        self.slowest = []
+        self.sections = {}
+        self.extra = {}
+        self._start = time.time()
+        self._queries_start = len(connection.queries)
+
+    def stop(self):
+        self.time = time.time() - self._start
+        queries = [(float(q['time']), q['sql']) for q in connection.queries[self._queries_start:]]
+        self.queries = len(queries)
+        self.db_time = sum([t for t, sql in queries])
+        self.slowest = heapq.nlargest(settings.INSTRUMENTATION_SLOWEST, queries)
+
+    def as_dict(self):
+        data = {
+            'view': self.name,
+            'time': round(self.time * 1000, 2),
+            'queries': self.queries,
+            'db_time': round(self.db_time * 1000, 2),
+            'sections': dict([(k, round(v * 1000, 2)) for k, v in self.sections.items()]),
+            'slowest': [{'time': round(t * 1000, 2), 'sql': sql[:500]} for t, sql in self.slowest],
+        }
+        data.update(self.extra)
+        return data
+
+    def get_headers(self):
+        """Return the response headers; times are in milliseconds."""
+        headers = {
+            'X-Mumlife-Time': '{:.2f}'.format(self.time * 1000),
+            'X-Mumlife-Queries': str(self.queries),
+            'X-Mumlife-DB-Time': '{:.2f}'.format(self.db_time * 1000),
+        }
+        for name, elapsed in self.sections.items():
+            headers['X-Mumlife-{}-Time'.format(name.capitalize())] = '{:.2f}'.format(elapsed * 1000)
+        return headers
+
+
+def _get_stack():
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def current():
+    """Return the profile being recorded, or None."""
+    stack = _get_stack()
+    return stack[-1] if stack else None
+
+
+def start(name, root=False):
+    """Start recording a view.
+    'root' profiles are the requests, recorded from the middleware.
+    """
+    stack = _get_stack()
+    if root and stack:
+        # profiles left by a failed request on this thread are discarded
+        del stack[:]
+        connection.use_debug_cursor = getattr(_local, 'debug_cursor', None)
+    if not stack:
+        _local.debug_cursor = connection.use_debug_cursor
+        connection.use_debug_cursor = True
+    profile = Profile(name)
+    stack.append(profile)
+    return profile
+
+
+def stop(profile, **extra):
+    """Stop recording a view; log and aggregate its profile."""
+    stack = _get_stack()
+    if profile in stack:
+        del stack[stack.index(profile):]
+    profile.stop()
+    profile.extra.update(extra)
+    if not stack:
+        connection.use_debug_cursor = getattr(_local, 'debug_cursor', None)
+    logger.info(json.dumps(profile.as_dict()))
+    _aggregate(profile)
+    return profile
+
+
+@contextmanager
+def section(name):
+    """Time a section of the code, in all the profiles being recorded."""
+    stack = list(_get_stack())
+    start_time = time.time()
+    try:
+        yield
+    finally:
+        elapsed = time.time() - start_time
+        for profile in stack:
+            profile.sections[name] = profile.sections.get(name, 0.0) + elapsed
+
+
+def _aggregate(profile):
+    with _stats_lock:
+        stats = _stats.get(profile.name)
+        if stats is None:
+            stats = _stats[profile.name] = {
+                'requests': 0,
+                'time': 0.0,
+                'max_time': 0.0,
+                'queries': 0,
+                'max_queries': 0,
+                'db_time': 0.0,
+                'sections': {},
+                'slowest': [],
+            }
+        stats['requests'] += 1
+        stats['time'] += profile.time
+        stats['max_time'] = max(stats['max_time'], profile.time)
+        stats['queries'] += profile.queries
+        stats['max_queries'] = max(stats['max_queries'], profile.queries)
+        stats['db_time'] += profile.db_time
+        for name, elapsed in profile.sections.items():
+            stats['sections'][name] = stats['sections'].get(name, 0.0) + elapsed
+        stats['slowest'] = heapq.nlargest(settings.INSTRUMENTATION_SLOWEST, stats['slowest'] + profile.slowest)
+
+
+def get_stats():
+    """Return the statistics of the views recorded by this process;
+    averages and maximums per request, times in milliseconds.
+    """
+    results = {}
+    with _stats_lock:
+        for name, stats in _stats.items():
+            requests = float(stats['requests'])
+            results[name] = {
+                'requests': stats['requests'],
+                'time': round(stats['time'] * 1000 / requests, 2),
+                'max_time': round(stats['max_time'] * 1000, 2),
+                'queries': round(stats['queries'] / requests, 2),
+                'max_queries': stats['max_queries'],
+                'db_time': round(stats['db_time'] * 1000 / requests, 2),
+                'sections': dict([(k, round(v * 1000 / requests, 2)) for k, v in stats['sections'].items()]),
+                'slowest': [{'time': round(t * 1000, 2), 'sql': sql[:500]} for t, sql in stats['slowest']],
+            }
+    return results
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
@@ -0,0 +1,56 @@
+# mumlife/management/commands/benchmark.py
+"""
+Benchmark the feeds, events, members and notifications queries
+on synthetic data, at several dataset sizes (see mumlife.benchmarks).
+
+The data is generated in a test database, created and destroyed by the
+command; the postcode areas are copied from the geo.Postcode table.
+
+"""
+from optparse import make_option
+from django.core.management.base import BaseCommand
+from django.test.simple import DjangoTestSuiteRunner
+from geo.models import Postcode, POSTCODE_AREAS
+from mumlife import benchmarks
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the feeds, events, members and notifications queries on synthetic data.'
+    option_list = BaseCommand.option_list + (
+        make_option('--sizes', dest='sizes', default='100,1000,5000',
+                    help='Comma-separated numbers of members (default: 100,1000,5000)'),
+        make_option('--viewers', type='int', dest='viewers', default=20,
+                    help='Number of members each operation is run for (default: 20)'),
+        make_option('--seed', type='int', dest='seed', default=0,
+                    help='Seed of the data generator'),
+    )
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',') if size.strip()]
+        # read from the configured database, before switching to the test database
+        areas = list(Postcode.objects.values_list('postcode', 'latitude', 'longitude'))
+        if not areas:
+            self.stdout.write('No postcodes found; using the default areas.')
+            areas = benchmarks.DEFAULT_AREAS
+
+        # the test database is created with the migrations, as the distance
+        # queries depend on the geography columns they add
+        try:
+            from south.management.commands import patch_for_test_db_setup
+        except ImportError:
+            pass
+        else:
+            patch_for_test_db_setup()
+        runner = DjangoTestSuiteRunner(verbosity=0, interactive=False)
+        old_config = runner.setup_databases()
+        try:
+            Postcode.objects.bulk_create([Postcode(postcode=area, latitude=latitude, longitude=longitude,
+                                                   town_area='', region='')
+                                          for area, latitude, longitude in areas])
+            POSTCODE_AREAS.refresh()
+            self.stdout.write('{:>7} {:<30} {:>16} {:>12} {:>11}'.format('members', 'operation',
+                                                                          'queries/call', 'time/call',
+                                                                          'peak memory'))
+            benchmarks.run(areas, sizes, viewers=options['viewers'], seed=options['seed'], stdout=self.stdout)
+        finally:
+            runner.teardown_databases(old_config)
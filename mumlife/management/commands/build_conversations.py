@@ -0,0 +1,38 @@
+# mumlife/management/commands/build_conversations.py
+"""
+(Re)build the members conversations from the existing private messages.
+
+Conversations are updated when private messages are posted (see Conversation);
+this command builds the conversations of all members, or of the members given
+by id, i.e. when the conversations are first created.
+The private messages received before the notifications window (7 days)
+are counted as read, as they were no longer notified.
+
+"""
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import models
+from django.utils import timezone
+from mumlife.models import Message, Conversation
+
+
+class Command(BaseCommand):
+    args = '[member_id member_id ...]'
+    help = 'Rebuild the members conversations from the existing private messages.'
+
+    def handle(self, *args, **options):
+        messages = Message.objects.filter(visibility=Message.PRIVATE,
+                                          is_reply=False,
+                                          recipient__isnull=False)
+        if args:
+            messages = messages.filter(models.Q(member__in=args) | models.Q(recipient__in=args))
+        pairs = set()
+        for member_id, recipient_id in messages.values_list('member', 'recipient').distinct().iterator():
+            pairs.add((member_id, recipient_id))
+            pairs.add((recipient_id, member_id))
+        read_at = timezone.now() - timedelta(7)
+        built = 0
+        for member_id, other_id in pairs:
+            if Conversation.objects.rebuild(member_id, other_id, read_at=read_at) is not None:
+                built += 1
+        self.stdout.write('Built {} conversation(s).'.format(built))
@@ -0,0 +1,27 @@
+# mumlife/management/commands/build_timelines.py
+"""
+(Re)build the members timelines from the existing messages.
+
+Messages are written to the timelines when they are posted (see TimelineEntry);
+this command builds the timelines of all members, or of the members given
+by id, i.e. when TIMELINE_ENABLED is first set.
+
+"""
+from django.core.management.base import BaseCommand
+from mumlife.models import Member, TimelineEntry
+
+
+class Command(BaseCommand):
+    args = '[member_id member_id ...]'
+    help = 'Rebuild the members timelines from the existing messages.'
+
+    def handle(self, *args, **options):
+        members = Member.objects.all()
+        if args:
+            members = members.filter(id__in=args)
+        built = 0
+        entries = 0
+        for member in members.iterator():
+            entries += len(TimelineEntry.objects.rebuild(member))
+            built += 1
+        self.stdout.write('Built {} timeline(s); {} entries.'.format(built, entries))
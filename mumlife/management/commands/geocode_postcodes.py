@@ -0,0 +1,63 @@
+# mumlife/management/commands/geocode_postcodes.py
+"""
+Geocode the members and messages whose postcode was not resolved when saved.
+
+Postcodes are resolved in bulk from the local data (see mumlife.geocoding);
+with --remote, the postcodes still unresolved are geocoded with the Bing Maps API.
+
+"""
+from optparse import make_option
+from django.core.management.base import BaseCommand
+from django.db import models
+from geo.models import normalize_postcode
+from mumlife import geocoding, utils
+from mumlife.models import Member, Message, Geocode, MEMBERS_INDEX, EVENTS_INDEX
+
+
+class Command(BaseCommand):
+    help = 'Geocode the members and messages with unresolved postcodes.'
+    option_list = BaseCommand.option_list + (
+        make_option('--remote', action='store_true', dest='remote', default=False,
+                    help='Geocode the postcodes not found locally with the Bing Maps API'),
+    )
+
+    def handle(self, *args, **options):
+        unresolved = models.Q(geocode__isnull=True) | models.Q(geocode__in=['', geocoding.UNRESOLVED])
+        # postcodes, by model and object id
+        pending = {
+            Member: dict([(m.id, m.postcode) for m in Member.objects.filter(unresolved)
+                                                                    .exclude(postcode='N/A')
+                                                                    .only('id', 'postcode')]),
+            Message: dict([(m.id, m.postcode) for m in Message.objects.filter(unresolved)
+                                                                      .exclude(location__isnull=True)
+                                                                      .only('id', 'location')]),
+        }
+        postcodes = set([p for objects in pending.values() for p in objects.values() if p])
+        geocodes = geocoding.resolve_many(postcodes)
+
+        if options['remote']:
+            for postcode in postcodes - set(geocodes):
+                try:
+                    point = utils.get_postcode_point(postcode)
+                except Exception as e:
+                    self.stderr.write('The Geocode retrieval for the postcode "{}" has failed: {}'.format(postcode, e))
+                    continue
+                geocode, created = Geocode.objects.get_or_create(code=normalize_postcode(postcode),
+                                                                 defaults={'latitude': point[0],
+                                                                           'longitude': point[1]})
+                geocodes[postcode] = str(geocode)
+
+        for model, objects in pending.items():
+            updated = 0
+            by_postcode = {}
+            for id_, postcode in objects.items():
+                if postcode in geocodes:
+                    by_postcode.setdefault(postcode, []).append(id_)
+            # the 'point' column is updated by the database trigger
+            for postcode, ids in by_postcode.items():
+                updated += model.objects.filter(id__in=ids).update(geocode=geocodes[postcode])
+            self.stdout.write('{}: geocoded {} of {} object(s).'.format(model.__name__, updated, len(objects)))
+        # the objects were updated without signals
+        MEMBERS_INDEX.refresh()
+        EVENTS_INDEX.refresh()
+        self.stdout.write('{} postcode(s) still unresolved.'.format(len(postcodes - set(geocodes))))
@@ -0,0 +1,52 @@
+# mumlife/management/commands/process_images.py
+"""
+Generate the sized variants of the uploaded images (see mumlife.images).
+
+The variants of new uploads are generated in the background; this command
+generates the variants of the images uploaded before, or of all images
+with --all (i.e. when the variants sizes change).
+The images are processed in parallel, by a pool of processes.
+
+"""
+import multiprocessing
+import os
+from optparse import make_option
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from mumlife.images import ImageDerivatives, VARIANTS, generate_derivatives, is_variant
+
+UPLOAD_DIRS = ('member', 'posts')
+
+
+class Command(BaseCommand):
+    help = 'Generate the sized variants of the uploaded images.'
+    option_list = BaseCommand.option_list + (
+        make_option('--all', action='store_true', dest='all', default=False,
+                    help='Process all images, rather than the images with missing variants'),
+        make_option('--processes', type='int', dest='processes', default=multiprocessing.cpu_count(),
+                    help='Number of processes (default: number of CPUs)'),
+    )
+
+    def get_images(self, all_images=False):
+        for upload_dir in UPLOAD_DIRS:
+            for root, dirs, files in os.walk(os.path.join(settings.MEDIA_ROOT, upload_dir)):
+                for filename in files:
+                    if is_variant(filename):
+                        continue
+                    name = os.path.relpath(os.path.join(root, filename), settings.MEDIA_ROOT)
+                    if not all_images:
+                        derivatives = ImageDerivatives(name)
+                        if all(os.path.isfile(derivatives.get_path(v)) for v in VARIANTS):
+                            continue
+                    yield name
+
+    def handle(self, *args, **options):
+        names = list(self.get_images(options['all']))
+        pool = multiprocessing.Pool(max(options['processes'], 1))
+        try:
+            results = pool.imap_unordered(generate_derivatives, names, chunksize=16)
+            processed = sum(1 for result in results if result)
+        finally:
+            pool.close()
+            pool.join()
+        self.stdout.write('Processed {} image(s), {} failed.'.format(processed, len(names) - processed))
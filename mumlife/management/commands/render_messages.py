@@ -0,0 +1,34 @@
+# mumlife/management/commands/render_messages.py
+"""
+Pre-render the messages bodies and tags (see Message.render()).
+
+Messages are rendered when saved; this command renders the messages
+saved before the rendered columns were added, or all messages with --all
+(i.e. when the rendering changes).
+
+"""
+from optparse import make_option
+from django.core.management.base import BaseCommand
+from mumlife.models import Message
+
+
+class Command(BaseCommand):
+    help = 'Pre-render the messages bodies and tags.'
+    option_list = BaseCommand.option_list + (
+        make_option('--all', action='store_true', dest='all', default=False,
+                    help='Render all messages, rather than the messages not rendered yet'),
+    )
+
+    def handle(self, *args, **options):
+        messages = Message.objects.all()
+        if not options['all']:
+            messages = messages.filter(body_html='').exclude(body='')
+        rendered = 0
+        for message in messages.only('id', 'body', 'tags').iterator():
+            message.render()
+            # the rendered columns are updated alone,
+            # so that the messages are not saved again (see Message.save())
+            Message.objects.filter(pk=message.pk)\
+                           .update(**dict([(f, getattr(message, f)) for f in Message.RENDERED_FIELDS]))
+            rendered += 1
+        self.stdout.write('Rendered {} message(s).'.format(rendered))
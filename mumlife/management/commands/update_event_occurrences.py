@@ -0,0 +1,31 @@
+# mumlife/management/commands/update_event_occurrences.py
+"""
+Regenerate the events occurrences table.
+
+Past occurrences are removed, and the occurrences of upcoming events
+are regenerated, which extends recurring events to the horizon
+(EVENTS_HORIZON_MONTHS). This command should be run daily.
+
+"""
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from mumlife.models import Message, EventOccurrence
+
+
+class Command(BaseCommand):
+    help = 'Regenerate events occurrences, up to the horizon.'
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        past = EventOccurrence.objects.filter(start__lt=now)
+        removed = past.count()
+        past.delete()
+        events = Message.objects.filter(eventdate__isnull=False, is_reply=False) \
+                                .exclude(occurrence=Message.OCCURS_ONCE, eventdate__lt=now)
+        generated = 0
+        for event in events.iterator():
+            generated += len(EventOccurrence.objects.generate(event, now=now))
+        # the events API validators follow the occurrences (see api.conditional):
+        # the messages are not marked as updated, which would expire all the responses
+        self.stdout.write('Removed {} past occurrence(s); generated {} occurrence(s) for {} event(s).'
+                          .format(removed, generated, events.count()))
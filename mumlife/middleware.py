@@ -1,17 +1,35 @@
 # mumlife/middleware.py
 import logging
-import json
 import re
 import requests
 from django.conf import settings
 from django.middleware.csrf import get_token
 from django.contrib.sites.models import RequestSite
-from mumlife import views
+from mumlife import instrumentation, views
 from api.helpers import APIRequest
 
 logger = logging.getLogger('mumlife.middleware')
 
 
+class InstrumentationMiddleware(object):
+    """Record the queries and timings of each request (see mumlife.instrumentation)."""
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if settings.INSTRUMENTATION_ENABLED:
+            name = getattr(view_func, '__name__', view_func.__class__.__name__)
+            request.instrumentation_profile = instrumentation.start(name, root=True)
+        return None
+
+    def process_response(self, request, response):
+        profile = getattr(request, 'instrumentation_profile', None)
+        if profile is not None:
+            instrumentation.stop(profile, path=request.path, method=request.method, status=response.status_code)
+            if settings.DEBUG:
+                for header, value in profile.get_headers().items():
+                    response[header] = value
+        return response
+
+
 class MumlifeMiddleware(object):
     def process_view(self, request, view_func, view_args, view_kwargs):
         # Fetch notifications from the API
@@ -22,8 +40,7 @@ class MumlifeMiddleware(object):
             params = {
                 'resource': 'notification',
             }
-            response = APIRequest(request).get(**params)
-            request.META["MUMLIFE_NOTIFICATIONS"] = json.loads(response)
+            request.META["MUMLIFE_NOTIFICATIONS"] = APIRequest(request).fetch(**params)
         return None
 
 
@@ -34,28 +51,15 @@ def request(request):
     }
 
     if request.user.is_authenticated():
-        # The account notifications hold the ones already read
-        try:
-            member_notifications = request.user.profile.notifications
-        except:
-            # legacy - users with no notifications related objects will fail
-            read = 0
-        else:
-            # make sure the list of stored notifications is updated before using it
-            member_notifications.update()
-            read = member_notifications.total
         # We retrieve all notifications from the API,
         # whose results have already been fetched by the middleware view processor;
         # in META["MUMLIFE_NOTIFICATIONS"]
+        # The API flags the ones already read (see Notifications)
         notifications = request.META.get("MUMLIFE_NOTIFICATIONS")
         if notifications is not None:
             meta['notifications'] = notifications
-            total = notifications.get('total', 0)
+            unread = notifications.get('unread', 0)
         else:
-            total = 0
-        # Process difference (i.e. unread ones)
-        unread = total - read
-        if unread < 0:
             unread = 0
         meta['new_notifications'] = True if unread else False
     return meta
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+import datetime
+from south.db import db
+from south.v2 import SchemaMigration
+from django.db import models
+
+
+class Migration(SchemaMigration):
+
+    def forwards(self, orm):
+        # Adding geography column 'point' to Member and Message,
+        # maintained from the text 'geocode' column by a trigger
+        db.execute("""
+            CREATE OR REPLACE FUNCTION mumlife_set_point() RETURNS trigger AS $$
+            BEGIN
+                IF NEW.geocode IS NULL OR NEW.geocode = '' THEN
+                    NEW.point := NULL;
+                ELSE
+                    NEW.point := ST_GeographyFromText('SRID=4326;POINT(' || NEW.geocode || ')');
+                END IF;
+                RETURN NEW;
+            END;
+            $$ LANGUAGE plpgsql;
+        """)
+        for table in (u'mumlife_member', u'mumlife_message'):
+            db.execute("ALTER TABLE {0} ADD COLUMN point geography(Point, 4326) NULL".format(table))
+            db.execute("""UPDATE {0} SET point = ST_GeographyFromText('SRID=4326;POINT(' || geocode || ')')
+                          WHERE geocode IS NOT NULL AND geocode <> ''""".format(table))
+            db.execute("CREATE INDEX {0}_point_gist ON {0} USING GIST (point)".format(table))
+            db.execute("""CREATE TRIGGER {0}_point BEFORE INSERT OR UPDATE OF geocode ON {0}
+                          FOR EACH ROW EXECUTE PROCEDURE mumlife_set_point()""".format(table))
+
+
+    def backwards(self, orm):
+        # Deleting geography column 'point' from Member and Message
+        for table in (u'mumlife_member', u'mumlife_message'):
+            db.execute("DROP TRIGGER IF EXISTS {0}_point ON {0}".format(table))
+            db.execute("ALTER TABLE {0} DROP COLUMN point".format(table))
+        db.execute("DROP FUNCTION IF EXISTS mumlife_set_point()")
+
+
+    models = {
+        u'auth.group': {
+            'Meta': {'object_name': 'Group'},
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'name': ('django.db.models.fields.CharField', [], {'unique': 'True', 'max_length': '80'}),
+            'permissions': ('django.db.models.fields.related.ManyToManyField', [], {'to': u"orm['auth.Permission']", 'symmetrical': 'False', 'blank': 'True'})
+        },
+        u'auth.permission': {
+            'Meta': {'ordering': "(u'content_type__app_label', u'content_type__model', u'codename')", 'unique_together': "((u'content_type', u'codename'),)", 'object_name': 'Permission'},
+            'codename': ('django.db.models.fields.CharField', [], {'max_length': '100'}),
+            'content_type': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['contenttypes.ContentType']"}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'name': ('django.db.models.fields.CharField', [], {'max_length': '50'})
+        },
+        u'auth.user': {
+            'Meta': {'object_name': 'User'},
+            'date_joined': ('django.db.models.fields.DateTimeField', [], {'default': 'datetime.datetime.now'}),
+            'email': ('django.db.models.fields.EmailField', [], {'max_length': '75', 'blank': 'True'}),
+            'first_name': ('django.db.models.fields.CharField', [], {'max_length': '30', 'blank': 'True'}),
+            'groups': ('django.db.models.fields.related.ManyToManyField', [], {'symmetrical': 'False', 'related_name': "u'user_set'", 'blank': 'True', 'to': u"orm['auth.Group']"}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'is_active': ('django.db.models.fields.BooleanField', [], {'default': 'True'}),
+            'is_staff': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            'is_superuser': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            'last_login': ('django.db.models.fields.DateTimeField', [], {'default': 'datetime.datetime.now'}),
+            'last_name': ('django.db.models.fields.CharField', [], {'max_length': '30', 'blank': 'True'}),
+            'password': ('django.db.models.fields.CharField', [], {'max_length': '128'}),
+            'user_permissions': ('django.db.models.fields.related.ManyToManyField', [], {'symmetrical': 'False', 'related_name': "u'user_set'", 'blank': 'True', 'to': u"orm['auth.Permission']"}),
+            'username': ('django.db.models.fields.CharField', [], {'unique': 'True', 'max_length': '255'})
+        },
+        u'contenttypes.contenttype': {
+            'Meta': {'ordering': "('name',)", 'unique_together': "(('app_label', 'model'),)", 'object_name': 'ContentType', 'db_table': "'django_content_type'"},
+            'app_label': ('django.db.models.fields.CharField', [], {'max_length': '100'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'model': ('django.db.models.fields.CharField', [], {'max_length': '100'}),
+            'name': ('django.db.models.fields.CharField', [], {'max_length': '100'})
+        },
+        u'mumlife.friendships': {
+            'Meta': {'object_name': 'Friendships'},
+            'from_member': ('django.db.models.fields.related.ForeignKey', [], {'related_name': "'from_friend'", 'to': u"orm['mumlife.Member']"}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'status': ('django.db.models.fields.IntegerField', [], {}),
+            'to_member': ('django.db.models.fields.related.ForeignKey', [], {'related_name': "'to_friend'", 'to': u"orm['mumlife.Member']"})
+        },
+        u'mumlife.geocode': {
+            'Meta': {'object_name': 'Geocode'},
+            'code': ('django.db.models.fields.CharField', [], {'max_length': '125'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'latitude': ('django.db.models.fields.FloatField', [], {}),
+            'longitude': ('django.db.models.fields.FloatField', [], {})
+        },
+        u'mumlife.kid': {
+            'Meta': {'object_name': 'Kid'},
+            'dob': ('django.db.models.fields.DateField', [], {'null': 'True'}),
+            'fullname': ('django.db.models.fields.CharField', [], {'max_length': '64'}),
+            'gender': ('django.db.models.fields.IntegerField', [], {'null': 'True'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'parents': ('django.db.models.fields.related.ManyToManyField', [], {'to': u"orm['mumlife.Member']", 'symmetrical': 'False'}),
+            'visibility': ('django.db.models.fields.IntegerField', [], {'default': '1'})
+        },
+        u'mumlife.member': {
+            'Meta': {'object_name': 'Member'},
+            'about': ('django.db.models.fields.TextField', [], {'null': 'True', 'blank': 'True'}),
+            'dob': ('django.db.models.fields.DateField', [], {'null': 'True', 'blank': 'True'}),
+            'friendships': ('django.db.models.fields.related.ManyToManyField', [], {'related_name': "'friends_with+'", 'to': u"orm['mumlife.Member']", 'through': u"orm['mumlife.Friendships']", 'blank': 'True', 'symmetrical': 'False', 'null': 'True'}),
+            'fullname': ('django.db.models.fields.CharField', [], {'max_length': '64'}),
+            'gender': ('django.db.models.fields.IntegerField', [], {'null': 'True', 'blank': 'True'}),
+            'geocode': ('django.db.models.fields.CharField', [], {'max_length': '255', 'null': 'True', 'blank': 'True'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'interests': ('tagging.fields.TagField', [], {}),
+            'max_range': ('django.db.models.fields.IntegerField', [], {'default': '5'}),
+            'picture': ('django.db.models.fields.files.ImageField', [], {'max_length': '100', 'null': 'True', 'blank': 'True'}),
+            'postcode': ('django.db.models.fields.CharField', [], {'max_length': '8'}),
+            'slug': ('django.db.models.fields.CharField', [], {'default': "''", 'max_length': '255', 'blank': 'True'}),
+            'spouse': ('django.db.models.fields.related.ForeignKey', [], {'blank': 'True', 'related_name': "'partner'", 'null': 'True', 'to': u"orm['mumlife.Member']"}),
+            'status': ('django.db.models.fields.IntegerField', [], {'default': '0'}),
+            'units': ('django.db.models.fields.IntegerField', [], {'default': '1', 'null': 'True', 'blank': 'True'}),
+            'user': ('django.db.models.fields.related.OneToOneField', [], {'related_name': "'profile'", 'unique': 'True', 'to': u"orm['auth.User']"})
+        },
+        u'mumlife.message': {
+            'Meta': {'object_name': 'Message'},
+            'area': ('django.db.models.fields.CharField', [], {'max_length': '4'}),
+            'body': ('django.db.models.fields.TextField', [], {}),
+            'eventdate': ('django.db.models.fields.DateTimeField', [], {'null': 'True', 'blank': 'True'}),
+            'eventenddate': ('django.db.models.fields.DateTimeField', [], {'null': 'True', 'blank': 'True'}),
+            'geocode': ('django.db.models.fields.CharField', [], {'max_length': '255', 'null': 'True', 'blank': 'True'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'is_reply': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            'location': ('django.db.models.fields.TextField', [], {'null': 'True', 'blank': 'True'}),
+            'member': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['mumlife.Member']"}),
+            'name': ('django.db.models.fields.CharField', [], {'max_length': '200', 'null': 'True', 'blank': 'True'}),
+            'occurrence': ('django.db.models.fields.IntegerField', [], {'default': '0'}),
+            'occurs_until': ('django.db.models.fields.DateField', [], {'null': 'True', 'blank': 'True'}),
+            'picture': ('django.db.models.fields.files.ImageField', [], {'max_length': '100', 'null': 'True', 'blank': 'True'}),
+            'recipient': ('django.db.models.fields.related.ForeignKey', [], {'blank': 'True', 'related_name': "'sender'", 'null': 'True', 'to': u"orm['mumlife.Member']"}),
+            'reply_to': ('django.db.models.fields.related.ForeignKey', [], {'blank': 'True', 'related_name': "'author'", 'null': 'True', 'to': u"orm['mumlife.Message']"}),
+            'tags': ('tagging.fields.TagField', [], {}),
+            'timestamp': ('django.db.models.fields.DateTimeField', [], {'auto_now_add': 'True', 'blank': 'True'}),
+            'visibility': ('django.db.models.fields.IntegerField', [], {'default': '2'})
+        },
+        u'mumlife.notifications': {
+            'Meta': {'object_name': 'Notifications'},
+            'events': ('django.db.models.fields.related.ManyToManyField', [], {'symmetrical': 'False', 'related_name': "'notification_events'", 'blank': 'True', 'to': u"orm['mumlife.Message']"}),
+            'friends_requests': ('django.db.models.fields.IntegerField', [], {'default': '0'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'member': ('django.db.models.fields.related.OneToOneField', [], {'related_name': "'notifications'", 'unique': 'True', 'to': u"orm['mumlife.Member']"}),
+            'messages': ('django.db.models.fields.related.ManyToManyField', [], {'symmetrical': 'False', 'related_name': "'notification_messages'", 'blank': 'True', 'to': u"orm['mumlife.Message']"}),
+            'threads': ('django.db.models.fields.related.ManyToManyField', [], {'symmetrical': 'False', 'related_name': "'notification_threads'", 'blank': 'True', 'to': u"orm['mumlife.Message']"}),
+            'total': ('django.db.models.fields.IntegerField', [], {'default': '0'})
+        },
+        u'mumlife.page': {
+            'Meta': {'object_name': 'Page'},
+            '_body_rendered': ('django.db.models.fields.TextField', [], {'blank': 'True'}),
+            'body': ('markitup.fields.MarkupField', [], {'no_rendered_field': 'True'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'slug': ('django.db.models.fields.CharField', [], {'unique': 'True', 'max_length': '64'}),
+            'status': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            'title': ('django.db.models.fields.CharField', [], {'unique': 'True', 'max_length': '64'})
+        }
+    }
+
+    complete_apps = ['mumlife']
\ No newline at end of file
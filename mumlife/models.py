@@ -3,11 +3,11 @@ import logging
 import operator
 import random
 import re
-from copy import deepcopy
 from datetime import datetime, timedelta
-from django.db import models
-from django.db.models.signals import post_save
-from django.contrib.auth.models import User
+from django.conf import settings
+from django.db import models, transaction, IntegrityError
+from django.db.models.signals import pre_save, post_save, post_delete, m2m_changed
+from django.contrib.auth.models import User, Group
 from django.utils import timezone
 from django.utils.encoding import force_unicode
 from django.utils.html import strip_tags
@@ -18,11 +18,10 @@ from tagging.models import Tag, TaggedItem
 from markitup.fields import MarkupField
 from dateutil.rrule import rrule, WEEKLY
 from dateutil.relativedelta import relativedelta
-from mumlife import utils
-from geo.models import Postcode
+from mumlife import caching, distances, geocoding, images, utils
+from geo.models import POSTCODE_AREAS
 
 logger = logging.getLogger('mumlife.models')
-POSTCODE_AREAS = Postcode.objects.all_areas()
 
 
 class Page(models.Model):
@@ -33,15 +32,11 @@ class Page(models.Model):
 
     def __unicode__(self):
         return self.title
-    
-    @staticmethod
-    def REGEX():
-        """ Static pages regular expression used by the URL resolver """
-        return r'^(?P<page>{})$'.format('|'.join([p['slug'] for p in Page.objects.filter(status=True).values('slug')]))
 
 
 class Geocode(models.Model):
-    code = models.CharField(max_length=125)
+    # postcodes resolved locally are stored normalized (see geo.models.normalize_postcode)
+    code = models.CharField(max_length=125, unique=True)
     latitude = models.FloatField()
     longitude = models.FloatField()
 
@@ -50,11 +45,15 @@ class Geocode(models.Model):
 
 
 class MemberManager(models.Manager):
-    def with_distance_from(self, viewer=None, query_tags=None):
+    def with_distance_from(self, viewer=None, query_tags=None, distance_range=None):
         """Return all Members, ordered by their distance from the viewer.
 
         Viewer has to exists, or this query doesn't make sense.
         Exclude the logged-in user, Administrators, Organisers and banned members.
+        When a distance range is given (in meters), only members within range are returned.
+
+        The distance is computed on the indexed geography column 'point',
+        maintained by the database from the geocode.
         """
         if viewer is None:
             return self.all()
@@ -63,24 +62,53 @@ class MemberManager(models.Manager):
         else:
             members = self.all()
 
-        point = 'POINT({})'.format(viewer.geocode)
-        members_ids = [m['id'] for m in members.exclude(user=viewer.user) \
-                                               .exclude(user__profile__geocode__isnull=True) \
-                                               .exclude(user__groups__name='Administrators') \
-                                               .exclude(user__is_active=False) \
-                                               .exclude(gender=Member.IS_ORGANISER) \
-                                               .values('id')]
+        members_ids = members.exclude(user=viewer.user) \
+                             .exclude(user__profile__geocode__isnull=True) \
+                             .exclude(user__groups__name='Administrators') \
+                             .exclude(user__is_active=False) \
+                             .exclude(gender=Member.IS_ORGANISER) \
+                             .values('id')
+        if settings.DISTANCE_ENGINE == 'haversine':
+            # PostGIS is unavailable: members are ranked in-process,
+            # and only the members of the page read are fetched
+            ranked = MEMBERS_INDEX.rank(viewer.geocode, distance_range)
+            return distances.RankedQuerySet(members.filter(id__in=members_ids), ranked)
+        point = 'SRID=4326;POINT({})'.format(viewer.geocode)
         members = members.filter(id__in=members_ids) \
                          .extra(
-                                select={'distance': """ST_Distance(
-                                    ST_GeographyFromText(%s),
-                                    ST_GeographyFromText(CONCAT('POINT(', geocode, ')'))
-                                )"""},
-                                select_params=(point,),
-                         ) \
-                         .order_by('distance')
+                                select={
+                                    'distance': "ST_Distance(ST_GeographyFromText(%s), mumlife_member.point)",
+                                    # KNN ordering, using the GiST index
+                                    'knn_distance': "mumlife_member.point <-> ST_GeographyFromText(%s)",
+                                },
+                                select_params=(point, point),
+                         )
+        if distance_range is not None:
+            members = members.extra(where=["ST_DWithin(mumlife_member.point, ST_GeographyFromText(%s), %s)"],
+                                    params=[point, distance_range])
+        members = members.order_by('knn_distance', 'id')
         return members
 
+    def after_distance_from(self, members, viewer, after):
+        """Filter members returned by with_distance_from(),
+        keeping those ordered after the (knn_distance, id) key (i.e. keyset pagination).
+        """
+        if settings.DISTANCE_ENGINE == 'haversine':
+            # the ranking is sliced after the key
+            return members.after(after)
+        point = 'SRID=4326;POINT({})'.format(viewer.geocode)
+        distance, id_ = after
+        # the distance sent in the cursor might not be the exact float8 computed
+        # (i.e. when rounded in the output), so the distance of the member of the key
+        # is computed again; the distance sent is used if the member is gone
+        return members.extra(where=["""(mumlife_member.point <-> ST_GeographyFromText(%s), mumlife_member.id) > (
+                                            COALESCE((SELECT m.point <-> ST_GeographyFromText(%s)
+                                                      FROM mumlife_member m WHERE m.id = %s),
+                                                     CAST(%s AS float8)),
+                                            %s
+                                        )"""],
+                             params=[point, point, id_, distance, id_])
+
 
 class Member(models.Model):
     PENDING = 0
@@ -117,18 +145,24 @@ class Member(models.Model):
     about = models.TextField("About", null=True, blank=True)
     spouse = models.ForeignKey('self', related_name='partner', null=True, blank=True, help_text="Spouse or Partner")
     interests = TagField("Interests")
+    # The geocode is mirrored by the database in the indexed 'point' geography column,
+    # used by distance queries (see migration 0007)
     geocode = models.CharField("Geocode", max_length=255, null=True, blank=True)
     units = models.IntegerField("Units", choices=(
         (0, 'Kilometers'),
         (1, 'Miles'),
     ), null=True, blank=True, default=1, help_text="Distance measurement units")
     max_range = models.IntegerField("Maximum Search Distance", default=5, help_text="Maximum range used by the Event Calendar slider")
+    # last change of the member, or of its messages and friendships deletions;
+    # used as a validator by the API (see api.conditional)
+    updated = models.DateTimeField(auto_now=True, db_index=True)
     friendships = models.ManyToManyField('self', null=True, blank=True, through='Friendships', \
                                          symmetrical=False, related_name='friends_with+')
 
     objects = MemberManager()
 
     def save(self, *args, **kwargs):
+        moved = False
         if self.id is not None:
             # The profile is created after user creation,
             # therefore no data will be associated with it then.
@@ -143,7 +177,12 @@ class Member(models.Model):
                 self.set_geocode()
             else:
                 self.postcode = 'N/A'
+            if settings.TIMELINE_ENABLED:
+                moved = not Member.objects.filter(pk=self.pk, postcode=self.postcode).exists()
         super(Member, self).save(*args, **kwargs)
+        if moved:
+            # the @local feed depends on the member area
+            TimelineEntry.objects.rebuild(self)
 
     def __unicode__(self):
         return self.name
@@ -153,11 +192,15 @@ class Member(models.Model):
 
     @property
     def is_admin(self):
-        return 'Administrators' in [g['name'] for g in self.user.groups.values('name')]
+        try:
+            # might have been prefetched (see mumlife.formatters)
+            return self._is_admin
+        except AttributeError:
+            return 'Administrators' in [g['name'] for g in self.user.groups.values('name')]
 
     def get_distance_from(self, entity=None):
         if not entity or not entity.geocode or entity.geocode == '0.0 0.0' or \
-            not self.geocode or self.geocode == '0.0 0.0':
+            not self.geocode or self.geocode == '0.0 0.0' or getattr(self, 'distance', None) is None:
                 return {
                     'units': 'N/A',
                     'distance-display': 'N/A',
@@ -197,7 +240,7 @@ class Member(models.Model):
         else:
             member['friend_status'] = False
         member['area'] = self.area
-        member['picture'] = self.picture.url if self.picture else ''
+        member['picture'] = images.get_url(self.picture.name, 'avatar') if self.picture else ''
         # distance
         if viewer is not None:
             try:
@@ -206,16 +249,8 @@ class Member(models.Model):
                 # If not, this will raise an AttributeError
                 _distance = self.distance
             except AttributeError:
-                point_from = 'POINT({})'.format(viewer.geocode)
-                point_to = 'POINT({})'.format(self.geocode)
-                distance_query = Member.objects.raw("""SELECT id, ST_Distance(
-                                            ST_GeographyFromText(%s),
-                                            ST_GeographyFromText(%s)
-                                          ) As distance
-                                          FROM mumlife_member
-                                          WHERE id=%s""",
-                                       [point_from, point_to, self.id])
-                self.distance = distance_query[0].distance
+                # computed in-process, from the geocodes
+                self.distance = distances.get_distance(viewer.geocode, self.geocode)
             distance = self.get_distance_from(viewer)
             member.update(distance)
         member['interests'] = self.interests.strip()
@@ -260,7 +295,9 @@ class Member(models.Model):
 
     def get_kids(self, viewer=None):
         kids = []
-        for kid in self.kids:
+        # kids might have been prefetched (see mumlife.formatters)
+        _kids = getattr(self, '_kids', None)
+        for kid in (_kids if _kids is not None else self.kids):
             # hide HIDDEN kids from other members
             if viewer != self and kid.visibility == Kid.HIDDEN:
                 continue
@@ -272,35 +309,36 @@ class Member(models.Model):
             from_member=self,
             to_member=member,
             status=status)
+        self._friendship_graph = None
         return friend
 
     def remove_friend(self, member):
         Friendships.objects.filter(
             from_member=self, 
             to_member=member).delete()
+        self._friendship_graph = None
+
+    @property
+    def friendship_graph(self):
+        """The member's friendships, loaded once (and cached) for all the lookups below."""
+        graph = getattr(self, '_friendship_graph', None)
+        if graph is None:
+            graph = caching.get_friendship_graph(self.id)
+            if graph is None:
+                graph = FriendshipGraph.load(self)
+                caching.set_friendship_graph(self.id, graph)
+            self._friendship_graph = graph
+        return graph
 
     def get_friends(self, status):
-        return self.friendships.filter(to_friend__status=status, to_friend__from_member=self)
+        return Member.objects.filter(id__in=self.friendship_graph.get_friend_ids(status))
 
     def get_friend_requests(self):
         # Requests exclude any request from BLOCKED members
-        blocked = [m['id'] for m in self.get_friends(status=Friendships.BLOCKED).values('id')]
-        return Friendships.objects.filter(status=Friendships.PENDING, to_member=self)\
-                                  .exclude(from_member__id__in=blocked)
+        return Friendships.objects.filter(id__in=self.friendship_graph.get_request_ids())
 
     def check_if_friend(self, member):
-        try:
-            # first, we check if this member has already been requested as a friend
-            member_relation = Friendships.objects.get(from_member=self, to_member=member)
-            return member_relation.get_status_display()
-        except Friendships.DoesNotExist:
-            # if no relation exist, it hasn't been requested as a friend.
-            # he might have requested self as a friend though, so we lookup any reverse
-            # relationship from the member to self
-            member_relation = self.get_friend_requests().filter(from_member=member)
-            if member_relation:
-                return 'Requesting'
-            return False
+        return self.friendship_graph.get_status(member.id)
 
     def set_slug(self):
         if not self.slug:
@@ -312,43 +350,37 @@ class Member(models.Model):
             self.slug = slug
 
     def set_geocode(self):
-        if not self.geocode or self.geocode == '0.0 0.0':
-            try:
-                geocode = Geocode.objects.get(code=self.postcode)
-            except Geocode.DoesNotExist:
-                if self.postcode is None:
-                    geocode = '0.0 0.0'
-                else:
-                    # If the geocode for this postcode has not yet been stored,
-                    # fetch it
-                    try:
-                        point = utils.get_postcode_point(self.postcode)
-                    except:
-                        # The function raises an Exception when the API call fails;
-                        # when this happens, do nothing
-                        logger.error('The Geocode retrieval for the postcode "{}" has failed.'.format(self.postcode))
-                        geocode = '0.0 0.0'
-                    else:
-                        geocode = Geocode.objects.create(code=self.postcode, latitude=point[0], longitude=point[1])
-            self.geocode = str(geocode)
+        if not self.geocode or self.geocode == geocoding.UNRESOLVED:
+            # The geocode is resolved from local data, so that saves never wait on the network;
+            # unresolved postcodes are geocoded by the 'geocode_postcodes' command
+            self.geocode = geocoding.resolve(self.postcode)
 
     def _filter_messages(self, search=None):
-        query_tags = None
+        """Return the messages matching the search, and the text searched, if any.
+
+        Known tags are read from the tags index: messages must be tagged with
+        all of them. The other words are searched in the messages text
+        (see MessageManager.search()).
+        """
+        messages = Message.objects.all()
+        text = ''
         if search:
             search = re.sub(r'\s\s*', ' ', search)
             search = re.sub(r'#|%23', '', search)
-            tags = ['#{}'.format(t) for t in search.split() if not t.startswith('@')]
-            if tags:
-                query_tags = Tag.objects.filter(name__in=tags)
-        if query_tags is None:
-            messages = Message.objects.all()
-        else:
-            messages = TaggedItem.objects.get_by_model(Message, query_tags)
+            words = [t for t in search.split() if not t.startswith('@')]
+            if words:
+                tags = set(MessageTag.objects.filter(name__in=[w.lower() for w in words])\
+                                             .values_list('name', flat=True).distinct())
+                for tag in tags:
+                    messages = messages.filter(id__in=MessageTag.objects.filter(name=tag).values('message'))
+                text = ' '.join([w for w in words if w.lower() not in tags])
+                if text:
+                    messages = Message.objects.search(messages, text)
         # exclude replies
         messages = messages.exclude(is_reply=True)
-        return messages
+        return messages, text
         
-    def get_messages(self, search=None):
+    def get_messages(self, search=None, ranked=False):
         """Member Messages include:
             - @local (default):
                 - Administrator messages (i.e. with no tags)
@@ -362,28 +394,49 @@ class Member(models.Model):
                 - FRIENDS messages in all areas, from account friends
             - @private:
                 - PRIVATE messages sent to account, regardless of area or friendship
+
+        When TIMELINE_ENABLED is set, the @local, @friends and @private feeds
+        are read from the member's timeline (see TimelineEntry).
+
+        Messages are in reverse chronological order, or by relevance
+        when 'ranked' is set and the search includes text.
         """
-        messages = self._filter_messages(search=search)
+        messages, text = self._filter_messages(search=search)
+        flag = self.get_feed_flag(search)
+
+        # exclude events
+        messages = messages.exclude(eventdate__isnull=False)
+
+        if settings.TIMELINE_ENABLED and flag in TimelineEntry.FEEDS:
+            # the feed has been written to the member's timeline
+            # when the messages were posted (see TimelineEntry)
+            messages = messages.filter(timeline_entries__member=self,
+                                       timeline_entries__feed=TimelineEntry.FEEDS[flag])
+            messages = messages.order_by('-timestamp', '-id')
+        else:
+            messages = self._filter_feed(messages, flag)
+        if ranked and text:
+            messages = messages.order_by('-search_rank', '-timestamp', '-id')
+        return messages
 
+    @staticmethod
+    def get_feed_flag(search):
+        """Return the feed flag of a messages search (see get_messages())."""
         # extract flags @flags
         # only one flag is allowed. Exceptions will default to @local
         flags = utils.Extractor(search).extract_flags()
         if not flags or len(flags) > 1:
             flags = ['@local']
-        try:
-            flag = flags[0]
-        except IndexError:
-            flag = None
-
-        # exclude events
-        messages = messages.exclude(eventdate__isnull=False)
+        return flags[0]
 
+    def _filter_feed(self, messages, flag):
+        """Filter messages with the visibility rules of the feed (see get_messages())."""
         # @friends results
         if flag == '@friends':
             # OWN FRIENDS messages
             _own = models.Q(member=self, visibility=Message.FRIENDS)
             # All messages from account friends
-            members_friends = [f['id'] for f in self.get_friends(status=Friendships.APPROVED).values('id')]
+            members_friends = self.friendship_graph.get_friend_ids(Friendships.APPROVED)
             _friends = models.Q(member__id__in=members_friends,
                          visibility__in=[Message.LOCAL, Message.GLOBAL, Message.FRIENDS])
             messages = messages.filter(_own | _friends)
@@ -410,17 +463,18 @@ class Member(models.Model):
             _admins_notags = models.Q(visibility=Message.LOCAL, 
                                       member__user__groups__name='Administrators', 
                                       tags='')
+            # messages tagged with the account area are read from the tags index
+            area_tagged = MessageTag.objects.filter(name=self.area.lower()).values('message')
             _admins_locals = models.Q(visibility=Message.LOCAL, 
                                       member__user__groups__name='Administrators', 
-                                      tags__contains='#{}'.format(self.area.lower()))
+                                      id__in=area_tagged)
             # LOCAL and GLOBAL messages within account areas
-            regex = r'\y{}\y'.format(self.area.lower())
             _locals = models.Q(visibility__in=[Message.LOCAL, Message.GLOBAL], 
                                area=self.area) | \
                       models.Q(visibility__in=[Message.LOCAL, Message.GLOBAL], 
-                               tags__regex=regex)
+                               id__in=area_tagged)
             # FRIENDS messages within account area, from account friends
-            members_friends = [f['id'] for f in self.get_friends(status=Friendships.APPROVED).values('id')]
+            members_friends = self.friendship_graph.get_friend_ids(Friendships.APPROVED)
             _friends = models.Q(member__id__in=members_friends,
                                 visibility=Message.FRIENDS,
                                 area=self.area)
@@ -428,122 +482,118 @@ class Member(models.Model):
             # Administrators messages to non-local areas should not be included
             _admins_nolocals = models.Q(member__user__groups__name='Administrators') \
                              & ~models.Q(tags='') \
-                             & ~models.Q(tags__contains='#{}'.format(self.area.lower()))
+                             & ~models.Q(id__in=area_tagged)
             messages = messages.exclude(_admins_nolocals)
 
         # order messages in reverse chronological order
-        messages = messages.order_by('-timestamp')
+        messages = messages.order_by('-timestamp', '-id')
         return messages.distinct()
 
-    def get_events(self, search=None, distance_range=None):
-        """All events are returned, regardless of the location of the sender/author.
-        Events are ordered by Event Date, rather than Post Date, in chronological order.
-        Events are upcoming (i.e. no past events).
+    def get_event_occurrences(self, search=None, distance_range=None, start=None, end=None):
+        """All event occurrences are returned, regardless of the location of the sender/author.
+        Occurrences are ordered by Event Date, rather than Post Date, in chronological order.
+        Occurrences are upcoming (i.e. no past events).
 
-        Recurring events are generated on-the-fly.
+        Recurring events occurrences are read from the EventOccurrence table,
+        so the QuerySet can be filtered, ordered and paginated in the database.
+        'start' and 'end' restrict the occurrences to a window (end excluded),
+        so that only the occurrences displayed are read.
         """
-        now = timezone.now()
-        messages = self._filter_messages(search=search)
+        messages, text = self._filter_messages(search=search)
 
         # exclude non-events
         messages = messages.exclude(eventdate__isnull=True)
 
-        # exclude past non-recurring events
-        messages = messages.exclude(occurrence=Message.OCCURS_ONCE,
-                                    eventdate__lt=now)
+        now = timezone.now()
+        occurrences = EventOccurrence.objects.filter(message__in=messages.values('id'),
+                                                     start__gte=max(start, now) if start is not None else now) \
+                                             .select_related('message')
+        if end is not None:
+            occurrences = occurrences.filter(start__lt=end)
 
-        messages = messages.distinct()
+        range_ = distance_range if distance_range is not None else 10**5
+        if settings.DISTANCE_ENGINE == 'haversine':
+            # PostGIS is unavailable: the occurrences are filtered in-process,
+            # by the upcoming events in range (see EVENTS_INDEX),
+            # as they are read, so that only the chunks of a page are read
+            ranked = EVENTS_INDEX.rank(self.geocode, range_)
+            return distances.RankedFilter(occurrences.order_by('start', 'id'), ranked, 'message_id', 'start')
 
         # add extra distance field
-        # Django ORM does not support HAVING clauses,
-        # so we have to use the distance function twice, once to filter the results,
-        # and once to add the field to the row.
-        point = 'POINT({})'.format(self.geocode)
-        range_ = distance_range if distance_range is not None else 10**5
-        messages = messages.extra(select={'distance': """ST_Distance(
-                                      ST_GeographyFromText(%s),
-                                      ST_GeographyFromText(CONCAT('POINT(', mumlife_message.geocode, ')'))
-                                  )"""},
-                                  select_params=(point,))
-        messages = messages.extra(where=["""ST_Distance(
-                                      ST_GeographyFromText(%s),
-                                      ST_GeographyFromText(CONCAT('POINT(', mumlife_message.geocode, ')'))
-                                  ) <= %s"""],
-                                  params=[point, range_])
-        events = list(messages)
-
-        # we keep recurring events for now, as we will use them to create the occurrences
-        # the occurences will then be filtered according to their dates
-        for message in messages.all():
-            if message.occurrence == Message.OCCURS_WEEKLY:
-                # generate occurrence from today, on this week day,
-                # at the the same time (hour, minutes, seconds)
-                if message.occurs_until:
-                    # when an end date is provided, we generate occurrences until that date only
-                    # ---
-                    # we have to convert date to datetime,
-                    # then make the datetime aware.
-                    # this is because Django stores date objects as naive dates
-                    d = datetime.combine(message.occurs_until, datetime.min.time())
-                    until = timezone.make_aware(d, timezone.get_default_timezone())
-                else:
-                    # otherwise we generate them for a month
-                    until = now+relativedelta(months=+1)
-
-                occurrences = list(rrule(WEEKLY,
-                                        byweekday=message.eventdate.weekday(),
-                                        byhour=message.eventdate.hour,
-                                        byminute=message.eventdate.minute,
-                                        bysecond=message.eventdate.second,
-                                        dtstart=now,
-                                        until=until))
-                # create events
-                for occurrence in occurrences:
-                    # we only add the occurence if its date is not the same as the original event
-                    # otherwise we get 2 identical events on the same day
-                    if occurrence.date() == message.eventdate.date():
-                        continue
-                    m = deepcopy(message)
-                    m.eventdate = occurrence
-                    events.append(m)
-
-        # filter out-of-date events+occurences
-        events = [e for e in events if e.eventdate >= now]
-
-        # order messages by increasing eventdate
-        events = sorted(events, key=operator.attrgetter('eventdate'))
-        return events
+        # the distance is computed on the indexed geography column 'point',
+        # and the range filter uses ST_DWithin, so that the index can be used
+        point = 'SRID=4326;POINT({})'.format(self.geocode)
+        occurrences = occurrences.extra(select={'distance': "ST_Distance(ST_GeographyFromText(%s), mumlife_message.point)"},
+                                        select_params=(point,))
+        occurrences = occurrences.extra(where=["ST_DWithin(mumlife_message.point, ST_GeographyFromText(%s), %s)"],
+                                        params=[point, range_])
+
+        # order occurrences by increasing eventdate
+        return occurrences.order_by('start', 'id')
+
+    def get_events(self, search=None, distance_range=None, start=None, end=None):
+        """All events are returned, regardless of the location of the sender/author.
+        Events are ordered by Event Date, rather than Post Date, in chronological order.
+        Events are upcoming (i.e. no past events).
+
+        Each occurrence of a recurring event is returned as a Message,
+        whose eventdate is the occurrence date.
+        """
+        occurrences = self.get_event_occurrences(search=search, distance_range=distance_range,
+                                                 start=start, end=end)
+        return [occurrence.as_message() for occurrence in occurrences]
+
+    def get_events_calendar(self, search=None, distance_range=None, start=None, end=None):
+        """Return the number of events per day, as a list of (date, count)
+        in chronological order; days without events are omitted.
+        Days are in the local time zone.
+        Only the occurrences dates are read, the events are not loaded.
+        """
+        occurrences = self.get_event_occurrences(search=search, distance_range=distance_range,
+                                                 start=start, end=end)
+        days = {}
+        for date in occurrences.values_list('start', flat=True):
+            day = timezone.localtime(date).date()
+            days[day] = days.get(day, 0) + 1
+        return sorted(days.items())
+
+    def get_conversations(self):
+        """Return the member's conversations (see Conversation), the most recent first."""
+        return self.conversations.select_related('other', 'last_message')\
+                                 .order_by('-last_message_at', '-id')
 
     def get_notifications(self):
         """Search for any new notifications for the member.
-        The results is different to the one stored in Member.notifications.all(),
-        which stores the notifications already notified (i.e. already read).
+        The read state of the results is held by Member.notifications.
         """
         count = 0
         results = []
 
         # 1. Private Messages
         # ------------------------------------------------
-        # member who have sent you private messages in the last 7 days
-        privates = Message.objects.filter(visibility=Message.PRIVATE,
-                                          recipient=self,
-                                          timestamp__gte=timezone.now()-timedelta(7))\
-                                  .order_by('-timestamp')
-        if privates.count():
-            count += privates.count()
+        # conversations with unread private messages received in the last 7 days,
+        # with their last message (see Conversation)
+        conversations = list(self.conversations.filter(unread__gt=0,
+                                                       last_received_at__gte=timezone.now()-timedelta(7))\
+                                               .select_related('last_received')\
+                                               .order_by('-last_received_at'))
+        privates = [c.last_received for c in conversations if c.last_received is not None]
+        if privates:
+            unread = sum([c.unread for c in conversations])
+            count += unread
             results.append({
                 'type': 'messages',
                 'messages': [m.format(viewer=self) for m in privates],
                 'timestamp': privates[0].timestamp,
                 'age': privates[0].get_age(),
-                'count': privates.count()
+                'count': unread
             })
 
         # 2. Events of the day you're in
         # ------------------------------------------------
         # @TODO 'in' events
-        events = self.get_events()
-        events = [r for r in events if r.eventdate is not None and r.eventdate.date() == timezone.now().date()]
+        today = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        events = [o.as_message() for o in self.get_event_occurrences(end=today+timedelta(1))]
         count += len(events)
         for event in events:
             evt = event.format(viewer=self)
@@ -555,7 +605,7 @@ class Member(models.Model):
 
         # 3. Friends requests
         # ------------------------------------------------
-        friend_requests = self.get_friend_requests().count()
+        friend_requests = len(self.friendship_graph.get_request_ids())
         if friend_requests:
             count += friend_requests
             results.append({
@@ -691,11 +741,109 @@ class Friendships(models.Model):
     from_member = models.ForeignKey(Member, related_name='from_friend')
     to_member = models.ForeignKey(Member, related_name='to_friend')
     status = models.IntegerField(choices=STATUSES)
+    updated = models.DateTimeField(auto_now=True, db_index=True)
 
     def __unicode__(self):
         return u'{} & {} [{}]'.format(self.from_member, self.to_member, self.get_status_display())
 
 
+class FriendshipGraph(object):
+    """The friendships of a member, outgoing and incoming, by member id.
+
+    The graph is loaded in one query, and cached until one of
+    the member's friendships is saved or deleted.
+    """
+
+    def __init__(self, member_id, relations):
+        self.member_id = member_id
+        # status of the relations from the member, by member id
+        self.outgoing = {}
+        # (id, status) of the relations to the member, by member id
+        self.incoming = {}
+        for id_, from_member_id, to_member_id, status in relations:
+            if from_member_id == member_id:
+                self.outgoing[to_member_id] = status
+            else:
+                self.incoming[from_member_id] = (id_, status)
+
+    @classmethod
+    def load(cls, member):
+        relations = Friendships.objects.filter(models.Q(from_member=member) | models.Q(to_member=member))\
+                                       .values_list('id', 'from_member', 'to_member', 'status')
+        return cls(member.id, relations)
+
+    def get_status(self, member_id):
+        """Return the friendship status with a member, as displayed,
+        'Requesting' if the member requested the friendship, or False.
+        """
+        if member_id in self.outgoing:
+            return dict(Friendships.STATUSES)[self.outgoing[member_id]]
+        relation = self.incoming.get(member_id)
+        if relation is not None and relation[1] == Friendships.PENDING:
+            return 'Requesting'
+        return False
+
+    def get_friend_ids(self, status):
+        return [member_id for member_id, status_ in self.outgoing.items() if status_ == status]
+
+    def get_request_ids(self):
+        """Return the ids of the pending friendship requests,
+        excluding the requests from BLOCKED members.
+        """
+        return [id_ for member_id, (id_, status) in self.incoming.items()
+                if status == Friendships.PENDING and self.outgoing.get(member_id) != Friendships.BLOCKED]
+
+
+def invalidate_friendship_graphs(sender, instance, **kwargs):
+    caching.invalidate_friendship_graphs(instance.from_member_id, instance.to_member_id)
+post_save.connect(invalidate_friendship_graphs, sender=Friendships)
+post_delete.connect(invalidate_friendship_graphs, sender=Friendships)
+
+
+class MessageManager(models.Manager):
+    def update_thread(self, message_id):
+        """Update the replies counters of a message."""
+        replies = self.filter(is_reply=True, reply_to__id=message_id)\
+                      .aggregate(count=models.Count('id'), last=models.Max('timestamp'))
+        self.filter(pk=message_id).update(reply_count=replies['count'],
+                                          last_reply_at=replies['last'],
+                                          updated=timezone.now())
+
+    def get_last_replies(self, message_ids, count):
+        """Return the last 'count' replies of each message, in chronological order,
+        as lists by message id; in one query.
+        """
+        if not message_ids:
+            return {}
+        columns = ', '.join(['mumlife_message.{}'.format(f.column) for f in self.model._meta.fields])
+        replies = self.raw("""
+            SELECT * FROM (
+                SELECT {}, row_number() OVER (PARTITION BY reply_to_id ORDER BY timestamp DESC, id DESC) AS reply_rank
+                FROM mumlife_message
+                WHERE is_reply AND reply_to_id IN ({})
+            ) replies
+            WHERE reply_rank <= %s
+            ORDER BY timestamp, id
+        """.format(columns, ', '.join(['%s'] * len(message_ids))), list(message_ids) + [count])
+        results = {}
+        for reply in replies:
+            results.setdefault(reply.reply_to_id, []).append(reply)
+        return results
+
+    def search(self, messages, text):
+        """Filter messages matching the text, in their name, body, tags or location.
+
+        The search uses the full-text 'search_vector' column, maintained by the
+        database and indexed with GIN (see migration 0015); the relevance
+        is selected as 'search_rank'.
+        """
+        query = "plainto_tsquery('english', %s)"
+        return messages.extra(select={'search_rank': "ts_rank_cd(mumlife_message.search_vector, {})".format(query)},
+                              select_params=(text,),
+                              where=["mumlife_message.search_vector @@ {}".format(query)],
+                              params=[text])
+
+
 class Message(models.Model):
     # Visibility Settings
     PRIVATE = 0
@@ -724,8 +872,10 @@ class Message(models.Model):
     picture = models.ImageField("Picture", upload_to='./posts/%Y/%m/%d', null=True, blank=True, \
                                 help_text="PNG, JPEG, or GIF; max size 2 MB. Image must be 403 x 403 pixels or larger.")
     location = models.TextField(blank=True, null=True)
+    # mirrored in the indexed 'point' geography column, as for Member
     geocode = models.CharField(max_length=255, null=True, blank=True)
     timestamp = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True, db_index=True)
     eventdate = models.DateTimeField(null=True, blank=True)
     eventenddate = models.DateTimeField(null=True, blank=True)
     visibility = models.IntegerField(choices=VISIBILITY_CHOICES, default=LOCAL)
@@ -735,6 +885,19 @@ class Message(models.Model):
     recipient = models.ForeignKey(Member, null=True, blank=True, related_name='sender')
     is_reply = models.BooleanField(default=False)
     reply_to = models.ForeignKey('self', null=True, blank=True, related_name='author')
+    # thread counters, maintained on replies creation and deletion
+    reply_count = models.IntegerField(default=0, editable=False)
+    last_reply_at = models.DateTimeField(null=True, blank=True, editable=False)
+    # body and tags pre-rendered on save, for format() (see render())
+    body_html = models.TextField(blank=True, default='', editable=False)
+    body_with_links = models.TextField(blank=True, default='', editable=False)
+    synopsis = models.TextField(blank=True, default='', editable=False)
+    tags_inline = models.TextField(blank=True, default='', editable=False)
+    tags_item = models.TextField(blank=True, default='', editable=False)
+
+    RENDERED_FIELDS = ('body_html', 'body_with_links', 'synopsis', 'tags_inline', 'tags_item')
+
+    objects = MessageManager()
 
     def __unicode__(self):
         return u'{}'.format(self.body)
@@ -751,8 +914,24 @@ class Message(models.Model):
 
     def save(self, *args, **kwargs):
         self.set_geocode()
+        self.render()
         super(Message, self).save(*args, **kwargs)
 
+    def render(self):
+        """Pre-render the body and the tags, so that they are not parsed on each format()."""
+        # escape body to prevent script attacks
+        body = strip_tags(force_unicode(self.body))
+        # parse body to display hashtag links
+        self.body_html = utils.Extractor(body).parse(with_links=False)
+        self.body_with_links = utils.Extractor(body).parse()
+        self.synopsis = Truncator(body).words(20, truncate=' ...')
+        # tags are stored as space-separated values (i.e.: '#se16 #parks')
+        inline_tags = utils.Extractor(self.body).extract_tags()
+        item_tags = utils.Extractor(self.tags).extract_tags()
+        self.tags_inline = ' '.join(sorted(inline_tags.values()))
+        self.tags_item = ' '.join(sorted([value for key, value in item_tags.items()
+                                          if not inline_tags.has_key(key)]))
+
     @property
     def is_event(self):
         return True if self.eventdate is not None else False
@@ -766,7 +945,11 @@ class Message(models.Model):
         return ts.split(',')[0]
 
     def get_replies(self, viewer=None):
-        return [message.format(viewer=viewer) for message in self.replies]
+        # replies might have been prefetched (see mumlife.formatters)
+        replies = getattr(self, '_replies', None)
+        if replies is None:
+            replies = self.replies
+        return [message.format(viewer=viewer) for message in replies]
 
     @property
     def postcode(self):
@@ -778,21 +961,23 @@ class Message(models.Model):
         return postcode.upper()
 
     def format(self, viewer=None):
-        message = dict([(f.name, getattr(self, f.name)) for f in self._meta.fields])
+        if self.body and not self.body_html:
+            # the message has not been rendered yet
+            # (see the 'render_messages' command)
+            self.render()
+        message = dict([(f.name, getattr(self, f.name)) for f in self._meta.fields
+                        if f.name not in self.RENDERED_FIELDS])
         if not self.name:
             # messages have empty names,
             # in which case we set it to the body text
             message['title'] = self.body
         else:
             message['title'] = self.name
-        # escape body to prevent script attacks
-        body = strip_tags(force_unicode(self.body))
-        # parse body to display hashtag links
-        message['body'] = utils.Extractor(body).parse(with_links=False)
-        message['body_with_links'] = utils.Extractor(body).parse()
-        message['synopsis'] = Truncator(strip_tags(force_unicode(self.body))).words(20, truncate=' ...')
+        message['body'] = self.body_html
+        message['body_with_links'] = self.body_with_links
+        message['synopsis'] = self.synopsis
         message['date'] = self.timestamp.strftime('%c')
-        message['picture'] = self.picture.url if self.picture else ''
+        message['picture'] = images.get_url(self.picture.name, 'feed') if self.picture else ''
         message['areas'] = ' '.join(self.get_areas_from_tags())
         # format event details
         if self.eventdate:
@@ -820,16 +1005,8 @@ class Message(models.Model):
                 # If not, this will raise an AttributeError
                 _distance = self.distance
             except AttributeError:
-                point_from = 'POINT({})'.format(viewer.geocode)
-                point_to = 'POINT({})'.format(self.geocode)
-                distance_query = Member.objects.raw("""SELECT id, ST_Distance(
-                                            ST_GeographyFromText(%s),
-                                            ST_GeographyFromText(%s)
-                                          ) As distance
-                                          FROM mumlife_member
-                                          WHERE id=%s""",
-                                       [point_from, point_to, viewer.id])
-                self.distance = distance_query[0].distance
+                # computed in-process, from the geocodes
+                self.distance = distances.get_distance(viewer.geocode, self.geocode)
             viewer.distance = self.distance
             distance = viewer.get_distance_from(self)
             message.update(distance)
@@ -848,118 +1025,645 @@ class Message(models.Model):
         return message
 
     def get_tags(self, filter_=None):
-        tags = utils.Extractor(self.tags).extract_tags()
-        item_tags = tags.copy()
-        inline_tags = utils.Extractor(self.body).extract_tags()
-        for tag in inline_tags.keys():
-            if item_tags.has_key(tag):
-                del item_tags[tag]
         if filter_:
+            # item and inline tags are pre-rendered (see render())
             if filter_ == 'item':
-                return [{'key': tag[0], 'value': tag[1]} for \
-                        tag in item_tags.items()]
+                return [{'key': tag[1:], 'value': tag} for \
+                        tag in self.tags_item.split()]
             elif filter_ == 'inline':
-                return [{'key': tag[0], 'value': tag[1]} for \
-                        tag in inline_tags.items()]
+                return [{'key': tag[1:], 'value': tag} for \
+                        tag in self.tags_inline.split()]
+        tags = utils.Extractor(self.tags).extract_tags()
         return [{'key': tag[0], 'value': tag[1]} for \
                 tag in tags.items()]
 
     def get_areas_from_tags(self):
         tags = utils.Extractor(self.tags.upper()).extract_tags().keys()
-        tags = [t for t in tags if t in POSTCODE_AREAS]
+        areas = POSTCODE_AREAS.areas
+        tags = [t for t in tags if t in areas]
         return tags
 
     def set_geocode(self):
+        # messages with no postcode are located with the 'N/A' geocode, when set
+        self.geocode = geocoding.resolve(self.postcode or 'N/A')
+
+
+# Coordinates of the members and upcoming events, ranked in-process
+# when DISTANCE_ENGINE is 'haversine' (see mumlife.distances)
+MEMBERS_INDEX = distances.DistanceIndex(lambda: Member.objects.values_list('id', 'geocode'), 'members')
+EVENTS_INDEX = distances.DistanceIndex(lambda: Message.objects.filter(occurrences__start__gte=timezone.now())\
+                                                              .distinct()\
+                                                              .values_list('id', 'geocode'), 'events')
+
+
+def update_members_index(sender, instance, **kwargs):
+    if settings.DISTANCE_ENGINE == 'haversine':
+        MEMBERS_INDEX.update(instance.id, instance.geocode)
+post_save.connect(update_members_index, sender=Member)
+
+
+def discard_member_from_index(sender, instance, **kwargs):
+    if settings.DISTANCE_ENGINE == 'haversine':
+        MEMBERS_INDEX.discard(instance.id)
+post_delete.connect(discard_member_from_index, sender=Member)
+
+
+def update_events_index(sender, instance, **kwargs):
+    # events which are no longer upcoming are left until the index is reloaded,
+    # as their occurrences are filtered by date anyway
+    if settings.DISTANCE_ENGINE == 'haversine' and instance.eventdate is not None:
+        EVENTS_INDEX.update(instance.id, instance.geocode)
+post_save.connect(update_events_index, sender=Message)
+
+
+def discard_event_from_index(sender, instance, **kwargs):
+    if settings.DISTANCE_ENGINE == 'haversine' and instance.eventdate is not None:
+        EVENTS_INDEX.discard(instance.id)
+post_delete.connect(discard_event_from_index, sender=Message)
+
+
+class MessageTag(models.Model):
+    """Normalized index of the messages tags.
+
+    Names are in lower case, without the leading character #.
+    The index is kept in sync with Message.tags when messages are saved.
+    """
+    message = models.ForeignKey(Message, related_name='tag_index')
+    name = models.CharField(max_length=255)
+
+    class Meta:
+        unique_together = (('name', 'message'),)
+
+    def __unicode__(self):
+        return self.name
+
+
+def index_message_tags(sender, instance, **kwargs):
+    names = set(utils.get_tag_names(instance.tags))
+    indexed = set(instance.tag_index.values_list('name', flat=True))
+    if names - indexed:
+        MessageTag.objects.bulk_create([MessageTag(message=instance, name=name) for name in names - indexed])
+    if indexed - names:
+        instance.tag_index.filter(name__in=indexed - names).delete()
+post_save.connect(index_message_tags, sender=Message)
+
+
+class TimelineEntryManager(models.Manager):
+    def get_audience(self, message):
+        """Return the ids of the members whose feeds include the message, by feed.
+
+        These are the visibility rules of Member.get_messages(), from the message side.
+        """
+        audience = {}
+        if message.is_reply or message.eventdate is not None:
+            return audience
+        visibility = int(message.visibility)
+
+        # @private
+        if visibility == Message.PRIVATE:
+            audience[TimelineEntry.PRIVATE] = [message.member_id]
+            if message.recipient_id is not None:
+                audience[TimelineEntry.PRIVATE].append(message.recipient_id)
+            return audience
+
+        # @friends: the members who approved the author as a friend
+        # (the timelines of inactive members are not written, see update_activated_timeline)
+        friends = Friendships.objects.filter(to_member=message.member_id,
+                                             status=Friendships.APPROVED,
+                                             from_member__user__is_active=True)\
+                                     .values_list('from_member', flat=True)
+        audience[TimelineEntry.FRIENDS] = list(friends)
+        if visibility == Message.FRIENDS:
+            audience[TimelineEntry.FRIENDS].append(message.member_id)
+
+        # @local
+        in_area = self._area_query([message.area])
+        tagged = self._area_query(utils.get_tag_names(message.tags), ignore_case=True)
+        is_admin = message.member.is_admin
+        if is_admin and message.tags:
+            # Administrators messages to non-local areas are not included
+            query = tagged & in_area if visibility == Message.FRIENDS else tagged
+        elif is_admin and visibility == Message.LOCAL:
+            # Administrators messages with no tags are for all members
+            query = models.Q()
+        elif visibility == Message.FRIENDS:
+            query = in_area
+        else:
+            query = in_area | tagged
+        members = Member.objects.filter(query).filter(user__is_active=True)
+        if visibility == Message.FRIENDS:
+            members = members.filter(id__in=friends)
+        audience[TimelineEntry.LOCAL] = members.values_list('id', flat=True)
+        return audience
+
+    def _area_query(self, areas, ignore_case=False):
+        """Return the query of the members in the areas (see Member.area)."""
+        if not areas:
+            return models.Q(pk__in=[])
+        lookups = ('istartswith', 'iexact') if ignore_case else ('startswith', 'exact')
+        queries = []
+        for area in areas:
+            # areas are the postcodes outward codes
+            queries.append(models.Q(**{'postcode__{}'.format(lookups[0]): u'{} '.format(area)}))
+            queries.append(models.Q(**{'postcode__{}'.format(lookups[1]): area}))
+        return reduce(operator.or_, queries)
+
+    def _write(self, entries, replaced):
+        with transaction.commit_on_success():
+            replaced.delete()
+            self.bulk_create(entries, batch_size=500)
+
+    def replace(self, entries, replaced):
+        """Replace the entries of the 'replaced' QuerySet with 'entries', in a transaction,
+        so that the timelines are never read partially written.
+        The same entries might be written concurrently (i.e. by fan_out()):
+        they are then replaced again.
+        """
         try:
-            postcode = self.postcode
-            if not postcode:
-                postcode = 'N/A'
-            geocode = Geocode.objects.get(code=postcode)
-        except Geocode.DoesNotExist:
-            if postcode is None or postcode == 'N/A':
-                geocode = '0.0 0.0'
+            self._write(entries, replaced)
+        except IntegrityError:
+            self._write(entries, replaced)
+        return entries
+
+    def fan_out(self, message):
+        """(Re)write the message to the timelines of its audience."""
+        entries = []
+        for feed, members in self.get_audience(message).items():
+            entries.extend([TimelineEntry(member_id=member_id, message=message, feed=feed)
+                            for member_id in set(members)])
+        return self.replace(entries, self.filter(message=message))
+
+    def fan_out_member(self, member):
+        """(Re)write the messages of a member to the timelines of their audience,
+        i.e. when the member joins or leaves the Administrators.
+        """
+        messages = Message.objects.filter(member=member)\
+                                  .exclude(is_reply=True)\
+                                  .exclude(eventdate__isnull=False)\
+                                  .select_related('member')
+        return [entry for message in messages for entry in self.fan_out(message)]
+
+    def _get_entries(self, member, messages, flags):
+        entries = []
+        for flag in flags:
+            ids = member._filter_feed(messages, flag).order_by().values_list('id', flat=True)
+            entries.extend([TimelineEntry(member=member, message_id=message_id, feed=TimelineEntry.FEEDS[flag])
+                            for message_id in ids])
+        return entries
+
+    def rebuild(self, member):
+        """(Re)write the timeline of a member, from the existing messages."""
+        messages = Message.objects.exclude(is_reply=True).exclude(eventdate__isnull=False)
+        entries = self._get_entries(member, messages, TimelineEntry.FEEDS.keys())
+        return self.replace(entries, self.filter(member=member))
+
+    def update_friend(self, member, friend_id):
+        """(Re)write the messages of a friend to the timeline of a member,
+        i.e. when their friendship changes: the @local and @friends feeds depend on it.
+        """
+        messages = Message.objects.filter(member=friend_id)\
+                                  .exclude(is_reply=True)\
+                                  .exclude(eventdate__isnull=False)
+        entries = self._get_entries(member, messages, ['@local', '@friends'])
+        replaced = self.filter(member=member,
+                               feed__in=[TimelineEntry.LOCAL, TimelineEntry.FRIENDS],
+                               message__member=friend_id)
+        return self.replace(entries, replaced)
+
+
+class TimelineEntry(models.Model):
+    """Per-member home timeline (fan-out-on-write).
+
+    When a message is saved, it is written to the @local, @friends or @private
+    feed of each member who can see it, so that reading a feed is a range read
+    of the member's entries, rather than the evaluation of the visibility rules.
+    The timelines are used when TIMELINE_ENABLED is set;
+    they are (re)built with the 'build_timelines' command.
+    """
+    LOCAL = 0
+    FRIENDS = 1
+    PRIVATE = 2
+    FEED_CHOICES = (
+        (LOCAL, 'Local'),
+        (FRIENDS, 'Friends'),
+        (PRIVATE, 'Private'),
+    )
+    FEEDS = {
+        '@local': LOCAL,
+        '@friends': FRIENDS,
+        '@private': PRIVATE,
+    }
+
+    member = models.ForeignKey(Member, related_name='timeline')
+    message = models.ForeignKey(Message, related_name='timeline_entries')
+    feed = models.IntegerField(choices=FEED_CHOICES)
+
+    objects = TimelineEntryManager()
+
+    class Meta:
+        unique_together = (('member', 'feed', 'message'),)
+        verbose_name_plural = "timeline entries"
+
+    def __unicode__(self):
+        return u'{} [{}]: {}'.format(self.member, self.get_feed_display(), self.message)
+
+
+def fan_out_message(sender, instance, **kwargs):
+    if settings.TIMELINE_ENABLED:
+        TimelineEntry.objects.fan_out(instance)
+post_save.connect(fan_out_message, sender=Message)
+
+
+def update_friendship_timeline(sender, instance, **kwargs):
+    # the member's @local and @friends feeds include the messages of its friends
+    if not settings.TIMELINE_ENABLED:
+        return
+    try:
+        # the member's friendship graph has just been invalidated
+        member = Member.objects.get(pk=instance.from_member_id)
+    except Member.DoesNotExist:
+        return
+    TimelineEntry.objects.update_friend(member, instance.to_member_id)
+post_save.connect(update_friendship_timeline, sender=Friendships)
+post_delete.connect(update_friendship_timeline, sender=Friendships)
+
+
+def update_administrators_timelines(sender, instance, action, reverse, pk_set, **kwargs):
+    # Administrators messages are written to other timelines than members messages,
+    # so the messages of the members who join or leave the group are written again
+    if not settings.TIMELINE_ENABLED:
+        return
+    if action == 'pre_clear':
+        # the members are read before the groups are cleared
+        if reverse:
+            is_admins = instance.name == 'Administrators'
+            instance._cleared_users = list(instance.user_set.values_list('id', flat=True)) if is_admins else []
+        else:
+            is_admin = instance.groups.filter(name='Administrators').exists()
+            instance._cleared_users = [instance.id] if is_admin else []
+        return
+    if action == 'post_clear':
+        user_ids = getattr(instance, '_cleared_users', [])
+    elif action in ('post_add', 'post_remove'):
+        if reverse:
+            user_ids = list(pk_set) if instance.name == 'Administrators' else []
+        else:
+            is_admins = Group.objects.filter(id__in=pk_set, name='Administrators').exists()
+            user_ids = [instance.id] if is_admins else []
+    else:
+        return
+    for member in Member.objects.filter(user__in=user_ids):
+        TimelineEntry.objects.fan_out_member(member)
+m2m_changed.connect(update_administrators_timelines, sender=User.groups.through)
+
+
+def check_user_activation(sender, instance, update_fields=None, **kwargs):
+    instance._activation_changed = False
+    if not settings.TIMELINE_ENABLED or instance.pk is None:
+        return
+    if update_fields is not None and 'is_active' not in update_fields:
+        # e.g. last_login updates
+        return
+    instance._activation_changed = not User.objects.filter(pk=instance.pk, is_active=instance.is_active).exists()
+pre_save.connect(check_user_activation, sender=User)
+
+
+def update_activated_timeline(sender, instance, **kwargs):
+    # the timelines of inactive members are not written (see TimelineEntryManager.get_audience):
+    # they are removed on deactivation, and rebuilt on activation
+    if not getattr(instance, '_activation_changed', False):
+        return
+    instance._activation_changed = False
+    try:
+        member = Member.objects.get(user=instance)
+    except Member.DoesNotExist:
+        return
+    if instance.is_active:
+        TimelineEntry.objects.rebuild(member)
+    else:
+        TimelineEntry.objects.filter(member=member).delete()
+post_save.connect(update_activated_timeline, sender=User)
+
+
+class ConversationManager(models.Manager):
+    def get_messages(self, member, other):
+        """Return the private messages between two members."""
+        return Message.objects.filter(models.Q(member=member, recipient=other) | \
+                                      models.Q(member=other, recipient=member),
+                                      visibility=Message.PRIVATE,
+                                      is_reply=False)
+
+    def _update_or_create(self, member_id, other_id, values, defaults):
+        """Update the conversation of a member with another, or create it.
+        Concurrent creations collide on (member, other): the update is then retried.
+        """
+        if self.filter(member=member_id, other=other_id).update(**values):
+            return
+        sid = transaction.savepoint()
+        try:
+            self.create(member_id=member_id, other_id=other_id, **defaults)
+        except IntegrityError:
+            transaction.savepoint_rollback(sid)
+            self.filter(member=member_id, other=other_id).update(**values)
+        else:
+            transaction.savepoint_commit(sid)
+
+    def record(self, message):
+        """Record a new private message in the conversations of its sender and recipient."""
+        if not Conversation.is_private(message):
+            return
+        sent = {
+            'last_message': message,
+            'last_message_at': message.timestamp,
+        }
+        self._update_or_create(message.member_id, message.recipient_id, sent, sent)
+        received = dict(sent, last_received=message, last_received_at=message.timestamp)
+        self._update_or_create(message.recipient_id, message.member_id,
+                               dict(received, unread=models.F('unread') + 1),
+                               dict(received, unread=1))
+
+    def rebuild(self, member_id, other_id, read_at=None):
+        """(Re)write the conversation of a member with another, from the existing messages.
+        The messages received until 'read_at' are read, unless the conversation has been read since.
+        """
+        messages = self.get_messages(member_id, other_id).order_by('-timestamp', '-id')
+        received = messages.filter(member=other_id)
+        try:
+            conversation = self.get(member=member_id, other=other_id)
+        except Conversation.DoesNotExist:
+            conversation = Conversation(member_id=member_id, other_id=other_id)
+        last_messages = list(messages[:1])
+        if not last_messages:
+            if conversation.pk is not None:
+                conversation.delete()
+            return None
+        last_received = list(received[:1])
+        conversation.last_message = last_messages[0]
+        conversation.last_message_at = last_messages[0].timestamp
+        conversation.last_received = last_received[0] if last_received else None
+        conversation.last_received_at = last_received[0].timestamp if last_received else None
+        if read_at is not None and (conversation.read_at is None or conversation.read_at < read_at):
+            conversation.read_at = read_at
+        if conversation.read_at is not None:
+            received = received.filter(timestamp__gt=conversation.read_at)
+        conversation.unread = received.count()
+        conversation.save()
+        return conversation
+
+    def mark_read(self, member, other=None):
+        """Mark the conversations of a member as read (with another member only, if given)."""
+        conversations = self.filter(member=member)
+        if other is not None:
+            conversations = conversations.filter(other=other)
+        if conversations.update(unread=0, read_at=timezone.now()):
+            # the cached notifications hold the unread private messages
+            caching.invalidate_notifications(getattr(member, 'id', member))
+
+
+class Conversation(models.Model):
+    """Index of the private messages, by member and correspondent.
+
+    Each private message updates the conversation of its sender
+    and the conversation of its recipient (one row each), so that the
+    inbox and the unread private messages of a member are read from
+    its conversations, rather than from the messages.
+    They are (re)built with the 'build_conversations' command.
+    """
+    member = models.ForeignKey(Member, related_name='conversations')
+    other = models.ForeignKey(Member, related_name='+')
+    last_message = models.ForeignKey(Message, null=True, blank=True, related_name='+', on_delete=models.SET_NULL)
+    last_message_at = models.DateTimeField(null=True, blank=True)
+    last_received = models.ForeignKey(Message, null=True, blank=True, related_name='+', on_delete=models.SET_NULL)
+    last_received_at = models.DateTimeField(null=True, blank=True)
+    # messages received since read_at
+    unread = models.IntegerField(default=0)
+    read_at = models.DateTimeField(null=True, blank=True)
+
+    objects = ConversationManager()
+
+    class Meta:
+        unique_together = (('member', 'other'),)
+
+    def __unicode__(self):
+        return u'{} & {} [{} unread]'.format(self.member, self.other, self.unread)
+
+    @staticmethod
+    def is_private(message):
+        return not message.is_reply and int(message.visibility) == Message.PRIVATE \
+               and message.recipient_id is not None and message.recipient_id != message.member_id
+
+
+def check_private_message(sender, instance, **kwargs):
+    # an edited message might not be private anymore (i.e. its visibility changed)
+    instance._previous_conversation = None
+    if instance.pk is None:
+        return
+    try:
+        previous = Message.objects.only('member', 'recipient', 'visibility', 'is_reply').get(pk=instance.pk)
+    except Message.DoesNotExist:
+        return
+    if Conversation.is_private(previous):
+        instance._previous_conversation = (previous.member_id, previous.recipient_id)
+pre_save.connect(check_private_message, sender=Message)
+
+
+def update_conversations(sender, instance, created=False, **kwargs):
+    if created:
+        Conversation.objects.record(instance)
+        return
+    # the message might have been edited, or deleted
+    conversations = set()
+    if Conversation.is_private(instance):
+        conversations.add((instance.member_id, instance.recipient_id))
+    previous = getattr(instance, '_previous_conversation', None)
+    if previous is not None:
+        conversations.add(previous)
+    for member_id, other_id in conversations:
+        Conversation.objects.rebuild(member_id, other_id)
+        Conversation.objects.rebuild(other_id, member_id)
+post_save.connect(update_conversations, sender=Message)
+post_delete.connect(update_conversations, sender=Message)
+
+
+class EventOccurrenceManager(models.Manager):
+    def generate(self, message, now=None):
+        """(Re)generate the occurrences of an event.
+
+        Weekly events are generated until their end date if provided,
+        or EVENTS_HORIZON_MONTHS months ahead otherwise;
+        the horizon is extended by the 'update_event_occurrences' command.
+        """
+        if now is None:
+            now = timezone.now()
+        self.filter(message=message).delete()
+        if message.eventdate is None or message.is_reply:
+            return []
+        if message.occurrence == Message.OCCURS_WEEKLY:
+            if message.occurs_until:
+                # when an end date is provided, we generate occurrences until that date only
+                # ---
+                # we have to convert date to datetime,
+                # then make the datetime aware.
+                # this is because Django stores date objects as naive dates
+                d = datetime.combine(message.occurs_until, datetime.min.time())
+                until = timezone.make_aware(d, timezone.get_default_timezone())
             else:
-                # If the geocode for this postcode has not yet been stored,
-                # fetch it
-                try:
-                    point = utils.get_postcode_point(postcode)
-                except:
-                    # The function raises an Exception when the API call fails;
-                    # when this happens, do nothing
-                    logger.error('The Geocode retrieval for the postcode "{}" has failed.'.format(self.postcode))
-                    geocode = '0.0 0.0'
-                else:
-                    geocode = Geocode.objects.create(code=postcode, latitude=point[0], longitude=point[1])
-        self.geocode = str(geocode)
+                until = now+relativedelta(months=+settings.EVENTS_HORIZON_MONTHS)
+            # occurrences are on the event week day,
+            # at the the same time (hour, minutes, seconds)
+            dates = list(rrule(WEEKLY, dtstart=message.eventdate, until=until)) or [message.eventdate]
+        else:
+            dates = [message.eventdate]
+        duration = message.eventenddate - message.eventdate if message.eventenddate else None
+        occurrences = [EventOccurrence(message=message,
+                                       start=date,
+                                       end=date + duration if duration is not None else None)
+                       for date in dates if date >= now]
+        self.bulk_create(occurrences)
+        return occurrences
+
+
+class EventOccurrence(models.Model):
+    """Materialized occurrences of events (once or recurring)."""
+    message = models.ForeignKey(Message, related_name='occurrences')
+    start = models.DateTimeField(db_index=True)
+    end = models.DateTimeField(null=True, blank=True)
+
+    objects = EventOccurrenceManager()
+
+    def __unicode__(self):
+        return u'{} [{}]'.format(self.message, self.start)
+
+    def as_message(self):
+        """Return the event Message, dated at this occurrence."""
+        message = self.message
+        message.eventdate = self.start
+        message.eventenddate = self.end
+        if hasattr(self, 'distance'):
+            message.distance = self.distance
+        return message
+
+
+def generate_event_occurrences(sender, instance, created, **kwargs):
+    if instance.eventdate is None:
+        if not created:
+            # the message might have been an event
+            EventOccurrence.objects.filter(message=instance).delete()
+        return
+    # dates might have been set as strings (e.g. by the API),
+    # so we use the values stored in the database
+    message = Message.objects.get(pk=instance.pk)
+    EventOccurrence.objects.generate(message)
+post_save.connect(generate_event_occurrences, sender=Message)
+
+
+def update_thread(sender, instance, **kwargs):
+    """Update the counters of the thread of a reply, when it is saved or deleted."""
+    if instance.is_reply and instance.reply_to_id is not None:
+        Message.objects.update_thread(instance.reply_to_id)
+post_save.connect(update_thread, sender=Message)
+post_delete.connect(update_thread, sender=Message)
 
 
 class Notifications(models.Model):
+    """Read state of the member's notifications.
+
+    Notifications are marked as read when displayed, by moving the watermark
+    of each type to the time they were displayed: messages and threads
+    posted until then are read, as well as the events of that day.
+    Marking notifications as read is therefore a single update, and
+    read flags are a comparison with the watermarks.
+    """
     member = models.OneToOneField(Member, related_name='notifications')
     total = models.IntegerField(default=0)
     friends_requests = models.IntegerField(default=0)
-    messages = models.ManyToManyField(Message, related_name='notification_messages', blank=True)
-    events = models.ManyToManyField(Message, related_name='notification_events', blank=True)
-    threads = models.ManyToManyField(Message, related_name='notification_threads', blank=True)
+    messages_read_at = models.DateTimeField(null=True, blank=True)
+    events_read_at = models.DateTimeField(null=True, blank=True)
+    threads_read_at = models.DateTimeField(null=True, blank=True)
 
     def __unicode__(self):
-        return u"{} Message(s), {} Friend(s) Request(s), {} Event(s), {} Thread(s)"\
-               .format(self.messages.count(),
+        return u"{} Notification(s) read, {} Friend(s) Request(s), last read: {}"\
+               .format(self.total,
                        self.friends_requests,
-                       self.events.count(),
-                       self.threads.count())
-
-    def count(self):
-        return self.messages.count() \
-               + self.friends_requests \
-               + self.events.count() \
-               + self.threads.count()
+                       self.messages_read_at)
+
+    def is_read(self, result):
+        """Return whether a result of the Notification API has been read."""
+        if result['type'] == 'friends_requests':
+            return result['count'] <= self.friends_requests
+        read_at = getattr(self, '{}_read_at'.format(result['type']))
+        if read_at is None:
+            return False
+        if result['type'] == 'events':
+            # events are notified on the day they occur
+            today = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+            if read_at < today:
+                return False
+        # results are dated by their latest message
+        return result['timestamp'] <= read_at
 
     def clear(self, commit=True):
         self.total = 0
-        self.messages.clear()
         self.friends_requests = 0
-        self.events.clear()
-        self.threads.clear()
+        self.messages_read_at = None
+        self.events_read_at = None
+        self.threads_read_at = None
         if commit:
             self.save()
 
     def reset(self, data):
         """
-        Reset account notifications.
+        Mark the account notifications as read.
         'data' is the result of the Notification API.
 
         """
-        self.clear(commit=False)
-        for result in data.get('results', []):
-            if result['type'] in ('messages', 'events', 'threads'):
-                # ManyToMany fields
-                if result['type'] == 'messages':
-                    for message in result['messages']:
-                        self.messages.add(Message.objects.get(pk=message['id']))
-                elif result['type'] == 'events':
-                    self.events.add(Message.objects.get(pk=result['event']['id']))
-                else:
-                    for message in result['thread']['messages']:
-                        self.threads.add(Message.objects.get(pk=message['id']))
-            else:
-                setattr(self, result['type'], result['count'])
-        self.total = self.count()
-        self.save()
-
-    def update(self):
-        """
-        We need to remove all outdated notifications:
-            - private messages older than 7 days
-            - thread messages older than 30 days
-        """
-        for message in self.messages.all():
-            if message.timestamp < timezone.now() - timedelta(7):
-                self.messages.remove(message)
-        for message in self.threads.all():
-            if message.timestamp < timezone.now() - timedelta(30):
-                self.threads.remove(message)
-        self.total = self.count()
-        self.save()
+        self.total = data.get('total', 0)
+        self.friends_requests = sum([result['count'] for result in data.get('results', [])
+                                     if result['type'] == 'friends_requests'])
+        self.messages_read_at = self.events_read_at = self.threads_read_at = timezone.now()
+        Notifications.objects.filter(pk=self.pk).update(total=self.total,
+                                                        friends_requests=self.friends_requests,
+                                                        messages_read_at=self.messages_read_at,
+                                                        events_read_at=self.events_read_at,
+                                                        threads_read_at=self.threads_read_at)
+        # the cached notifications hold the read status
+        caching.invalidate_notifications(self.member_id)
 
     class Meta:
         verbose_name_plural = "notifications"
+
+
+def invalidate_message_notifications(sender, instance, **kwargs):
+    """Invalidate the cached notifications of the members concerned by a message."""
+    if instance.eventdate is not None:
+        # events are notified to all members
+        caching.invalidate_events_notifications()
+    members = [instance.member_id, instance.recipient_id]
+    if instance.is_reply and instance.reply_to_id is not None:
+        # the thread author, and all members who replied to the thread
+        members.extend(Message.objects.filter(models.Q(id=instance.reply_to_id) | \
+                                              models.Q(is_reply=True, reply_to__id=instance.reply_to_id))\
+                                      .values_list('member', flat=True))
+    caching.invalidate_notifications(*set(members))
+post_save.connect(invalidate_message_notifications, sender=Message)
+post_delete.connect(invalidate_message_notifications, sender=Message)
+
+
+def invalidate_friendship_notifications(sender, instance, **kwargs):
+    """Invalidate the cached notifications of both members of a friendship."""
+    caching.invalidate_notifications(instance.from_member_id, instance.to_member_id)
+post_save.connect(invalidate_friendship_notifications, sender=Friendships)
+post_delete.connect(invalidate_friendship_notifications, sender=Friendships)
+
+
+def touch_members(sender, instance, **kwargs):
+    """Deleted rows leave no 'updated' date to validate the API responses
+    (see api.conditional), so the members concerned are marked as updated.
+    """
+    if sender is Message:
+        member_ids = [instance.member_id]
+    else:
+        member_ids = [instance.from_member_id, instance.to_member_id]
+    Member.objects.filter(id__in=member_ids).update(updated=timezone.now())
+post_delete.connect(touch_members, sender=Message)
+post_delete.connect(touch_members, sender=Friendships)
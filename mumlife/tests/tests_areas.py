@@ -0,0 +1,50 @@
+import unittest
+from django.test import TestCase
+from django.contrib.auth.models import User
+from geo.models import Postcode, POSTCODE_AREAS
+from mumlife.models import Message, Page
+
+class PostcodeAreasTest(TestCase):
+    """TestCase for the postcode areas registry."""
+
+    def setUp(self):
+        Postcode.objects.create(postcode='SE22', latitude=51.4566, longitude=-0.0715,
+                                town_area='East Dulwich', region='Southwark')
+        user = User.objects.create_user(username="a1@mumlife.co.uk",
+                                        email="a1@mumlife.co.uk",
+                                        password="secure-password")
+        self.member = user.profile
+        self.member.postcode = 'SE22 0NH'
+        self.member.save()
+
+    def test_refresh(self):
+        self.assertTrue('SE22' in POSTCODE_AREAS)
+        self.assertFalse('SE16' in POSTCODE_AREAS)
+        Postcode.objects.create(postcode='SE16', latitude=51.4936, longitude=-0.0568,
+                                town_area='Rotherhithe', region='Southwark')
+        self.assertTrue('SE16' in POSTCODE_AREAS)
+
+    def test_areas_from_tags(self):
+        message = Message.objects.create(member=self.member,
+                                         area=self.member.area,
+                                         body='Message',
+                                         tags='#se22 #parks')
+        self.assertEqual(message.get_areas_from_tags(), ['SE22'])
+
+
+class PageTest(TestCase):
+    """TestCase for the static pages resolver."""
+
+    def test_published(self):
+        Page.objects.create(title='About', slug='about', body='About Mumlife', status=True)
+        Page.objects.create(title='Draft', slug='draft', body='Draft')
+        self.assertEqual(self.client.get('/about').status_code, 200)
+        self.assertEqual(self.client.get('/draft').status_code, 404)
+
+    def test_append_slash(self):
+        # application URLs are still redirected to their slash URL
+        response = self.client.get('/local', {'search': 'se16'})
+        self.assertEqual(response.status_code, 301)
+        self.assertTrue(response['Location'].endswith('/local/?search=se16'))
+        self.assertEqual(self.client.get('/members').status_code, 301)
+        self.assertEqual(self.client.get('/unknown').status_code, 404)
@@ -0,0 +1,29 @@
+import unittest
+from django.test import TestCase
+from mumlife import benchmarks
+from mumlife.models import Member, Message, Friendships
+
+class DataGeneratorTest(TestCase):
+    """TestCase for the benchmarks synthetic data."""
+
+    def test_generate(self):
+        generator = benchmarks.DataGenerator(benchmarks.DEFAULT_AREAS, seed=1)
+        generator.generate(6)
+        self.assertEqual(len(generator.members), 6)
+        areas = set([area for area, latitude, longitude in benchmarks.DEFAULT_AREAS])
+        for member in Member.objects.filter(id__in=[m.id for m in generator.members]):
+            self.assertIn(member.area, areas)
+            self.assertNotEqual(member.geocode, '0.0 0.0')
+        self.assertTrue(Friendships.objects.exists())
+        # the dataset is grown, not generated again
+        generator.generate(9)
+        self.assertEqual(len(generator.members), 9)
+        self.assertEqual(Member.objects.filter(user__username__startswith='benchmark').count(), 9)
+
+    def test_operations(self):
+        generator = benchmarks.DataGenerator(benchmarks.DEFAULT_AREAS, seed=1, events=1)
+        generator.generate(4)
+        self.assertTrue(Message.objects.filter(eventdate__isnull=False).exists())
+        viewer = generator.members[0]
+        for name, operation in benchmarks.get_operations():
+            operation(viewer)
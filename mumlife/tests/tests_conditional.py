@@ -0,0 +1,106 @@
+import unittest
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.urlresolvers import reverse
+from mumlife.models import Member, Message, Friendships, Conversation
+
+@override_settings(API_CONDITIONAL_GET=True, API_VALIDATORS_PERIOD=3600)
+class ConditionalGetTest(TestCase):
+    """TestCase for the API validators (ETag, Last-Modified)."""
+
+    def setUp(self):
+        cache.clear()
+        self.members = []
+        for i in range(2):
+            user = User.objects.create_user(username="c{}@mumlife.co.uk".format(i),
+                                            email="c{}@mumlife.co.uk".format(i),
+                                            password="secure-password")
+            member = user.profile
+            member.fullname = 'Member {}'.format(i)
+            member.postcode = 'SE16 4JX'
+            member.save()
+            self.members.append(member)
+        self.C0, self.C1 = self.members
+        self.client.login(username="c0@mumlife.co.uk", password="secure-password")
+
+    def _get(self, name, etag=None, **params):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag is not None else {}
+        params['format'] = 'json'
+        return self.client.get(reverse(name), params, **headers)
+
+    def test_messages(self):
+        response = self._get('messages-list')
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+        self.assertEqual(self._get('messages-list', etag).status_code, 304)
+        # the validators depend on the query
+        self.assertEqual(self._get('messages-list', etag, search='@global').status_code, 200)
+        # and on the messages
+        message = Message.objects.create(member=self.C1, area=self.C1.area, body='Hello #se16', tags='#se16')
+        response = self._get('messages-list', etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        message.delete()
+        self.assertEqual(self._get('messages-list', etag).status_code, 200)
+
+    def test_friendships(self):
+        etag = self._get('members-list')['ETag']
+        self.assertEqual(self._get('members-list', etag).status_code, 304)
+        friendship = Friendships.objects.create(from_member=self.C1, to_member=self.C0, status=Friendships.PENDING)
+        response = self._get('members-list', etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        friendship.delete()
+        self.assertEqual(self._get('members-list', etag).status_code, 200)
+
+    def test_notifications(self):
+        etag = self._get('notifications-list')['ETag']
+        self.assertEqual(self._get('notifications-list', etag).status_code, 304)
+        self.C0.notifications.reset({'total': 0, 'results': []})
+        self.assertEqual(self._get('notifications-list', etag).status_code, 200)
+
+    def test_conversations_read(self):
+        Message.objects.create(member=self.C1, area=self.C1.area, body='Hello',
+                               visibility=Message.PRIVATE, recipient=self.C0)
+        etag = self._get('notifications-list')['ETag']
+        Conversation.objects.mark_read(self.C0)
+        self.assertEqual(self._get('notifications-list', etag).status_code, 200)
+
+    @override_settings(TIMELINE_ENABLED=True)
+    def test_timeline(self):
+        other = User.objects.create_user(username="c2@mumlife.co.uk",
+                                         email="c2@mumlife.co.uk",
+                                         password="secure-password").profile
+        other.postcode = 'N1 9GU'
+        other.save()
+        etag = self._get('messages-list')['ETag']
+        # the @local feed only depends on the viewer's timeline
+        Message.objects.create(member=other, area=other.area, body='Hello #n1', tags='#n1')
+        self.assertEqual(self._get('messages-list', etag).status_code, 304)
+        message = Message.objects.create(member=self.C1, area=self.C1.area, body='Hello #se16', tags='#se16')
+        response = self._get('messages-list', etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        # replies update their message
+        Message.objects.create(member=other, area=other.area, body='Hi', is_reply=True, reply_to=message)
+        Message.objects.update_thread(message.id)
+        response = self._get('messages-list', etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        message.delete()
+        self.assertEqual(self._get('messages-list', etag).status_code, 200)
+
+    def test_event_occurrences(self):
+        etag = self._get('messages-list')['ETag']
+        # regenerating the occurrences does not expire the messages
+        call_command('update_event_occurrences')
+        self.assertEqual(self._get('messages-list', etag).status_code, 304)
+
+    @override_settings(API_CONDITIONAL_GET=False)
+    def test_disabled(self):
+        response = self._get('messages-list')
+        self.assertFalse(response.has_header('ETag'))
@@ -0,0 +1,130 @@
+import unittest
+from datetime import timedelta
+from django.test import TestCase
+from django.core.management import call_command
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from django.utils import timezone
+from mumlife import caching
+from mumlife.models import Member, Message, Conversation
+
+class ConversationTest(TestCase):
+    """TestCase for the conversations index of the private messages."""
+
+    def setUp(self):
+        cache.clear()
+        self.members = []
+        for i in range(3):
+            user = User.objects.create_user(username="p{}@mumlife.co.uk".format(i),
+                                            email="p{}@mumlife.co.uk".format(i),
+                                            password="secure-password")
+            member = user.profile
+            member.fullname = 'Member {}'.format(i)
+            member.postcode = 'SE16 4JX'
+            member.save()
+            self.members.append(member)
+        self.P0, self.P1, self.P2 = self.members
+
+    def _send(self, sender, recipient, body):
+        return Message.objects.create(member=sender,
+                                      area=sender.area,
+                                      body=body,
+                                      visibility=Message.PRIVATE,
+                                      recipient=recipient)
+
+    def _conversation(self, member, other):
+        return Conversation.objects.get(member=member, other=other)
+
+    def test_record(self):
+        self._send(self.P1, self.P0, 'Hello')
+        last = self._send(self.P1, self.P0, 'Are you there?')
+        received = self._conversation(self.P0, self.P1)
+        self.assertEqual(received.unread, 2)
+        self.assertEqual(received.last_message_id, last.id)
+        self.assertEqual(received.last_received_id, last.id)
+        sent = self._conversation(self.P1, self.P0)
+        self.assertEqual(sent.unread, 0)
+        self.assertEqual(sent.last_message_id, last.id)
+        self.assertEqual(sent.last_received_id, None)
+        # public messages and replies are not part of the conversations
+        public = Message.objects.create(member=self.P2, area=self.P2.area, body='Hello #se16', tags='#se16')
+        self.assertEqual(Conversation.objects.count(), 2)
+        public.recipient = self.P0
+        public.save()
+        self.assertEqual(Conversation.objects.count(), 2)
+
+    def test_mark_read(self):
+        self._send(self.P1, self.P0, 'Hello')
+        self._send(self.P2, self.P0, 'Hi')
+        Conversation.objects.mark_read(self.P0, self.P1)
+        self.assertEqual(self._conversation(self.P0, self.P1).unread, 0)
+        self.assertEqual(self._conversation(self.P0, self.P2).unread, 1)
+        self._send(self.P1, self.P0, 'Hello again')
+        self.assertEqual(self._conversation(self.P0, self.P1).unread, 1)
+        Conversation.objects.mark_read(self.P0)
+        self.assertEqual(self.P0.conversations.filter(unread__gt=0).count(), 0)
+
+    def test_invalidate_notifications(self):
+        self._send(self.P1, self.P0, 'Hello')
+        caching.set_notifications(self.P0.id, {'count': 1, 'results': []})
+        Conversation.objects.mark_read(self.P0, self.P1)
+        self.assertEqual(caching.get_notifications(self.P0.id), None)
+
+    def test_build(self):
+        old = self._send(self.P1, self.P0, 'Hello')
+        Message.objects.filter(pk=old.pk).update(timestamp=timezone.now()-timedelta(30))
+        self._send(self.P1, self.P0, 'Are you there?')
+        Conversation.objects.all().delete()
+        call_command('build_conversations')
+        # the messages received before the notifications window are read
+        self.assertEqual(self._conversation(self.P0, self.P1).unread, 1)
+        self.assertEqual(self._conversation(self.P1, self.P0).unread, 0)
+
+    def test_delete(self):
+        first = self._send(self.P1, self.P0, 'Hello')
+        last = self._send(self.P0, self.P1, 'Hi')
+        last.delete()
+        conversation = self._conversation(self.P1, self.P0)
+        self.assertEqual(conversation.last_message_id, first.id)
+        self.assertEqual(conversation.last_received_id, None)
+        first.delete()
+        self.assertEqual(Conversation.objects.count(), 0)
+
+    def test_notifications(self):
+        self._send(self.P1, self.P0, 'Hello')
+        self._send(self.P1, self.P0, 'Are you there?')
+        self._send(self.P2, self.P0, 'Hi')
+        notifications = [n for n in self.P0.get_notifications()['results'] if n['type'] == 'messages']
+        self.assertEqual(notifications[0]['count'], 3)
+        self.assertEqual(len(notifications[0]['messages']), 2)
+        Conversation.objects.mark_read(self.P0)
+        notifications = [n for n in self.P0.get_notifications()['results'] if n['type'] == 'messages']
+        self.assertEqual(notifications, [])
+
+    def test_api(self):
+        self._send(self.P1, self.P0, 'Hello')
+        self._send(self.P2, self.P0, 'Hi')
+        self.client.login(username="p0@mumlife.co.uk", password="secure-password")
+        response = self.client.get(reverse('conversations-list'), {'format': 'json', 'cursor': ''})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([c['member']['id'] for c in response.data['results']], [self.P2.id, self.P1.id])
+        self.assertEqual([c['unread'] for c in response.data['results']], [1, 1])
+        url = reverse('conversation-detail', kwargs={'pk': self.P1.pk})
+        response = self.client.get(url, {'format': 'json'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 1)
+        # reading the messages does not mark the conversation as read
+        self.assertEqual(self._conversation(self.P0, self.P1).unread, 1)
+        self.assertEqual(self.client.post(url).status_code, 204)
+        self.assertEqual(self._conversation(self.P0, self.P1).unread, 0)
+        self.assertEqual(self._conversation(self.P0, self.P2).unread, 1)
+
+    def test_not_private_anymore(self):
+        self._send(self.P1, self.P0, 'Hello')
+        message = self._send(self.P1, self.P0, 'Oops')
+        message.visibility = Message.LOCAL
+        message.save()
+        received = self._conversation(self.P0, self.P1)
+        self.assertEqual(received.unread, 1)
+        self.assertNotEqual(received.last_message_id, message.id)
@@ -0,0 +1,126 @@
+import unittest
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.contrib.auth.models import User
+from geo.models import PostcodePoint
+from mumlife import distances, geocoding
+from mumlife.models import Member, MEMBERS_INDEX
+
+class DistancesTest(TestCase):
+    """TestCase for the in-process distance engine."""
+
+    def setUp(self):
+        geocoding._cache.clear()
+        MEMBERS_INDEX.refresh()
+        PostcodePoint.objects.create(postcode='SE16 4JX', latitude=51.4936, longitude=-0.0568)
+        PostcodePoint.objects.create(postcode='SE22 0NH', latitude=51.4566, longitude=-0.0715)
+        PostcodePoint.objects.create(postcode='N1 9GU', latitude=51.5308, longitude=-0.1238)
+        self.members = []
+        for i, postcode in enumerate(['SE16 4JX', 'SE22 0NH', 'N1 9GU']):
+            user = User.objects.create_user(username="d{}@mumlife.co.uk".format(i),
+                                            email="d{}@mumlife.co.uk".format(i),
+                                            password="secure-password")
+            member = user.profile
+            member.fullname = 'Member {}'.format(i)
+            member.postcode = postcode
+            member.save()
+            self.members.append(member)
+
+    def test_distances(self):
+        # SE16 4JX to SE22 0NH, about 4.24km
+        distance = distances.get_distance('-0.0568 51.4936', '-0.0715 51.4566')
+        self.assertAlmostEqual(distance, 4238, delta=25)
+        self.assertEqual(distances.get_distances('-0.0568 51.4936', ['0.0 0.0', None]), [None, None])
+        self.assertEqual(distances.get_distances(geocoding.UNRESOLVED, ['-0.0715 51.4566']), [None])
+
+    def test_rank(self):
+        ranked = MEMBERS_INDEX.rank(self.members[0].geocode)
+        self.assertEqual([id_ for id_, d in ranked], [m.id for m in self.members])
+        ranked = MEMBERS_INDEX.rank(self.members[0].geocode, 5000)
+        self.assertEqual([id_ for id_, d in ranked], [m.id for m in self.members[:2]])
+
+    def test_format(self):
+        viewer, member = self.members[0], Member.objects.get(pk=self.members[1].pk)
+        self.assertEqual(member.format(viewer=viewer)['distance_display'], '2.6 miles')
+
+    @override_settings(DISTANCE_ENGINE='haversine')
+    def test_with_distance_from(self):
+        viewer = self.members[0]
+        members = list(Member.objects.with_distance_from(viewer=viewer))
+        self.assertEqual([m.id for m in members], [m.id for m in self.members[1:]])
+        members = list(Member.objects.with_distance_from(viewer=viewer, distance_range=5000))
+        self.assertEqual([m.id for m in members], [self.members[1].id])
+        self.assertAlmostEqual(members[0].distance, 4238, delta=25)
+        after = Member.objects.after_distance_from(Member.objects.with_distance_from(viewer=viewer),
+                                                   viewer, (members[0].knn_distance, members[0].id))
+        self.assertEqual([m.id for m in after], [self.members[2].id])
+
+    @override_settings(DISTANCE_ENGINE='haversine')
+    def test_page(self):
+        viewer = self.members[0]
+        members = Member.objects.with_distance_from(viewer=viewer)
+        self.assertEqual(members.count(), 2)
+        # the ids of the queryset, then the members of the page only
+        with self.assertNumQueries(1):
+            page = members[1:2]
+        self.assertEqual([m.id for m in page], [self.members[2].id])
+        self.assertTrue(page[0].distance > 4238)
+
+    @override_settings(DISTANCE_ENGINE='haversine')
+    def test_update(self):
+        viewer = self.members[0]
+        MEMBERS_INDEX.rank(viewer.geocode)
+        loaded_at = MEMBERS_INDEX._loaded_at
+        # N1 9GU member moves next door
+        member = Member.objects.get(pk=self.members[2].pk)
+        member.geocode = '-0.0570 51.4937'
+        member.save()
+        ranked = MEMBERS_INDEX.rank(viewer.geocode)
+        self.assertEqual([id_ for id_, d in ranked], [self.members[0].id, self.members[2].id, self.members[1].id])
+        member.delete()
+        ranked = MEMBERS_INDEX.rank(viewer.geocode)
+        self.assertEqual([id_ for id_, d in ranked], [self.members[0].id, self.members[1].id])
+        # the index was updated, not reloaded
+        self.assertEqual(MEMBERS_INDEX._loaded_at, loaded_at)
+
+
+class GeographyTest(TestCase):
+    """TestCase for the members distances computed on the geography column,
+    compared with the distances computed from the geocodes (as before the column).
+    """
+
+    def setUp(self):
+        geocoding._cache.clear()
+        for postcode, latitude, longitude in [('SE16 4JX', 51.4936, -0.0568),
+                                              ('SE16 4RA', 51.4951, -0.0530),
+                                              ('SE22 0NH', 51.4566, -0.0715),
+                                              ('N1 9GU', 51.5308, -0.1238)]:
+            PostcodePoint.objects.create(postcode=postcode, latitude=latitude, longitude=longitude)
+        self.members = []
+        for i, postcode in enumerate(['SE16 4JX', 'N1 9GU', 'SE22 0NH', 'SE16 4RA', 'SE22 0NH']):
+            user = User.objects.create_user(username="g{}@mumlife.co.uk".format(i),
+                                            email="g{}@mumlife.co.uk".format(i),
+                                            password="secure-password")
+            member = user.profile
+            member.fullname = 'Member {}'.format(i)
+            member.postcode = postcode
+            member.save()
+            self.members.append(member)
+
+    def test_with_distance_from(self):
+        viewer = self.members[0]
+        members = list(Member.objects.with_distance_from(viewer=viewer))
+        previous = Member.objects.exclude(pk=viewer.pk)\
+                                 .extra(select={'distance': """ST_Distance(
+                                            ST_GeographyFromText(%s),
+                                            ST_GeographyFromText(CONCAT('POINT(', geocode, ')'))
+                                        )"""},
+                                        select_params=('POINT({})'.format(viewer.geocode),))\
+                                 .order_by('distance', 'id')
+        self.assertEqual([m.id for m in members], [m.id for m in previous])
+        # the point column is computed from the geocode, as a float8 geography
+        for member, expected in zip(members, previous):
+            self.assertAlmostEqual(member.distance, expected.distance, delta=expected.distance * 0.005 + 0.01)
+        # within range
+        members = Member.objects.with_distance_from(viewer=viewer, distance_range=5000)
+        self.assertEqual([m.id for m in members], [m.id for m in previous if m.distance <= 5000])
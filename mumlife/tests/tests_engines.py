@@ -2,6 +2,7 @@ import logging
 import unittest
 from django.test import TestCase
 from django.contrib.auth.models import User
+from mumlife import utils
 from mumlife.models import Member, Message
 
 logger = logging.getLogger('mumlife.tests')
@@ -33,3 +34,25 @@ class MemberTest(TestCase):
         self.assertEqual(self.m1.area, 'SE16')
         self.assertEqual(self.m2.area, 'SE16')
         self.assertEqual(self.m3.area, 'SE22')
+
+
+class ExtractorTest(unittest.TestCase):
+    """TestCase for the hashtags, flags, links and postcodes Extractor"""
+
+    def test_parse(self):
+        extractor = utils.Extractor(u'Picnic #parks at http://mumlife.co.uk/parks#map @local')
+        self.assertEqual(extractor.parse(with_links=False),
+                         u'Picnic <span>#parks</span> at http://mumlife.co.uk/parks#map <span>@local</span>')
+        self.assertEqual(extractor.parse(),
+                         u'Picnic <a href="/local/?search=%23parks">#parks</a> at '
+                         u'<a href="http://mumlife.co.uk/parks#map" target="_blank">http://mumlife.co.uk/parks#map</a> @local')
+
+    def test_extract(self):
+        extractor = utils.Extractor('#se16 #parks @friends @local')
+        self.assertEqual(extractor.extract_tags(), {'se16': '#se16', 'parks': '#parks'})
+        self.assertEqual(extractor.extract_flags(), ['@local', '@friends'])
+
+    def test_extract_postcode(self):
+        self.assertEqual(utils.Extractor('The Park Cafe, London se22 0nh').extract_postcode(), 'SE22 0NH')
+        self.assertEqual(utils.Extractor('SE220NH').extract_postcode(), 'SE22 0NH')
+        self.assertEqual(utils.Extractor('London').extract_postcode(), None)
@@ -0,0 +1,123 @@
+import unittest
+from datetime import timedelta
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.contrib.auth.models import User
+from django.utils import timezone
+from geo.models import PostcodePoint
+from mumlife import distances, geocoding
+from mumlife.models import Member, Message, EventOccurrence, EVENTS_INDEX
+
+class EventOccurrencesTest(TestCase):
+    """TestCase for the materialized events occurrences."""
+
+    def setUp(self):
+        user = User.objects.create_user(username="e1@mumlife.co.uk",
+                                        email="e1@mumlife.co.uk",
+                                        password="secure-password")
+        self.member = user.profile
+        self.member.fullname = 'Event Organiser'
+        self.member.postcode = 'SE16 4JX'
+        self.member.save()
+
+    def _create_event(self, eventdate, **kwargs):
+        return Message.objects.create(member=self.member,
+                                      area=self.member.area,
+                                      body='Event',
+                                      eventdate=eventdate,
+                                      **kwargs)
+
+    def test_once(self):
+        event = self._create_event(timezone.now() + timedelta(7))
+        self.assertEqual(event.occurrences.count(), 1)
+
+    def test_past_once(self):
+        event = self._create_event(timezone.now() - timedelta(7))
+        self.assertEqual(event.occurrences.count(), 0)
+
+    def test_weekly_until(self):
+        eventdate = timezone.now() + timedelta(1)
+        event = self._create_event(eventdate,
+                                   occurrence=Message.OCCURS_WEEKLY,
+                                   occurs_until=(eventdate + timedelta(23)).date())
+        starts = [o.start for o in event.occurrences.order_by('start')]
+        self.assertEqual(len(starts), 4)
+        self.assertEqual(starts[1] - starts[0], timedelta(7))
+
+    def test_update(self):
+        event = self._create_event(timezone.now() + timedelta(7))
+        event = Message.objects.get(pk=event.pk)
+        event.eventdate = timezone.now() + timedelta(14)
+        event.save()
+        occurrences = EventOccurrence.objects.filter(message=event)
+        self.assertEqual(occurrences.count(), 1)
+        self.assertEqual(occurrences[0].start, event.eventdate)
+
+
+class EventWindowTest(TestCase):
+    """TestCase for the events windows and calendar."""
+
+    def setUp(self):
+        geocoding._cache.clear()
+        EVENTS_INDEX.refresh()
+        PostcodePoint.objects.create(postcode='SE16 4JX', latitude=51.4936, longitude=-0.0568)
+        user = User.objects.create_user(username="w1@mumlife.co.uk",
+                                        email="w1@mumlife.co.uk",
+                                        password="secure-password")
+        self.member = user.profile
+        self.member.fullname = 'Event Organiser'
+        self.member.postcode = 'SE16 4JX'
+        self.member.save()
+        self.today = timezone.localtime(timezone.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+        # weekly, from tomorrow at noon, for 3 weeks;
+        # once, the day after tomorrow at noon
+        eventdate = self.today + timedelta(days=1, hours=12)
+        self.weekly = self._create_event(eventdate,
+                                         occurrence=Message.OCCURS_WEEKLY,
+                                         occurs_until=(eventdate + timedelta(20)).date())
+        self.once = self._create_event(self.today + timedelta(days=2, hours=12))
+
+    def _create_event(self, eventdate, **kwargs):
+        return Message.objects.create(member=self.member,
+                                      area=self.member.area,
+                                      body='Event',
+                                      location='Southwark Park, London SE16 4JX',
+                                      eventdate=eventdate,
+                                      **kwargs)
+
+    def test_window(self):
+        occurrences = self.member.get_event_occurrences()
+        self.assertEqual(occurrences.count(), 4)
+        occurrences = self.member.get_event_occurrences(start=self.today + timedelta(2))
+        self.assertEqual([o.message_id for o in occurrences], [self.once.id, self.weekly.id, self.weekly.id])
+        occurrences = self.member.get_event_occurrences(end=self.today + timedelta(3))
+        self.assertEqual([o.message_id for o in occurrences], [self.weekly.id, self.once.id])
+        # past windows are empty
+        occurrences = self.member.get_event_occurrences(start=self.today - timedelta(7), end=self.today)
+        self.assertEqual(occurrences.count(), 0)
+
+    @override_settings(DISTANCE_ENGINE='haversine')
+    def test_window_haversine(self):
+        EVENTS_INDEX.refresh()
+        fetch_size = distances.RankedFilter.fetch_size
+        # the occurrences are read by chunks
+        distances.RankedFilter.fetch_size = 2
+        try:
+            occurrences = self.member.get_event_occurrences()
+            self.assertEqual(occurrences.count(), 4)
+            self.assertEqual([o.message_id for o in occurrences],
+                             [self.weekly.id, self.once.id, self.weekly.id, self.weekly.id])
+            self.assertEqual([o.message_id for o in occurrences[1:3]], [self.once.id, self.weekly.id])
+            start = occurrences[1].start
+            after = occurrences.filter(start__gt=start)
+            self.assertEqual([o.message_id for o in after], [self.weekly.id, self.weekly.id])
+            days = self.member.get_events_calendar(end=self.today + timedelta(10))
+            self.assertEqual(len(days), 3)
+        finally:
+            distances.RankedFilter.fetch_size = fetch_size
+
+    def test_calendar(self):
+        days = self.member.get_events_calendar(end=self.today + timedelta(10))
+        self.assertEqual(days, [((self.today + timedelta(1)).date(), 1),
+                                ((self.today + timedelta(2)).date(), 1),
+                                ((self.today + timedelta(8)).date(), 1)])
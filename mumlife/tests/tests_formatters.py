@@ -0,0 +1,58 @@
+import unittest
+from datetime import date
+from django.test import TestCase
+from django.contrib.auth.models import User
+from mumlife.formatters import Formatter
+from mumlife.models import Member, Kid, Message
+
+class FormatterTest(TestCase):
+    """TestCase for the fields selection and compact form of the Formatter."""
+
+    def setUp(self):
+        self.members = []
+        for i in range(2):
+            user = User.objects.create_user(username="f{}@mumlife.co.uk".format(i),
+                                            email="f{}@mumlife.co.uk".format(i),
+                                            password="secure-password")
+            member = user.profile
+            member.fullname = 'Member {}'.format(i)
+            member.postcode = 'SE16 4JX'
+            member.save()
+            self.members.append(member)
+        self.F0, self.F1 = self.members
+        kid = Kid.objects.create(fullname='Kid', gender=0, dob=date(2012, 5, 1))
+        kid.parents.add(self.F1)
+        self.message = Message.objects.create(member=self.F1,
+                                              area=self.F1.area,
+                                              body='Hello #se16',
+                                              tags='#se16')
+        Message.objects.create(member=self.F0,
+                               area=self.F0.area,
+                               body='Hi',
+                               is_reply=True,
+                               reply_to=self.message)
+
+    def _format(self, **kwargs):
+        return Formatter(viewer=self.F0, **kwargs).format_messages([Message.objects.get(pk=self.message.pk)])[0]
+
+    def test_full(self):
+        message = self._format()
+        self.assertEqual(len(message['replies']), 1)
+        self.assertEqual(len(message['member']['kids']), 1)
+        self.assertIn('synopsis', message)
+
+    def test_compact(self):
+        message = self._format(compact=True)
+        self.assertNotIn('replies', message)
+        self.assertNotIn('kids', message['member'])
+        self.assertNotIn('synopsis', message)
+        self.assertIn('body', message)
+        message = self._format(compact=True, expand=['replies', 'kids'])
+        self.assertEqual(len(message['replies']), 1)
+        self.assertEqual(len(message['member']['kids']), 1)
+
+    def test_fields(self):
+        message = self._format(fields=['title', 'age'])
+        self.assertEqual(sorted(message.keys()), ['age', 'id', 'title'])
+        members = Formatter(viewer=self.F0, fields=['name']).format_members([self.F1])
+        self.assertEqual(members, [{'id': self.F1.id, 'name': 'Member 1.'}])
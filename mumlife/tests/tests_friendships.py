@@ -0,0 +1,47 @@
+import unittest
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.contrib.auth.models import User
+from mumlife import caching
+from mumlife.models import Member, Friendships
+
+class FriendshipGraphTest(TestCase):
+    """TestCase for the friendships statuses, resolved from the friendship graph."""
+
+    def setUp(self):
+        self.members = []
+        for i in range(4):
+            user = User.objects.create_user(username="f{}@mumlife.co.uk".format(i),
+                                            email="f{}@mumlife.co.uk".format(i),
+                                            password="secure-password")
+            self.members.append(user.profile)
+        self.F0, self.F1, self.F2, self.F3 = self.members
+        self.F0.add_friend(self.F1, status=Friendships.APPROVED)
+        self.F1.add_friend(self.F0, status=Friendships.APPROVED)
+        self.F2.add_friend(self.F0, status=Friendships.PENDING)
+        self.F3.add_friend(self.F0, status=Friendships.PENDING)
+        self.F0.add_friend(self.F3, status=Friendships.BLOCKED)
+
+    def test_statuses(self):
+        viewer = Member.objects.get(pk=self.F0.pk)
+        viewer.friendship_graph
+        with self.assertNumQueries(0):
+            self.assertEqual(viewer.check_if_friend(self.F1), 'Approved')
+            self.assertEqual(viewer.check_if_friend(self.F2), 'Requesting')
+            self.assertEqual(viewer.check_if_friend(self.F3), 'Blocked')
+        self.assertEqual([m.id for m in viewer.get_friends(Friendships.APPROVED)], [self.F1.id])
+        # requests from BLOCKED members are excluded
+        self.assertEqual([r.from_member_id for r in viewer.get_friend_requests()], [self.F2.id])
+
+    def test_invalidation(self):
+        self.assertEqual(Member.objects.get(pk=self.F0.pk).check_if_friend(self.F2), 'Requesting')
+        Friendships.objects.create(from_member=self.F0, to_member=self.F2, status=Friendships.APPROVED)
+        self.assertEqual(Member.objects.get(pk=self.F0.pk).check_if_friend(self.F2), 'Approved')
+        Friendships.objects.filter(from_member=self.F0, to_member=self.F2).delete()
+        self.assertEqual(Member.objects.get(pk=self.F0.pk).check_if_friend(self.F2), 'Requesting')
+
+    @override_settings(FRIENDSHIPS_CACHE_TTL=3600, LOCAL_CACHE_TTL=10)
+    def test_process_local_ttl(self):
+        # the invalidations of a process-local cache do not reach the other processes,
+        # so the graphs are kept for a short time only
+        self.assertEqual(caching._get_ttl(3600), 3600 if caching.is_shared() else 10)
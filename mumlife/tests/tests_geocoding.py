@@ -0,0 +1,60 @@
+import unittest
+from django.test import TestCase
+from django.contrib.auth.models import User
+from geo.models import PostcodePoint
+from mumlife import geocoding, utils
+from mumlife.models import Geocode
+
+class GeocodingTest(TestCase):
+    """TestCase for the local postcodes geocoding."""
+
+    def setUp(self):
+        geocoding._cache.clear()
+        PostcodePoint.objects.create(postcode='SE22 0NH', latitude=51.4566, longitude=-0.0715)
+        PostcodePoint.objects.create(postcode='SE16 4JX', latitude=51.4936, longitude=-0.0568)
+
+    def test_lru_cache(self):
+        cache = utils.LRUCache(2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('b'), None)
+        self.assertEqual(cache.get('c'), 3)
+
+    def test_resolve_many(self):
+        geocodes = geocoding.resolve_many(['SE22 0NH', 'SE16 4JX', 'ZZ1 1ZZ'])
+        self.assertEqual(geocodes, {'SE22 0NH': '-0.0715 51.4566', 'SE16 4JX': '-0.0568 51.4936'})
+        # resolved postcodes are stored
+        self.assertEqual(Geocode.objects.filter(code__in=['SE22 0NH', 'SE16 4JX']).count(), 2)
+        self.assertEqual(geocoding.resolve('ZZ1 1ZZ'), geocoding.UNRESOLVED)
+
+    def test_spellings(self):
+        geocodes = geocoding.resolve_many(['SE16 4JX', 'se164jx', 'SE164JX'])
+        self.assertEqual(geocodes, dict([(p, '-0.0568 51.4936') for p in ('SE16 4JX', 'se164jx', 'SE164JX')]))
+        self.assertEqual(list(Geocode.objects.values_list('code', flat=True)), ['SE16 4JX'])
+
+    def test_stored_concurrently(self):
+        geocoding.resolve('SE22 0NH')
+        geocoding._cache.clear()
+        # e.g. another request resolved the postcode meanwhile
+        geocoding._store([Geocode(code='SE22 0NH', latitude=51.4566, longitude=-0.0715),
+                          Geocode(code='SE16 4JX', latitude=51.4936, longitude=-0.0568)])
+        self.assertEqual(Geocode.objects.filter(code='SE22 0NH').count(), 1)
+        self.assertEqual(Geocode.objects.filter(code='SE16 4JX').count(), 1)
+        self.assertEqual(geocoding.resolve('SE22 0NH'), '-0.0715 51.4566')
+
+    def test_cached(self):
+        geocoding.resolve('SE22 0NH')
+        with self.assertNumQueries(0):
+            self.assertEqual(geocoding.resolve('SE22 0NH'), '-0.0715 51.4566')
+
+    def test_member(self):
+        user = User.objects.create_user(username="g1@mumlife.co.uk",
+                                        email="g1@mumlife.co.uk",
+                                        password="secure-password")
+        member = user.profile
+        member.postcode = 'se220nh'
+        member.save()
+        self.assertEqual(member.geocode, '-0.0715 51.4566')
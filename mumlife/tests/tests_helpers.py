@@ -0,0 +1,69 @@
+import json
+from django.core.urlresolvers import reverse
+from django.test import TestCase
+from django.test.client import RequestFactory
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from geo.models import PostcodePoint
+from api.helpers import APIRequest
+from mumlife import geocoding
+from mumlife.models import Message, Friendships
+
+class APIRequestTest(TestCase):
+    """TestCase for the API resources fetched on behalf of a request.
+    The resources dispatched in-process must hold the same data
+    as the API responses fetched over HTTP.
+    """
+
+    def setUp(self):
+        cache.clear()
+        geocoding._cache.clear()
+        PostcodePoint.objects.create(postcode='SE16 4JX', latitude=51.4936, longitude=-0.0568)
+        PostcodePoint.objects.create(postcode='SE22 0NH', latitude=51.4566, longitude=-0.0715)
+        self.members = []
+        for i, postcode in enumerate(['SE16 4JX', 'SE16 4JX', 'SE22 0NH']):
+            user = User.objects.create_user(username="h{}@mumlife.co.uk".format(i),
+                                            email="h{}@mumlife.co.uk".format(i),
+                                            password="secure-password")
+            member = user.profile
+            member.fullname = 'Member {}'.format(i)
+            member.postcode = postcode
+            member.save()
+            self.members.append(member)
+        self.H0, self.H1, self.H2 = self.members
+        Friendships.objects.create(from_member=self.H1, to_member=self.H0, status=Friendships.PENDING)
+        Message.objects.create(member=self.H1, area=self.H1.area, body='Hello #se16', tags='#se16')
+        Message.objects.create(member=self.H2, area=self.H2.area, body='Private',
+                               visibility=Message.PRIVATE, recipient=self.H0)
+        self.client.login(username="h0@mumlife.co.uk", password="secure-password")
+
+    def _fetch(self, **kwargs):
+        request = RequestFactory().get('/local/')
+        request.user = self.H0.user
+        request.session = {}
+        # the in-process data, as it would be sent over HTTP
+        return json.loads(APIRequest(request).get(**kwargs))
+
+    def _get(self, name, **params):
+        params['format'] = 'json'
+        response = self.client.get(reverse(name), params)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def test_messages(self):
+        fetched = self._fetch(resource='message')
+        self.assertEqual(fetched['results'], self._get('messages-list', cursor='')['results'])
+        self.assertEqual(len(fetched['results']), 1)
+        fetched = self._fetch(resource='message', search='#se16')
+        self.assertEqual(fetched['results'], self._get('messages-list', cursor='', search='#se16')['results'])
+
+    def test_members(self):
+        fetched = self._fetch(resource='member')
+        self.assertEqual(fetched['results'], self._get('members-list', cursor='')['results'])
+        self.assertEqual([m['id'] for m in fetched['results']], [self.H1.id, self.H2.id])
+
+    def test_notifications(self):
+        fetched = self._fetch(resource='notification')
+        self.assertEqual(fetched, self._get('notifications-list'))
+        # the response revalidated with its ETag holds the same data
+        self.assertEqual(self._fetch(resource='notification'), fetched)
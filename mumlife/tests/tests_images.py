@@ -0,0 +1,66 @@
+import os
+import shutil
+import tempfile
+import unittest
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.test.utils import override_settings
+from PIL import Image
+from mumlife.images import ImageDerivatives, is_variant, rotate_picture
+
+class ImageDerivativesTest(TestCase):
+    """TestCase for the uploaded images variants."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings = override_settings(MEDIA_ROOT=self.media_root, MEDIA_URL='/media/')
+        self.settings.enable()
+        os.makedirs(os.path.join(self.media_root, 'posts'))
+        self.name = 'posts/picture.jpg'
+        Image.new('RGB', (2000, 1000), (255, 0, 0)).save(os.path.join(self.media_root, self.name))
+        cache.clear()
+
+    def tearDown(self):
+        self.settings.disable()
+        shutil.rmtree(self.media_root)
+
+    def test_generate(self):
+        derivatives = ImageDerivatives(self.name)
+        self.assertTrue(derivatives.generate())
+        self.assertEqual(Image.open(derivatives.get_path('avatar')).size, (150, 150))
+        self.assertEqual(Image.open(derivatives.get_path('feed')).size, (640, 320))
+        self.assertEqual(Image.open(derivatives.get_path('full')).size, (1600, 800))
+        self.assertEqual(derivatives.get_status()['status'], ImageDerivatives.DONE)
+
+    def test_best_variant(self):
+        derivatives = ImageDerivatives(self.name)
+        derivatives.set_status(ImageDerivatives.PENDING)
+        self.assertEqual(derivatives.get_url('avatar'), '/media/posts/picture.jpg')
+        derivatives.set_status(ImageDerivatives.PROCESSING, ['full'])
+        self.assertEqual(derivatives.get_url('feed'), '/media/posts/picture.full.jpg')
+        derivatives.generate()
+        self.assertEqual(derivatives.get_url('feed'), '/media/posts/picture.feed.jpg')
+        # the status is read from the files when not cached
+        cache.clear()
+        self.assertEqual(ImageDerivatives(self.name).get_url('avatar'), '/media/posts/picture.avatar.jpg')
+
+    def test_is_variant(self):
+        self.assertTrue(is_variant('posts/picture.avatar.jpg'))
+        self.assertFalse(is_variant('posts/picture.jpg'))
+        self.assertFalse(is_variant('posts/my.picture.jpg'))
+
+    @override_settings(UPLOADS_CONTENT_ADDRESSED=False)
+    def test_rotate_picture(self):
+        member = User.objects.create_user(username="i0@mumlife.co.uk",
+                                          email="i0@mumlife.co.uk",
+                                          password="secure-password").profile
+        member.picture = self.name
+        member.save()
+        derivatives = ImageDerivatives(self.name)
+        derivatives.generate()
+        # the original is rotated, then the variants generated again
+        self.assertTrue(rotate_picture(member.id))
+        self.assertEqual(Image.open(os.path.join(self.media_root, self.name)).size, (1000, 2000))
+        self.assertEqual(Image.open(derivatives.get_path('full')).size, (800, 1600))
+        self.assertEqual(derivatives.get_status()['status'], ImageDerivatives.DONE)
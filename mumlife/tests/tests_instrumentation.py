@@ -0,0 +1,46 @@
+import unittest
+from django.test import TestCase
+from django.test.utils import override_settings
+from mumlife import instrumentation
+from mumlife.models import Member, Message
+
+@override_settings(INSTRUMENTATION_ENABLED=True)
+class InstrumentationTest(TestCase):
+    """TestCase for the per-request queries and timings."""
+
+    def setUp(self):
+        instrumentation.reset_stats()
+
+    def test_profiles(self):
+        profile = instrumentation.start('feed', root=True)
+        list(Member.objects.all())
+        list(Message.objects.all())
+        # i.e. an API view dispatched in-process
+        inner = instrumentation.start('NotificationListView')
+        list(Message.objects.all())
+        with instrumentation.section('format'):
+            pass
+        instrumentation.stop(inner)
+        instrumentation.stop(profile, path='/')
+        self.assertEqual(inner.queries, 1)
+        self.assertEqual(profile.queries, 3)
+        self.assertEqual(len(profile.slowest), 3)
+        self.assertIn('format', profile.sections)
+        self.assertEqual(profile.as_dict()['path'], '/')
+        self.assertEqual(profile.get_headers()['X-Mumlife-Queries'], '3')
+        self.assertEqual(instrumentation.current(), None)
+
+        stats = instrumentation.get_stats()
+        self.assertEqual(stats['feed']['requests'], 1)
+        self.assertEqual(stats['feed']['max_queries'], 3)
+        self.assertEqual(stats['NotificationListView']['queries'], 1)
+        instrumentation.reset_stats()
+        self.assertEqual(instrumentation.get_stats(), {})
+
+    def test_root(self):
+        # a profile left by a failed request is discarded
+        instrumentation.start('feed', root=True)
+        profile = instrumentation.start('events', root=True)
+        instrumentation.stop(profile)
+        self.assertEqual(instrumentation.current(), None)
+        self.assertEqual(instrumentation.get_stats().keys(), ['events'])
@@ -1,7 +1,7 @@
 import unittest
 from django.test import TestCase
 from django.contrib.auth.models import User
-from mumlife.models import Member, Message, Friendships
+from mumlife.models import Member, Message, Friendships, MessageTag
 
 class MessagesSearchTest(TestCase):
     """TestCase for Message Search.
@@ -235,3 +235,64 @@ class MessagesSearchTest(TestCase):
         for terms, expected in searches:
             messages = self.U5.get_messages(terms)
             self.assertQuerysetEqual(messages, expected, self._getId, ordered=False)
+
+
+class MessageRenderTest(TestCase):
+    """TestCase for the messages bodies and tags pre-rendered on save."""
+
+    def setUp(self):
+        user = User.objects.create_user(username="r1@mumlife.co.uk",
+                                        email="r1@mumlife.co.uk",
+                                        password="secure-password")
+        self.member = user.profile
+        self.member.postcode = 'SE16 4JX'
+        self.member.save()
+
+    def test_render(self):
+        message = Message.objects.create(member=self.member,
+                                         area=self.member.area,
+                                         body='<b>Picnic</b> #parks at http://mumlife.co.uk',
+                                         tags='#parks #se16')
+        message = Message.objects.get(pk=message.pk)
+        self.assertEqual(message.body_html, 'Picnic <span>#parks</span> at http://mumlife.co.uk')
+        self.assertTrue('target="_blank"' in message.body_with_links)
+        self.assertEqual(message.tags_inline, '#parks')
+        self.assertEqual(message.tags_item, '#se16')
+        formatted = message.format(viewer=self.member)
+        self.assertEqual(formatted['body'], message.body_html)
+        self.assertEqual(formatted['tags_item'], [{'key': 'se16', 'value': '#se16'}])
+        self.assertFalse('body_html' in formatted)
+
+
+class MessageTagTest(TestCase):
+    """TestCase for the messages tags index."""
+
+    def setUp(self):
+        user = User.objects.create_user(username="t1@mumlife.co.uk",
+                                        email="t1@mumlife.co.uk",
+                                        password="secure-password")
+        self.member = user.profile
+        self.member.postcode = 'SE16 4JX'
+        self.member.save()
+
+    def _get_names(self, message):
+        return sorted(MessageTag.objects.filter(message=message).values_list('name', flat=True))
+
+    def test_index(self):
+        message = Message.objects.create(member=self.member,
+                                         area=self.member.area,
+                                         body='Picnic',
+                                         tags='#Parks, #se16 #parks')
+        self.assertEqual(self._get_names(message), ['parks', 'se16'])
+        # the index follows the tags edits
+        message.tags = '#se16 #picnic'
+        message.save()
+        self.assertEqual(self._get_names(message), ['picnic', 'se16'])
+        message.tags = ''
+        message.save()
+        self.assertEqual(self._get_names(message), [])
+        message.tags = '#parks'
+        message.save()
+        message_id = message.id
+        message.delete()
+        self.assertFalse(MessageTag.objects.filter(message=message_id).exists())
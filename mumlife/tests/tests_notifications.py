@@ -0,0 +1,125 @@
+import unittest
+from datetime import timedelta
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.utils import timezone
+from mumlife import caching
+from mumlife.models import Member, Message, Friendships, Notifications
+
+class NotificationsReadStateTest(TestCase):
+    """TestCase for the notifications read watermarks."""
+
+    def setUp(self):
+        self.members = []
+        for i in range(3):
+            user = User.objects.create_user(username="n{}@mumlife.co.uk".format(i),
+                                            email="n{}@mumlife.co.uk".format(i),
+                                            password="secure-password")
+            self.members.append(user.profile)
+        self.N0, self.N1, self.N2 = self.members
+        self.read_state, created = Notifications.objects.get_or_create(member=self.N0)
+
+    def _send_private(self, sender):
+        return Message.objects.create(member=sender,
+                                      area=sender.area,
+                                      body='Private message',
+                                      visibility=Message.PRIVATE,
+                                      recipient=self.N0)
+
+    def _get_results(self, type_):
+        return [r for r in self.N0.get_notifications()['results'] if r['type'] == type_]
+
+    def test_messages(self):
+        self._send_private(self.N1)
+        result = self._get_results('messages')[0]
+        self.assertFalse(self.read_state.is_read(result))
+        self.read_state.reset(self.N0.get_notifications())
+        read_state = Notifications.objects.get(member=self.N0)
+        self.assertTrue(read_state.is_read(result))
+        # a new message is unread
+        message = self._send_private(self.N2)
+        Message.objects.filter(pk=message.pk).update(timestamp=timezone.now() + timedelta(seconds=1))
+        self.assertFalse(read_state.is_read(self._get_results('messages')[0]))
+
+    def test_friends_requests(self):
+        Friendships.objects.create(from_member=self.N1, to_member=self.N0, status=Friendships.PENDING)
+        result = {'type': 'friends_requests', 'count': 1}
+        self.assertFalse(self.read_state.is_read(result))
+        self.read_state.reset({'total': 1, 'results': [result]})
+        read_state = Notifications.objects.get(member=self.N0)
+        self.assertTrue(read_state.is_read(result))
+        self.assertFalse(read_state.is_read({'type': 'friends_requests', 'count': 2}))
+
+    def test_clear(self):
+        self.read_state.reset({'total': 0, 'results': []})
+        self.read_state.clear()
+        read_state = Notifications.objects.get(member=self.N0)
+        self.assertEqual(read_state.messages_read_at, None)
+        self.assertFalse(read_state.is_read({'type': 'threads', 'timestamp': timezone.now()}))
+
+
+class NotificationsCacheTest(TestCase):
+    """TestCase for the invalidation of the cached notifications."""
+
+    def setUp(self):
+        cache.clear()
+        self.members = []
+        for i in range(4):
+            user = User.objects.create_user(username="nc{}@mumlife.co.uk".format(i),
+                                            email="nc{}@mumlife.co.uk".format(i),
+                                            password="secure-password")
+            self.members.append(user.profile)
+        self.N0, self.N1, self.N2, self.N3 = self.members
+
+    def _cache_all(self):
+        for member in self.members:
+            caching.set_notifications(member.id, {'count': 0, 'results': []})
+
+    def _get_cached(self):
+        """Return the members whose notifications are cached."""
+        return [m for m in self.members if caching.get_notifications(m.id) is not None]
+
+    @override_settings(NOTIFICATIONS_CACHE_TTL=300, LOCAL_CACHE_TTL=10)
+    def test_process_local_ttl(self):
+        timeouts = []
+        caching.cache.set = lambda key, value, timeout=None: timeouts.append(timeout)
+        try:
+            caching.set_notifications(self.N0.id, {'count': 0, 'results': []})
+        finally:
+            del caching.cache.set
+        # without a shared cache, the invalidations are not relied upon
+        self.assertEqual(timeouts, [300 if caching.is_shared() else 10])
+
+    def test_reply(self):
+        message = Message.objects.create(member=self.N1, area=self.N1.area, body='Hello')
+        Message.objects.create(member=self.N2, area=self.N2.area, body='Hi',
+                               is_reply=True, reply_to=message)
+        self._cache_all()
+        Message.objects.create(member=self.N0, area=self.N0.area, body='Hey',
+                               is_reply=True, reply_to=message)
+        # the author, the members who replied, and the member replying
+        self.assertEqual(self._get_cached(), [self.N3])
+
+    def test_private_message(self):
+        self._cache_all()
+        Message.objects.create(member=self.N1, area=self.N1.area, body='Private',
+                               visibility=Message.PRIVATE, recipient=self.N0)
+        self.assertEqual(self._get_cached(), [self.N2, self.N3])
+
+    def test_friendship(self):
+        self._cache_all()
+        friendship = Friendships.objects.create(from_member=self.N1, to_member=self.N0,
+                                                status=Friendships.PENDING)
+        self.assertEqual(self._get_cached(), [self.N2, self.N3])
+        self._cache_all()
+        friendship.delete()
+        self.assertEqual(self._get_cached(), [self.N2, self.N3])
+
+    def test_event(self):
+        self._cache_all()
+        # events are notified to all members
+        Message.objects.create(member=self.N1, area=self.N1.area, body='Event',
+                               name='Event', eventdate=timezone.now() + timedelta(hours=1))
+        self.assertEqual(self._get_cached(), [])
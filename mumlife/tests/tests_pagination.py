@@ -0,0 +1,105 @@
+import unittest
+from urlparse import urlparse, parse_qs
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from django.utils import timezone
+from geo.models import PostcodePoint
+from api.pagination import decode_cursor, encode_cursor
+from api.views import MemberListView, MessageListView
+from mumlife import geocoding
+from mumlife.models import Member, Message, MEMBERS_INDEX
+
+class CursorPaginationTest(TestCase):
+    """TestCase for the keyset (cursor) pagination of the API lists.
+    Walking the pages must return every result once, in order,
+    including the results whose ordering key is tied.
+    """
+
+    POSTCODES = [
+        ('SE16 4JX', 51.4936, -0.0568),
+        ('SE16 4RA', 51.4951, -0.0530),
+        ('SE22 0NH', 51.4566, -0.0715),
+    ]
+
+    def setUp(self):
+        cache.clear()
+        geocoding._cache.clear()
+        MEMBERS_INDEX.refresh()
+        for postcode, latitude, longitude in self.POSTCODES:
+            PostcodePoint.objects.create(postcode=postcode, latitude=latitude, longitude=longitude)
+        self.members = []
+        # members sharing a postcode are at the same distance from the viewer
+        for i in range(10):
+            user = User.objects.create_user(username="p{}@mumlife.co.uk".format(i),
+                                            email="p{}@mumlife.co.uk".format(i),
+                                            password="secure-password")
+            member = user.profile
+            member.fullname = 'Member {}'.format(i)
+            member.postcode = self.POSTCODES[i % len(self.POSTCODES)][0]
+            member.save()
+            self.members.append(member)
+        self.viewer = self.members[0]
+        # messages posted at the same time are ordered by id
+        self.messages = [Message.objects.create(member=self.viewer,
+                                                area=self.viewer.area,
+                                                body='Message {} #se16'.format(i),
+                                                tags='#se16')
+                         for i in range(10)]
+        Message.objects.filter(id__in=[m.id for m in self.messages[2:7]]).update(timestamp=timezone.now())
+        self.client.login(username="p0@mumlife.co.uk", password="secure-password")
+        self._paginate_by = MemberListView.paginate_by, MessageListView.paginate_by
+        MemberListView.paginate_by = MessageListView.paginate_by = 3
+
+    def tearDown(self):
+        MemberListView.paginate_by, MessageListView.paginate_by = self._paginate_by
+
+    def _walk(self, name):
+        """Return the ids of all the pages, and the number of pages."""
+        ids, pages = [], 0
+        url, params = reverse(name), {'format': 'json', 'cursor': ''}
+        while url is not None:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            ids.extend([result['id'] for result in response.data['results']])
+            url, params = response.data['next'], {}
+            pages += 1
+        return ids, pages
+
+    def test_messages(self):
+        ids, pages = self._walk('messages-list')
+        expected = list(Message.objects.filter(id__in=[m.id for m in self.messages])
+                                       .order_by('-timestamp', '-id')
+                                       .values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+        self.assertEqual(pages, 4)
+
+    def _assertMembersWalk(self):
+        ids, pages = self._walk('members-list')
+        expected = [m.id for m in Member.objects.with_distance_from(viewer=self.viewer)]
+        self.assertEqual(len(expected), 9)
+        self.assertEqual(ids, expected)
+        self.assertEqual(len(set(ids)), len(ids))
+        self.assertEqual(pages, 3)
+
+    def test_members(self):
+        self._assertMembersWalk()
+
+    @override_settings(DISTANCE_ENGINE='haversine')
+    def test_members_haversine(self):
+        self._assertMembersWalk()
+
+    def test_distance_key(self):
+        response = self.client.get(reverse('members-list'), {'format': 'json', 'cursor': ''})
+        distance, id_ = decode_cursor(parse_qs(urlparse(response.data['next']).query)['cursor'][0])
+        members = Member.objects.with_distance_from(viewer=self.viewer)
+        self.assertEqual(len(Member.objects.after_distance_from(members, self.viewer, (distance, id_))), 6)
+        # the distance of the key is computed again, not compared with the (inexact) float sent
+        self.assertEqual(len(Member.objects.after_distance_from(members, self.viewer, (distance + 1e-6, id_))), 6)
+
+    def test_invalid_cursor(self):
+        for values in (['not a date', 1], ['2013-13-45T00:00:00', 1], [None, 1], ['2013-10-01T00:00:00']):
+            response = self.client.get(reverse('messages-list'), {'format': 'json', 'cursor': encode_cursor(values)})
+            self.assertEqual(response.status_code, 400)
@@ -0,0 +1,69 @@
+import unittest
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from mumlife.formatters import Formatter
+from mumlife.models import Member, Message
+
+@override_settings(REPLIES_PREVIEW=2)
+class RepliesTest(TestCase):
+    """TestCase for the threads counters, and the replies API."""
+
+    def setUp(self):
+        cache.clear()
+        self.members = []
+        for i in range(3):
+            user = User.objects.create_user(username="r{}@mumlife.co.uk".format(i),
+                                            email="r{}@mumlife.co.uk".format(i),
+                                            password="secure-password")
+            member = user.profile
+            member.fullname = 'Member {}'.format(i)
+            member.postcode = 'SE16 4JX'
+            member.save()
+            self.members.append(member)
+        self.R0, self.R1, self.R2 = self.members
+        self.message = Message.objects.create(member=self.R0,
+                                              area=self.R0.area,
+                                              body='Hello #se16',
+                                              tags='#se16')
+        self.replies = [self._reply(self.message, 'Reply {}'.format(i)) for i in range(3)]
+
+    def _reply(self, message, body):
+        return Message.objects.create(member=self.R1,
+                                      area=self.R1.area,
+                                      body=body,
+                                      visibility=message.visibility,
+                                      is_reply=True,
+                                      reply_to=message)
+
+    def test_counters(self):
+        message = Message.objects.get(pk=self.message.pk)
+        self.assertEqual(message.reply_count, 3)
+        self.assertEqual(message.last_reply_at, self.replies[-1].timestamp)
+        self.replies[-1].delete()
+        message = Message.objects.get(pk=self.message.pk)
+        self.assertEqual(message.reply_count, 2)
+        self.assertEqual(message.last_reply_at, self.replies[1].timestamp)
+
+    def test_last_replies(self):
+        message = Formatter(viewer=self.R2).format_messages([Message.objects.get(pk=self.message.pk)])[0]
+        self.assertEqual(message['reply_count'], 3)
+        self.assertEqual([r['id'] for r in message['replies']], [r.id for r in self.replies[1:]])
+
+    def test_api(self):
+        self.client.login(username="r2@mumlife.co.uk", password="secure-password")
+        url = reverse('message-replies', kwargs={'pk': self.message.pk})
+        response = self.client.get(url, {'format': 'json', 'cursor': ''})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r['id'] for r in response.data['results']], [r.id for r in self.replies])
+        # private threads are listed to their members only
+        private = Message.objects.create(member=self.R0,
+                                         area=self.R0.area,
+                                         body='Private',
+                                         visibility=Message.PRIVATE,
+                                         recipient=self.R1)
+        self._reply(private, 'Private reply')
+        url = reverse('message-replies', kwargs={'pk': private.pk})
+        self.assertEqual(self.client.get(url, {'format': 'json'}).status_code, 403)
@@ -0,0 +1,104 @@
+import unittest
+from django.test import TestCase
+from django.contrib.auth.models import User
+from mumlife.models import Member, Message, Friendships
+
+class FullTextSearchTest(TestCase):
+    """TestCase for the full-text search of messages.
+    The words of the search which are not known tags
+    are searched in the messages name, body, tags and location.
+
+    Test data contains the following members:
+        U1: Freya Hum        SE16
+        U2: Suzanna Cole     SE16
+        U3: Rachel Chatter   SE22
+
+    And the following messages:
+        M1: U1 - "Swimming lessons for toddlers #se16"
+        M2: U2 - "Any swimming pool with a baby pool? swimming swimming #se16"
+        M3: U1 - "Buggy walk", event at "Southwark Park, London SE16 2UA" #se16
+        M4: U3 - "Swimming in the lido #se22"
+        M5: U2 - "Swimming club @private", to U3
+
+    """
+
+    def _getName(self, object):
+        return 'M{}'.format([m.id for m in self.messages].index(object.id) + 1)
+
+    def _create_member(self, username, fullname, postcode):
+        user = User.objects.create_user(username=username,
+                                        email=username,
+                                        password="secure-password")
+        member = user.profile
+        member.fullname = fullname
+        member.postcode = postcode
+        member.save()
+        return member
+
+    def setUp(self):
+        self.U1 = self._create_member("s1@mumlife.co.uk", 'Freya Hum', 'SE16 4JX')
+        self.U2 = self._create_member("s2@mumlife.co.uk", 'Suzanna Cole', 'SE16 4RA')
+        self.U3 = self._create_member("s3@mumlife.co.uk", 'Rachel Chatter', 'SE22 0NH')
+
+        self.M1 = Message.objects.create(member=self.U1,
+                                         area=self.U1.area,
+                                         body='Swimming lessons for toddlers #se16',
+                                         tags='#se16')
+        self.M2 = Message.objects.create(member=self.U2,
+                                         area=self.U2.area,
+                                         body='Any swimming pool with a baby pool? swimming swimming #se16',
+                                         tags='#se16')
+        self.M3 = Message.objects.create(member=self.U1,
+                                         area=self.U1.area,
+                                         name='Buggy walk',
+                                         body='Meet at the gates #se16',
+                                         location='Southwark Park, London SE16 2UA',
+                                         tags='#se16')
+        self.M4 = Message.objects.create(member=self.U3,
+                                         area=self.U3.area,
+                                         body='Swimming in the lido #se22',
+                                         tags='#se22')
+        self.M5 = Message.objects.create(member=self.U2,
+                                         area=self.U2.area,
+                                         body='Swimming club @private',
+                                         visibility=Message.PRIVATE,
+                                         recipient=self.U3,
+                                         tags='')
+        self.messages = [self.M1, self.M2, self.M3, self.M4, self.M5]
+
+    def test_text(self):
+        searches = [
+            ("swimming",            ['M1', 'M2']),
+            ("swim",                ['M1', 'M2']),
+            ("southwark",           ['M3']),
+            ("buggy",               ['M3']),
+            ("lido",                []),
+            ("kayak",               []),
+        ]
+        for terms, expected in searches:
+            messages = self.U1.get_messages(search=terms)
+            self.assertQuerysetEqual(messages, expected, self._getName, ordered=False)
+
+    def test_tags_and_text(self):
+        searches = [
+            ("#se16 swimming",      ['M1', 'M2']),
+            ("#se16 toddlers",      ['M1']),
+            ("#se22 swimming",      []),
+            ("#se22 lido @global",  []),
+        ]
+        for terms, expected in searches:
+            messages = self.U1.get_messages(search=terms)
+            self.assertQuerysetEqual(messages, expected, self._getName, ordered=False)
+
+    def test_visibility(self):
+        self.assertQuerysetEqual(self.U3.get_messages(search="swimming"), ['M4'], self._getName, ordered=False)
+        self.assertQuerysetEqual(self.U3.get_messages(search="swimming @private"), ['M5'], self._getName, ordered=False)
+        self.assertQuerysetEqual(self.U1.get_messages(search="club @private"), [], self._getName, ordered=False)
+
+    def test_ranked(self):
+        messages = self.U1.get_messages(search="swimming", ranked=True)
+        self.assertEqual([m.id for m in messages], [self.M2.id, self.M1.id])
+        self.assertTrue(messages[0].search_rank > messages[1].search_rank)
+        # without text, ranked searches are in reverse chronological order
+        messages = self.U1.get_messages(search="#se16", ranked=True)
+        self.assertEqual([m.id for m in messages], [self.M3.id, self.M2.id, self.M1.id])
@@ -0,0 +1,96 @@
+import unittest
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.contrib.auth.models import User, Group
+from mumlife.models import Member, Message, Friendships, TimelineEntry
+
+@override_settings(TIMELINE_ENABLED=True)
+class TimelineTest(TestCase):
+    """TestCase for the members timelines.
+    The feeds read from the timelines must match the feeds
+    computed from the visibility rules.
+    """
+
+    def _create_member(self, name, postcode):
+        user = User.objects.create_user(username="{}@mumlife.co.uk".format(name),
+                                        email="{}@mumlife.co.uk".format(name),
+                                        password="secure-password")
+        member = user.profile
+        member.fullname = name
+        member.postcode = postcode
+        member.save()
+        return member
+
+    def setUp(self):
+        self.T1 = self._create_member('t1', 'SE16 4JX')
+        self.T2 = self._create_member('t2', 'SE16 4RA')
+        self.T3 = self._create_member('t3', 'SE22 0NH')
+        self.T1.add_friend(self.T3, status=Friendships.APPROVED)
+        self.T3.add_friend(self.T1, status=Friendships.APPROVED)
+        for member in (self.T1, self.T2, self.T3):
+            for visibility in (Message.LOCAL, Message.GLOBAL, Message.FRIENDS):
+                Message.objects.create(member=member,
+                                       area=member.area,
+                                       body='#{}'.format(member.area.lower()),
+                                       visibility=visibility,
+                                       tags='#{}'.format(member.area.lower()))
+        Message.objects.create(member=self.T3,
+                               area=self.T3.area,
+                               body='#se16',
+                               tags='#se16')
+        Message.objects.create(member=self.T2,
+                               area=self.T2.area,
+                               body='Private',
+                               visibility=Message.PRIVATE,
+                               recipient=self.T3)
+
+    def _assertFeedsEqual(self, member):
+        messages = Message.objects.exclude(is_reply=True).exclude(eventdate__isnull=False)
+        for flag in ('@local', '@friends', '@private'):
+            expected = [m.id for m in member._filter_feed(messages, flag)]
+            self.assertEqual([m.id for m in member.get_messages(search=flag)], expected)
+
+    def test_fan_out(self):
+        for member in (self.T1, self.T2, self.T3):
+            self._assertFeedsEqual(member)
+
+    def test_rebuild(self):
+        TimelineEntry.objects.all().delete()
+        for member in (self.T1, self.T2, self.T3):
+            TimelineEntry.objects.rebuild(member)
+            self._assertFeedsEqual(member)
+
+    def test_friendship(self):
+        self.T2.add_friend(self.T3, status=Friendships.APPROVED)
+        self._assertFeedsEqual(self.T2)
+        self.T1.remove_friend(self.T3)
+        self._assertFeedsEqual(self.T1)
+
+    def test_move(self):
+        self.T2.postcode = 'SE22 0HN'
+        self.T2.save()
+        self._assertFeedsEqual(self.T2)
+
+    def test_administrators(self):
+        administrators = Group.objects.create(name='Administrators')
+        self.T2.user.groups.add(administrators)
+        for member in (self.T1, self.T2, self.T3):
+            self._assertFeedsEqual(member)
+        self.T2.user.groups.clear()
+        for member in (self.T1, self.T2, self.T3):
+            self._assertFeedsEqual(member)
+
+    def test_activation(self):
+        user = self.T3.user
+        user.is_active = False
+        user.save()
+        self.assertFalse(TimelineEntry.objects.filter(member=self.T3).exists())
+        Message.objects.create(member=self.T1,
+                               area=self.T1.area,
+                               body='#se16',
+                               visibility=Message.FRIENDS,
+                               tags='#se16')
+        self.assertFalse(TimelineEntry.objects.filter(member=self.T3).exists())
+        user.is_active = True
+        user.save()
+        self._assertFeedsEqual(self.T3)
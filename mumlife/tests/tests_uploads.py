@@ -0,0 +1,50 @@
+import os
+import shutil
+import tempfile
+import unittest
+from StringIO import StringIO
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from django.test.utils import override_settings
+from PIL import Image
+from mumlife.uploads import UploadStorage
+
+class ContentAddressedUploadTest(TestCase):
+    """TestCase for the uploads stored under their content hash."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings = override_settings(MEDIA_ROOT=self.media_root, MEDIA_URL='', UPLOADS_CONTENT_ADDRESSED=True)
+        self.settings.enable()
+        data = StringIO()
+        Image.new('RGB', (20, 10), (255, 0, 0)).save(data, 'JPEG')
+        self.data = data.getvalue()
+
+    def tearDown(self):
+        self.settings.disable()
+        # the variants might still be generated in the background
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def _upload(self, filename):
+        storage = UploadStorage()
+        storage.setup(filename, './posts/%Y/%m/%d')
+        self.assertTrue(storage.upload(SimpleUploadedFile(filename, self.data), False))
+        return storage.filename
+
+    def test_deduplication(self):
+        first = self._upload('picture.JPEG')
+        second = self._upload('other.jpg')
+        self.assertEqual(first, second)
+        parts = first.split('/')
+        self.assertEqual(parts[0], 'posts')
+        self.assertEqual(parts[1] + parts[2], parts[3][:4])
+        self.assertTrue(parts[3].endswith('.jpg'))
+        self.assertTrue(os.path.isfile(os.path.join(self.media_root, first)))
+        # no temporary file is left
+        self.assertEqual(os.listdir(os.path.join(self.media_root, 'tmp')), [])
+
+    def test_not_an_image(self):
+        storage = UploadStorage()
+        storage.setup('picture.jpg', './posts/%Y/%m/%d')
+        self.assertFalse(storage.upload(SimpleUploadedFile('picture.jpg', 'not an image'), False))
+        self.assertEqual(os.listdir(os.path.join(self.media_root, 'tmp')), [])
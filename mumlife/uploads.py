@@ -2,10 +2,19 @@
 """
 Django views to handle Uploads via AJAX.
 
+With UPLOADS_CONTENT_ADDRESSED, uploads are streamed to a temporary file
+while being hashed, then stored under their content hash, in directories
+sharded by the first characters of the hash;
+e.g. 'member/3f/a2/3fa2...c1.jpg'. Identical uploads share the same file,
+and names are assigned without checking the existing files.
+
 """
+import errno
+import hashlib
 import json
 import os
 import re
+import tempfile
 import time
 import logging
 from io import FileIO, BufferedWriter
@@ -13,26 +22,89 @@ from django.core.serializers.json import DjangoJSONEncoder
 from django.http import HttpResponse, HttpResponseBadRequest, Http404, HttpResponseNotAllowed
 from django.conf import settings
 from PIL import Image
-from mumlife import models
+from mumlife import images, models
 
 logger = logging.getLogger('mumlife.uploads')
 
+# extensions of the content-addressed files, by image format
+EXTENSIONS = {
+    'JPEG': '.jpg',
+    'PNG': '.png',
+    'GIF': '.gif',
+}
+
+
+def get_temp_dir():
+    # on the same filesystem as the uploads, so that files are moved atomically
+    return os.path.join(settings.MEDIA_ROOT, 'tmp')
+
+
+def make_dirs(path):
+    try:
+        os.makedirs(path)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+
+
+def get_content_name(upload_to, digest, extension):
+    """Return the name of a file stored by content, relative to MEDIA_ROOT."""
+    # files are stored under the upload folder (e.g. 'member', 'posts'),
+    # without the date formats
+    if upload_to[:2] == './':
+        upload_to = upload_to[2:]
+    folder = upload_to.split('/')[0]
+    return os.path.join(folder, digest[:2], digest[2:4], '{}{}'.format(digest, extension))
+
+
+def store_by_content(path, upload_to, digest, extension):
+    """
+    Move the file at 'path' to its content-addressed name.
+    If a file with the same content is already stored, the file is discarded.
+    Return the name, and whether the file was stored.
+
+    """
+    name = get_content_name(upload_to, digest, extension)
+    dest = os.path.join(settings.MEDIA_ROOT, name)
+    if os.path.isfile(dest):
+        os.remove(path)
+        return name, False
+    make_dirs(os.path.dirname(dest))
+    # concurrent uploads of the same content replace the file with the same bytes
+    os.rename(path, dest)
+    return name, True
+
+
+def hash_file(path, chunk_size=65536):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), ''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
 
 class UploadStorage(object):
     BUFFER_SIZE = 10485760  # 10MB
 
     def __init__(self, **kwargs):
         self.__dict__.update(kwargs)
-        self.size = None
-
-    def set_size(self, width, height):
-        self.size = int(width), int(height)
-        #logger.debug(self.size)
+        self._digest = None
 
     def setup(self, filename, upload_to):
         """ Creates the filename on the system, along with the required folder structure. """
         self.filename = filename
+        if images.is_variant(filename):
+            # the name is reserved to the variants of another image
+            root, ext = os.path.splitext(filename)
+            self.filename = '{}{}'.format(root.replace('.', '_'), ext)
         self.upload_to = upload_to
+        if settings.UPLOADS_CONTENT_ADDRESSED:
+            # the file is named after its content once uploaded (see store())
+            self._digest = hashlib.sha1()
+            make_dirs(get_temp_dir())
+            fd, self._path = tempfile.mkstemp(suffix='.upload', dir=get_temp_dir())
+            self._dest = BufferedWriter(FileIO(fd, "w"))
+            return
         #logger.debug('File: '+self.filename)
         self._path = self.update_filename()
         #logger.debug('Dir: '+self._dir)
@@ -46,6 +118,8 @@ class UploadStorage(object):
 
     def upload_chunk(self, chunk, *args, **kwargs):
         self._dest.write(chunk)
+        if self._digest is not None:
+            self._digest.update(chunk)
 
     def upload_complete(self):
         path = settings.MEDIA_URL + "/" + self.upload_to + "/" + self.filename
@@ -88,6 +162,14 @@ class UploadStorage(object):
             self.filename = "{}_{}{}".format(filename_no_extension, str(filename_suffix), extension)
         return os.path.join(self._dir, self.filename)
 
+    def store(self, image_format):
+        """Store the uploaded file under its content hash."""
+        extension = EXTENSIONS.get(image_format, os.path.splitext(self.filename)[1].lower())
+        name, created = store_by_content(self._path, self.upload_to, self._digest.hexdigest(), extension)
+        self.upload_to, self.filename = os.path.split(name)
+        self._path = os.path.join(settings.MEDIA_ROOT, name)
+        return created
+
     def upload(self, uploaded, raw_data):
         try:
             if raw_data:
@@ -102,57 +184,28 @@ class UploadStorage(object):
                     self.upload_chunk(chunk)
             # make sure the file is closed
             self._dest.close()
+            # check the file is an image, without decoding it
+            image = Image.open(self._path)
+            image.verify()
+            created = True
+            if self._digest is not None:
+                created = self.store(image.format)
+            # the original is stored as it is;
+            # the sized variants are generated in the background
+            derivatives = images.ImageDerivatives(os.path.join(self.upload_to, self.filename))
+            if created or derivatives.get_status()['status'] != derivatives.DONE:
+                derivatives.submit()
             # file has been uploaded
             self.filename = os.path.join(settings.MEDIA_URL, self.upload_to, self.filename)
-            image = Image.open(self._path)
-            #logger.debug("{} {} {}".format(image.format, image.size, image.mode))
-            # resize image
-            if self.size:
-                #logger.debug(self.size)
-                image = image.convert('RGBA')
-                # the image is resized using the minimum dimension
-                width, height = self.size
-                if image.size[0] < image.size[1]:
-                    # the height is bigger than the width
-                    # we set the maximum height to the original height,
-                    # so that the image fits the width
-                    height = image.size[1]
-                elif image.size[0] > image.size[1]:
-                    # the width is bigger than the height
-                    # we set the maximum width to the original width,
-                    # so that the image fits the height
-                    width = image.size[0]
-                else:
-                    # we have a square
-                    pass
-                image.thumbnail((width, height), Image.ANTIALIAS)
-                # if the image is not a square, we crop the exceeding width/length as required,
-                # to fit the square
-                if image.size[0] != image.size[1]:
-                    # we crop in the middle of the image
-                    if self.size[0] == image.size[0]:
-                        # the width fits the container, center the height
-                        x0 = 0
-                        y0 = (image.size[1] / 2) - (self.size[1] / 2)
-                        x1 = self.size[0]
-                        y1 = y0 + self.size[1]
-                    else:
-                        # center the width
-                        x0 = (image.size[0] / 2) - (self.size[0] / 2)
-                        y0 = 0
-                        x1 = x0 + self.size[0]
-                        y1 = self.size[1] 
-                    box = (x0, y0, x1, y1)
-                    region = image.crop(box)
-                    background = Image.new('RGBA', size = self.size, color = (255, 255, 255, 0))
-                    background.paste(region, (0, 0))
-                    #logger.debug("{} {} {}".format(background.format, background.size, background.mode))
-                    background.save(self._path)
-                else:
-                    image.save(self._path)
             return True
         except Exception as e:
             logger.error(e)
+            if self._digest is not None and os.path.dirname(self._path) == get_temp_dir():
+                # the upload was not stored
+                try:
+                    os.remove(self._path)
+                except OSError:
+                    pass
             return False
 
 
@@ -234,12 +287,6 @@ class FileUploader(object):
                 logger.error(e)
                 return HttpResponseBadRequest("Bad Request")
 
-            # do we need to resize the image?
-            width = request.POST['width'] if request.POST.has_key('width') else None
-            height = request.POST['height'] if request.POST.has_key('height') else None
-            if width and height:
-                self.storage.set_size(width, height)
-
             # save the file
             self.storage.setup(filename, upload_to)
             success = self.storage.upload(upload, is_raw)
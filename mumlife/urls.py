@@ -3,7 +3,6 @@ from django.conf.urls import patterns, include, url
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from mumlife.admin import site
-from mumlife.models import Page
 from mumlife.uploads import FileUploader
 from mumlife.images import ImageRotater
 #from mumlife.forms import PassResetForm
@@ -11,7 +10,6 @@ from mumlife.images import ImageRotater
 urlpatterns = patterns('',
 
     url(r'^$', 'mumlife.views.home'),
-    url(Page.REGEX(), 'mumlife.views.page'),
     url(r'^local/$', 'mumlife.views.feed'),
     url(r'^events/(?P<tagstring>.*)', 'mumlife.views.events'),
     url(r'^messages/$', 'mumlife.views.messages'),
@@ -64,5 +62,8 @@ urlpatterns = patterns('',
     # Back Office
     url(r'^grappelli/', include('grappelli.urls')),
     url(r'^back-office/', include(site.urls)),
-    url(r'^markitup/', include('markitup.urls'))
+    url(r'^markitup/', include('markitup.urls')),
+
+    # Static pages, resolved by slug when no other URL matches
+    url(r'^(?P<page>[^/]+)$', 'mumlife.views.page'),
 )
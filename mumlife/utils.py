@@ -9,6 +9,8 @@ import json
 import math
 import re
 import requests
+import threading
+from collections import OrderedDict
 from django.conf import settings
 from dateutil.relativedelta import relativedelta
 
@@ -29,47 +31,164 @@ QUERY_CHARS = ur'[a-z0-9!\*\'\(\);:&=\+\$/%#\[\]\-_\.,~]'
 # 2. Allow =&# for empty URL parameters and other URL-join artifacts
 PATH_ENDING_CHARS = r'[%s\)=#/]' % UTF_CHARS
 QUERY_ENDING_CHARS = '[a-z0-9_&=#]'
-REGEX_URL = re.compile('((%s)((https?://|www\\.)(%s)(\/(%s*%s)?)?(\?%s*%s)?))'
-                       % (PRE_CHARS, DOMAIN_CHARS, PATH_CHARS,
-                          PATH_ENDING_CHARS, QUERY_CHARS, QUERY_ENDING_CHARS),
-                       re.IGNORECASE)
+URL_PATTERN = '((https?://|www\\.)(%s)(\/(%s*%s)?)?(\?%s*%s)?)' % (DOMAIN_CHARS, PATH_CHARS,
+                                                                  PATH_ENDING_CHARS, QUERY_CHARS, QUERY_ENDING_CHARS)
+REGEX_URL = re.compile('((%s)%s)' % (PRE_CHARS, URL_PATTERN), re.IGNORECASE)
+
+# Tags, flags and links are matched together, in a single pass (see Tokens);
+# the characters allowed before links (PRE_CHARS) are checked without being matched
+REGEX_TOKENS = re.compile(r'(?P<tag>#[_\w-]+)|(?P<flag>@[_\w-]+)|(?<![/"\'!=])(?P<link>%s)' % URL_PATTERN,
+                          re.IGNORECASE)
+# most strings have no links, and are matched for tags and flags only
+REGEX_TOKENS_NO_LINKS = re.compile(r'(?P<tag>#[_\w-]+)|(?P<flag>@[_\w-]+)')
+
+# UK postcodes
+POSTCODE_OUTCODE = '[A-PR-UWYZ]([0-9]{1,2}|([A-HIK-Y][0-9](|[0-9]|[ABEHMNPRVWXY]))|[0-9][A-HJKSTUW])'
+POSTCODE_INCODE = '[0-9][ABD-HJLNP-UW-Z]{2}'
+REGEX_POSTCODE = re.compile(r'(GIR 0AA|%s %s)' % (POSTCODE_OUTCODE, POSTCODE_INCODE))
+REGEX_POSTCODE_GAP = re.compile(r' *(%s)$' % POSTCODE_INCODE)
+
+FLAGS = ['@local', '@global', '@friends', '@private']
+
+
+class LRUCache(object):
+    """Mapping holding up to 'size' items, the least recently used items being evicted first."""
+
+    def __init__(self, size):
+        self.size = size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._items.pop(key)
+            except KeyError:
+                return default
+            self._items[key] = value
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._items.pop(key, None)
+            self._items[key] = value
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+class Tokens(object):
+    """Tags, flags and links of a string, in order of appearance,
+    and the UK postcode it contains, if any.
+    """
+    TAG = 'tag'
+    FLAG = 'flag'
+    LINK = 'link'
+
+    def __init__(self, string):
+        self.string = string
+        # (start, end, kind) of each token
+        self.spans = []
+        if '://' in string or 'www.' in string.lower():
+            regex = REGEX_TOKENS
+        else:
+            regex = REGEX_TOKENS_NO_LINKS
+        for match in regex.finditer(string):
+            self.spans.append(match.span() + (match.lastgroup,))
+
+    def get(self, kind):
+        return [self.string[start:end] for start, end, kind_ in self.spans if kind_ == kind]
+
+    @property
+    def tags(self):
+        return self.get(self.TAG)
+
+    @property
+    def flags(self):
+        return self.get(self.FLAG)
+
+    @property
+    def links(self):
+        return self.get(self.LINK)
+
+    @property
+    def postcode(self):
+        try:
+            return self._postcode
+        except AttributeError:
+            pass
+        # the gap is added when missing, if the postcode ends the string
+        location = REGEX_POSTCODE_GAP.sub(r' \1', self.string.upper().strip())
+        postcode = REGEX_POSTCODE.search(location)
+        self._postcode = postcode.group(1) if postcode is not None else None
+        return self._postcode
+
+
+# strings are often tokenized several times in a row
+# (e.g. a message body is parsed, then its tags extracted);
+# the memo is a plain dict, emptied when full, as an LRU costs more than most lookups save
+TOKENS_CACHE_SIZE = 256
+_tokens_cache = {}
+
 
 class Extractor(object):
+    """Parse hashtags, flags, links and postcodes.
+
+    The string is tokenized in a single pass, and the tokens of recent
+    strings are memoized, so that parsing and extracting tags or flags
+    from the same string does not scan it again.
+    """
 
     def __init__(self, string=None):
         if string is None:
             string = ''
         self.string = string
 
+    @property
+    def tokens(self):
+        tokens = _tokens_cache.get(self.string)
+        if tokens is None:
+            if len(_tokens_cache) >= TOKENS_CACHE_SIZE:
+                _tokens_cache.clear()
+            tokens = _tokens_cache[self.string] = Tokens(self.string)
+        return tokens
+
     def parse(self, with_links=True):
-        if not with_links:
+        if with_links:
+            # parse hashtags, flags and links
+            replace = {Tokens.TAG: self.replace_with_hash,
+                       Tokens.FLAG: self.replace_with_flag,
+                       Tokens.LINK: self.replace_with_link}
+        else:
             # replace hashtags and flags only, with spans
-            s = REGEX_TAGS.sub(self.replace_with_spans, self.string)
-            s = REGEX_FLAGS.sub(self.replace_with_spans, s)
-            return s
-        # parse hashtags, flags and links
-        s = REGEX_TAGS.sub(self.replace_with_hash, self.string)
-        s = REGEX_FLAGS.sub(self.replace_with_flag, s)
-        s = REGEX_URL.sub(self.replace_with_link, s)
-        return s
-
-    def replace_with_spans(self, matchobj):
-        hashtag = matchobj.group(0)
+            replace = {Tokens.TAG: self.replace_with_spans,
+                       Tokens.FLAG: self.replace_with_spans}
+        parts = []
+        position = 0
+        for start, end, kind in self.tokens.spans:
+            if kind in replace:
+                parts.append(self.string[position:start])
+                parts.append(replace[kind](self.string[start:end]))
+                position = end
+        parts.append(self.string[position:])
+        return ''.join(parts)
+
+    def replace_with_spans(self, hashtag):
         return '<span>{}</span>'.format(hashtag)
 
-    def replace_with_hash(self, matchobj):
-        hashtag = matchobj.group(0)
+    def replace_with_hash(self, hashtag):
         return '<a href="/local/?search=%23{}">{}</a>'.format(hashtag[1:], hashtag)
 
-    def replace_with_flag(self, matchobj):
-        flagtag = matchobj.group(0)
+    def replace_with_flag(self, flagtag):
         if flagtag not in ('local', 'global', 'friends'):
             return flagtag
         return '<a href="/local/?search=@{}">{}</a>'.format(flagtag[1:], flagtag)
 
-    def replace_with_link(self, matchobj):
-        link = matchobj.group(0)
-        return '<a href="{}" target="_blank">{}</a>'.format(link, link)
+    def replace_with_link(self, link):
+        return u'<a href="{}" target="_blank">{}</a>'.format(link, link)
 
     def extract_tags(self):
         """Extract hashtags from a string.
@@ -77,31 +196,31 @@ class Extractor(object):
         hashtags are returned as dictionaries, whose keys are the hastags values
         without the leading character #.
         """
-        tags = {}
-        for match in REGEX_TAGS.findall(self.string):
-            tags[re.sub(r'#', '', match)] = match
-        return tags
+        return dict([(tag[1:], tag) for tag in self.tokens.tags])
 
     def extract_flags(self):
         """Extract flags from a string.
 
         flags are returned as a 1-dimension list.
         """
-        allowed = ['@local', '@global', '@friends', '@private']
-        matches = REGEX_FLAGS.findall(self.string)
-        return filter(lambda x: x in matches, allowed)
+        matches = self.tokens.flags
+        return [flag for flag in FLAGS if flag in matches]
 
     def extract_postcode(self):
         """Extract UK postcode."""
-        outcode_pattern = '[A-PR-UWYZ]([0-9]{1,2}|([A-HIK-Y][0-9](|[0-9]|[ABEHMNPRVWXY]))|[0-9][A-HJKSTUW])'
-        incode_pattern = '[0-9][ABD-HJLNP-UW-Z]{2}'
-        postcode_re = re.compile(r'(GIR 0AA|%s %s)' % (outcode_pattern, incode_pattern))
-        space_re = re.compile(r' *(%s)$' % incode_pattern)
-        location = space_re.sub(r' \1', self.string.upper().strip())
-        postcode = postcode_re.search(location)
-        if postcode is not None:
-            return postcode.group(1)
-        return None
+        return self.tokens.postcode
+
+
+def get_tag_names(tagstring):
+    """Return the normalized names of the tags in a tag string,
+    i.e. in lower case and without the leading character #.
+    """
+    names = set()
+    for tag in re.split(r'[\s,]+', (tagstring or '').lower()):
+        tag = tag.lstrip('#')
+        if tag:
+            names.add(tag)
+    return sorted(names)
 
 
 def get_age(born):
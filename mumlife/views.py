@@ -3,8 +3,9 @@ import logging
 import operator
 import re
 import urllib
+from django.core import urlresolvers
 from django.core.exceptions import PermissionDenied
-from django.http import HttpResponse, HttpResponseRedirect, Http404
+from django.http import HttpResponse, HttpResponseRedirect, HttpResponsePermanentRedirect, Http404
 from django.shortcuts import get_object_or_404
 from django.template import RequestContext, loader
 from django.contrib.auth import login
@@ -14,7 +15,7 @@ from django.utils import timezone
 from tagging.models import Tag, TaggedItem
 from longerusername.forms import AuthenticationForm
 from mumlife import utils
-from mumlife.models import Page, Member, Kid, Message, Friendships
+from mumlife.models import Page, Member, Kid, Message, Friendships, Conversation
 from mumlife.forms import SignUpForm, MemberForm, KidForm, MessageForm
 from geo.models import Postcode
 from api.helpers import APIRequest
@@ -49,7 +50,17 @@ def home(request):
 
 
 def page(request, page):
-    p = get_object_or_404(Page, slug=page)
+    try:
+        p = Page.objects.get(slug=page, status=True)
+    except Page.DoesNotExist:
+        # the pages URL matches any single-segment path,
+        # so that CommonMiddleware no longer appends the slash to them
+        # (e.g. /local to /local/): we do, if the path resolves with it
+        path = request.path_info + '/'
+        if settings.APPEND_SLASH and urlresolvers.is_valid_path(path, getattr(request, 'urlconf', None)):
+            query = request.META.get('QUERY_STRING', '')
+            return HttpResponsePermanentRedirect(request.path + '/' + ('?' + query if query else ''))
+        raise Http404
     t = loader.get_template('page.html')
     c = RequestContext(request, {
         'title': p.title,
@@ -120,7 +131,9 @@ def events(request, tagstring=''):
     params = {
         'resource': 'event',
         'search': request.GET.get('search'),
-        'range': range_
+        'range': range_,
+        'start': request.GET.get('from'),
+        'end': request.GET.get('to'),
     }
     response = APIRequest(request).get(**params)
 
@@ -148,6 +161,7 @@ def messages(request):
     }
     response = APIRequest(request).get(**params)
     context['data'] = response
+    Conversation.objects.mark_read(account)
 
     t = loader.get_template('messages.html')
     c = RequestContext(request, context)
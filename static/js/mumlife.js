@@ -565,6 +565,7 @@ ML.ImageRotate = function (settings) {
     var self = this;
     var field = settings['field'];
     var button = $('[data-entity="image-rotate"]');
+    var angle = 0;
     button.on('click', function () {
         $.ajax({
             url: '/manipulate/rotate',
@@ -573,9 +574,10 @@ ML.ImageRotate = function (settings) {
             contentType: "application/x-www-form-urlencoded;charset=utf-8",
             dataType: "json",
             success: function (response) {
-                // Add a timestamp to reload the rotated image
-                d = new Date();
-                $('.'+field).attr('src', response.filename+'?'+d.getTime());
+                // The image is rotated in the background:
+                // the image displayed is rotated meanwhile
+                angle = (angle + 90) % 360;
+                $('.'+field).css('transform', 'rotate('+angle+'deg)');
             },
             error: function (e) {
                 try {
@@ -890,8 +892,8 @@ ML.Feed.prototype.render_template = function (template, results, callback) {
                 html += '  <div class="message-content clearfix">';
                 html += '    <a href="' + message_url + '" class="message-tools clearfix">';
                 html += '      <span class="message-replies">';
-                if (message['replies'].length > 0) {
-                    html += ' <span class="message-replies-count">' + message['replies'].length + '</span>';
+                if (message['reply_count'] > 0) {
+                    html += ' <span class="message-replies-count">' + message['reply_count'] + '</span>';
                     html += ' <span class="icon icon-comment"></span>';
                 } else {
                     html += ' <span class="message-replies-first">Comment</span>';
@@ -977,8 +979,8 @@ ML.Feed.prototype.render_template = function (template, results, callback) {
                 }
                 html += '    <a href="/message/' + message['id'] + '/" class="message-tools clearfix">';
                 html += '        <span class="message-replies">';
-                if (message['replies'].length > 0) {
-                    html += '      <span class="message-replies-count">' + message['replies'].length + '</span>';
+                if (message['reply_count'] > 0) {
+                    html += '      <span class="message-replies-count">' + message['reply_count'] + '</span>';
                     html += '      <span class="icon icon-comment"></span>';
                 } else {
                     html += '      <span class="message-replies-first">Comment</span>';
@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+"""
+Microbenchmark of mumlife.utils.Extractor.
+
+Compares the single-pass tokenizer with the previous implementation
+(one regex pass per token type, postcode patterns compiled on each call),
+over a corpus of generated messages, as parsed on save and on display.
+
+Usage: python tools/benchmark_extractor.py [--messages N] [--repeat N]
+
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import timeit
+
+TAGS = ['#se16', '#se22', '#parks', '#playgroup', '#nct', '#swimming', '#buggy-friendly', '#baby_massage']
+FLAGS = ['@local', '@global', '@friends', '@private']
+LINKS = ['http://www.mumlife.co.uk/events', 'https://twitter.com/mumlife', 'www.southwark.gov.uk/libraries',
+         'http://example.com/path/to/page?id=12&ref=feed']
+POSTCODES = ['SE16 4JX', 'SE22 0NH', 'se22 8dp', 'N1 9GU', 'SW1A1AA']
+WORDS = ('anyone know a good place for lunch with a toddler near the park on saturday morning '
+         'we are meeting at the cafe bring snacks and buggies the class starts at ten').split()
+
+
+def get_corpus(size, seed=0):
+    """Return messages as (body, tags, location), with the mix of words,
+    hashtags, flags and links found in the feeds.
+    """
+    rand = random.Random(seed)
+    corpus = []
+    for i in range(size):
+        words = [rand.choice(WORDS) for j in range(rand.randint(5, 60))]
+        for token in rand.sample(TAGS, rand.randint(0, 3)):
+            words.insert(rand.randint(0, len(words)), token)
+        if rand.random() < 0.3:
+            words.insert(rand.randint(0, len(words)), rand.choice(FLAGS))
+        if rand.random() < 0.2:
+            words.insert(rand.randint(0, len(words)), rand.choice(LINKS))
+        tags = ' '.join(rand.sample(TAGS, rand.randint(0, 2)))
+        location = 'The Park Cafe, London {}'.format(rand.choice(POSTCODES)) if rand.random() < 0.3 else ''
+        corpus.append((' '.join(words), tags, location))
+    return corpus
+
+
+class LegacyExtractor(object):
+    """mumlife.utils.Extractor, before the single-pass tokenizer."""
+
+    def __init__(self, string=None):
+        from mumlife import utils
+        self.utils = utils
+        if string is None:
+            string = ''
+        self.string = string
+
+    def parse(self, with_links=True):
+        if not with_links:
+            s = self.utils.REGEX_TAGS.sub(self.replace_with_spans, self.string)
+            s = self.utils.REGEX_FLAGS.sub(self.replace_with_spans, s)
+            return s
+        s = self.utils.REGEX_TAGS.sub(self.replace_with_hash, self.string)
+        s = self.utils.REGEX_FLAGS.sub(self.replace_with_flag, s)
+        s = self.utils.REGEX_URL.sub(self.replace_with_link, s)
+        return s
+
+    def replace_with_spans(self, matchobj):
+        return '<span>{}</span>'.format(matchobj.group(0))
+
+    def replace_with_hash(self, matchobj):
+        hashtag = matchobj.group(0)
+        return '<a href="/local/?search=%23{}">{}</a>'.format(hashtag[1:], hashtag)
+
+    def replace_with_flag(self, matchobj):
+        return matchobj.group(0)
+
+    def replace_with_link(self, matchobj):
+        link = matchobj.group(0)
+        return '<a href="{}" target="_blank">{}</a>'.format(link, link)
+
+    def extract_tags(self):
+        tags = {}
+        for match in self.utils.REGEX_TAGS.findall(self.string):
+            tags[re.sub(r'#', '', match)] = match
+        return tags
+
+    def extract_flags(self):
+        allowed = ['@local', '@global', '@friends', '@private']
+        matches = self.utils.REGEX_FLAGS.findall(self.string)
+        return filter(lambda x: x in matches, allowed)
+
+    def extract_postcode(self):
+        outcode_pattern = '[A-PR-UWYZ]([0-9]{1,2}|([A-HIK-Y][0-9](|[0-9]|[ABEHMNPRVWXY]))|[0-9][A-HJKSTUW])'
+        incode_pattern = '[0-9][ABD-HJLNP-UW-Z]{2}'
+        postcode_re = re.compile(r'(GIR 0AA|%s %s)' % (outcode_pattern, incode_pattern))
+        space_re = re.compile(r' *(%s)$' % incode_pattern)
+        location = space_re.sub(r' \1', self.string.upper().strip())
+        postcode = postcode_re.search(location)
+        if postcode is not None:
+            return postcode.group(1)
+        return None
+
+
+def process(extractor, corpus):
+    """Parse the corpus as Message.render() and Message.postcode do."""
+    for body, tags, location in corpus:
+        extractor(body).parse(with_links=False)
+        extractor(body).parse()
+        extractor(body).extract_tags()
+        extractor(tags).extract_tags()
+        extractor(body).extract_flags()
+        extractor(location).extract_postcode()
+
+
+def check(corpus):
+    """Check that both implementations extract the same tokens."""
+    from mumlife.utils import Extractor
+    for body, tags, location in corpus:
+        for string in (body, tags):
+            assert Extractor(string).extract_tags() == LegacyExtractor(string).extract_tags(), string
+        assert Extractor(body).extract_flags() == LegacyExtractor(body).extract_flags(), body
+        assert Extractor(body).parse(with_links=False) == LegacyExtractor(body).parse(with_links=False), body
+        assert Extractor(location).extract_postcode() == LegacyExtractor(location).extract_postcode(), location
+
+
+if __name__ == "__main__":
+    BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.append(BASE_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'conf.settings')
+
+    parser = argparse.ArgumentParser(description="Extractor Microbenchmark")
+    parser.add_argument('--messages', type=int, default=1000, help='number of messages in the corpus')
+    parser.add_argument('--repeat', type=int, default=5, help='number of runs; the best run is reported')
+    args = parser.parse_args()
+
+    from mumlife.utils import Extractor
+    corpus = get_corpus(args.messages)
+    check(corpus)
+    print 'Corpus: {} messages'.format(len(corpus))
+    results = {}
+    for name, extractor in (('legacy', LegacyExtractor), ('tokenizer', Extractor)):
+        best = min(timeit.repeat(lambda: process(extractor, corpus), number=1, repeat=args.repeat))
+        results[name] = best
+        print '{:<10} {:>8.1f} ms  {:>10.0f} messages/s'.format(name, best * 1000, len(corpus) / best)
+    print 'Speed-up: {:.2f}x'.format(results['legacy'] / results['tokenizer'])